@@ -0,0 +1,90 @@
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+import orjson
+
+from src.benchmarks.runner import compare_results
+from src.benchmarks.runner import run_benchmarks
+from src.benchmarks.seed import VOLUMES
+from src.benchmarks.seed import seed
+from src.benchmarks.serialization import run_serialization_benchmark
+from src.configurations.settings import settings
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m src.benchmarks")
+    # seed truncates the tables and run writes and deletes rows, so both
+    # default to the test database rather than the application's.
+    parser.add_argument("--database-url", default=settings.database_test_url)
+    parser.add_argument("--yes", action="store_true", help="allow seed and run on the application database")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="fill the database with sellers and books")
+    seed_parser.add_argument("--volume", choices=VOLUMES, default="1k")
+
+    run_parser = commands.add_parser("run", help="drive every v1 route and store the results")
+    run_parser.add_argument("--base-url", help="benchmark a running server instead of the app in-process")
+    run_parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--route", action="append", help='e.g. "GET /api/v1/books/{book_id}"')
+    run_parser.add_argument("--output", type=Path, default=Path("bench_results.json"))
+
+    compare_parser = commands.add_parser("compare", help="fail if a route regressed against a baseline")
+    compare_parser.add_argument("baseline", type=Path)
+    compare_parser.add_argument("current", type=Path)
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+
+    serialization_parser = commands.add_parser(
+        "serialization", help="compare response serialization paths on a sellers payload",
+    )
+    serialization_parser.add_argument("--sellers", type=int, default=1000)
+    serialization_parser.add_argument("--books-per-seller", type=int, default=10)
+    serialization_parser.add_argument("--repeat", type=int, default=20)
+
+    args = parser.parse_args(argv)
+    if args.command in ("seed", "run") and args.database_url == settings.database_url and not args.yes:
+        parser.error(f"{args.command} would overwrite the application database, pass --yes to do it anyway")
+    return args
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv)
+
+    if args.command == "seed":
+        asyncio.run(seed(args.database_url, VOLUMES[args.volume]))
+        return 0
+
+    if args.command == "run":
+        results = asyncio.run(run_benchmarks(
+            args.database_url, args.base_url, args.requests, args.concurrency, args.route,
+        ))
+        args.output.write_bytes(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+        for route, result in results["routes"].items():
+            print(  # noqa: T201
+                f"{route:40} p50={result['p50_ms']:8.2f}ms p95={result['p95_ms']:8.2f}ms "
+                f"p99={result['p99_ms']:8.2f}ms rps={result['rps']:8.1f} errors={result['errors']}",
+            )
+        return 0
+
+    if args.command == "serialization":
+        results = run_serialization_benchmark(args.sellers, args.books_per_seller, args.repeat)
+        baseline = results["response_model"]["best_ms"]
+        for name, result in results.items():
+            print(  # noqa: T201
+                f"{name:16} best={result['best_ms']:8.2f}ms mean={result['mean_ms']:8.2f}ms "
+                f"speedup={baseline / result['best_ms']:5.1f}x",
+            )
+        return 0
+
+    regressions = compare_results(
+        orjson.loads(args.baseline.read_bytes()), orjson.loads(args.current.read_bytes()), args.threshold,
+    )
+    for regression in regressions:
+        print(regression)  # noqa: T201
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+import asyncio
+import math
+import statistics
+import time
+import tracemalloc
+from contextlib import asynccontextmanager
+
+import httpx
+from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.benchmarks.scenarios import SCENARIOS
+from src.benchmarks.scenarios import BenchContext
+from src.benchmarks.scenarios import Scenario
+from src.configurations.settings import settings
+from src.models.books import Book
+from src.models.sellers import Seller
+
+
+__all__ = ["run_benchmarks", "compare_results", "percentile"]
+
+ALLOC_SAMPLES = 20
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+async def _load_context(database_url: str, random_seed: int) -> BenchContext:
+    engine = create_async_engine(database_url)
+    try:
+        async with engine.connect() as conn:
+            book_ids = (await conn.execute(select(func.min(Book.id), func.max(Book.id)))).one()
+            seller_ids = (await conn.execute(select(func.min(Seller.id), func.max(Seller.id)))).one()
+    finally:
+        await engine.dispose()
+
+    if None in book_ids or None in seller_ids:
+        raise RuntimeError("Database is empty, run the 'seed' command first")
+
+    ctx = BenchContext(book_ids=tuple(book_ids), seller_ids=tuple(seller_ids))
+    ctx.rng.seed(random_seed)
+    return ctx
+
+
+async def _prepare(
+        client: httpx.AsyncClient, scenario: Scenario, ctx: BenchContext, requests: int, concurrency: int,
+) -> list[dict]:
+    if scenario.prepare is None:
+        return [{} for _ in range(requests)]
+
+    prepared: list[dict] = []
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            prepared.append(await scenario.prepare(client, ctx))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return prepared
+
+
+async def _send(
+        client: httpx.AsyncClient, scenario: Scenario, ctx: BenchContext, prepared: dict,
+) -> tuple[float, bool]:
+    started = time.perf_counter()
+    response = await client.request(scenario.method, **scenario.request(ctx, prepared))
+    await response.aread()
+    return time.perf_counter() - started, response.is_success
+
+
+async def _run_scenario(
+        client: httpx.AsyncClient, scenario: Scenario, ctx: BenchContext,
+        requests: int, concurrency: int,
+) -> dict:
+    # Setup requests, such as creating the book a DELETE removes, all run
+    # before the clock starts, so rps only counts the measured requests.
+    pending = await _prepare(client, scenario, ctx, requests, concurrency)
+    latencies: list[float] = []
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        while pending:
+            elapsed, ok = await _send(client, scenario, ctx, pending.pop())
+            latencies.append(elapsed)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall_time = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / wall_time,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def _measure_allocations(client: httpx.AsyncClient, scenario: Scenario, ctx: BenchContext) -> float:
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(ALLOC_SAMPLES):
+            prepared = await scenario.prepare(client, ctx) if scenario.prepare else {}
+            baseline, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            response = await client.request(scenario.method, **scenario.request(ctx, prepared))
+            await response.aread()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append((peak - baseline) / 1024)
+    finally:
+        tracemalloc.stop()
+    return statistics.median(peaks)
+
+
+@asynccontextmanager
+async def _client(base_url: str | None, database_url: str):
+    if base_url:
+        async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+            yield client
+        return
+
+    from src.configurations import database
+    from src.main import app
+
+    # The app reads the database the ids were loaded from, without replicas
+    # that belong to another one.
+    database.SQLALCHEMY_DATABASE_URL = database_url
+    settings.db_replica_urls = []
+    # Every request comes from this one client, and the point is to measure
+    # the handlers rather than the rate limiter.
+    settings.rate_limit_backend = "none"
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            yield client
+
+
+async def run_benchmarks(  # noqa: PLR0913
+        database_url: str,
+        base_url: str | None,
+        requests: int,
+        concurrency: int,
+        routes: list[str] | None = None,
+        random_seed: int = 42,
+) -> dict:
+    ctx = await _load_context(database_url, random_seed)
+    results = {}
+
+    async with _client(base_url, database_url) as client:
+        for scenario in SCENARIOS:
+            if routes and scenario.name not in routes:
+                continue
+
+            result = await _run_scenario(client, scenario, ctx, requests, concurrency)
+            # Allocations can only be traced when the app runs in this process.
+            if base_url is None:
+                result["alloc_peak_kib"] = await _measure_allocations(client, scenario, ctx)
+            results[scenario.name] = result
+
+    return {
+        "meta": {
+            "timestamp": time.time(),
+            "mode": "remote" if base_url else "in-process",
+            "requests": requests,
+            "concurrency": concurrency,
+            "books": ctx.book_ids[1] - ctx.book_ids[0] + 1,
+            "sellers": ctx.seller_ids[1] - ctx.seller_ids[0] + 1,
+        },
+        "routes": results,
+    }
+
+
+def compare_results(baseline: dict, current: dict, threshold: float) -> list[str]:
+    regressions = []
+    for route, base in baseline["routes"].items():
+        if (cur := current["routes"].get(route)) is None:
+            continue
+
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "alloc_peak_kib"):
+            if metric in base and metric in cur and cur[metric] > base[metric] * (1 + threshold):
+                regressions.append(f"{route}: {metric} {base[metric]:.2f} -> {cur[metric]:.2f}")
+
+        if cur["rps"] < base["rps"] * (1 - threshold):
+            regressions.append(f"{route}: rps {base['rps']:.1f} -> {cur['rps']:.1f}")
+
+    return regressions
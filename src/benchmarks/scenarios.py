@@ -0,0 +1,191 @@
+import random
+from collections.abc import Awaitable
+from collections.abc import Callable
+from dataclasses import dataclass
+from dataclasses import field
+
+import httpx
+
+
+__all__ = ["BenchContext", "Scenario", "SCENARIOS"]
+
+API_PREFIX = "/api/v1"
+
+
+@dataclass(slots=True)
+class BenchContext:
+    book_ids: tuple[int, int]
+    seller_ids: tuple[int, int]
+    rng: random.Random = field(default_factory=random.Random)
+
+    def book_id(self) -> int:
+        return self.rng.randint(*self.book_ids)
+
+    def seller_id(self) -> int:
+        return self.rng.randint(*self.seller_ids)
+
+    def new_book(self) -> dict:
+        return {
+            "title": f"Bench {self.rng.randrange(10**9)}",
+            "author": f"Author {self.rng.randrange(1000)}",
+            "year": self.rng.randint(2020, 2025),
+            "count_pages": self.rng.randint(50, 1500),
+            "seller_id": self.seller_id(),
+        }
+
+    def new_seller(self) -> dict:
+        return {
+            "first_name": "Bench", "last_name": "Seller",
+            "email": f"bench{self.rng.randrange(10**9)}@bench.local",
+            "password": "bench_passworD!",
+        }
+
+
+Prepare = Callable[[httpx.AsyncClient, BenchContext], Awaitable[dict]]
+
+
+@dataclass(frozen=True, slots=True)
+class Scenario:
+    method: str
+    path: str
+    request: Callable[[BenchContext, dict], dict]
+    prepare: Prepare | None = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.method} {API_PREFIX}{self.path}"
+
+
+async def _create_book(client: httpx.AsyncClient, ctx: BenchContext) -> dict:
+    response = await client.post(f"{API_PREFIX}/books/", json=ctx.new_book())
+    response.raise_for_status()
+    return response.json()
+
+
+async def _create_books(client: httpx.AsyncClient, ctx: BenchContext) -> dict:
+    response = await client.post(f"{API_PREFIX}/books/bulk", json=[ctx.new_book() for _ in range(100)])
+    response.raise_for_status()
+    return {"ids": [result["id"] for result in response.json()["results"]]}
+
+
+async def _create_seller(client: httpx.AsyncClient, ctx: BenchContext) -> dict:
+    response = await client.post(f"{API_PREFIX}/sellers/", json=ctx.new_seller())
+    response.raise_for_status()
+    return response.json()
+
+
+SCENARIOS = [
+    Scenario(
+        "POST", "/books/",
+        lambda ctx, _: {"url": f"{API_PREFIX}/books/", "json": ctx.new_book()},
+    ),
+    Scenario(
+        "POST", "/books/bulk",
+        lambda ctx, _: {
+            "url": f"{API_PREFIX}/books/bulk", "json": [ctx.new_book() for _ in range(100)],
+        },
+    ),
+    Scenario(
+        "DELETE", "/books/bulk",
+        lambda ctx, books: {"url": f"{API_PREFIX}/books/bulk", "json": books},
+        prepare=_create_books,
+    ),
+    Scenario(
+        "GET", "/books/",
+        lambda ctx, _: {"url": f"{API_PREFIX}/books/", "params": {"after": ctx.book_id()}},
+    ),
+    Scenario(
+        "GET", "/books/search",
+        lambda ctx, _: {
+            "url": f"{API_PREFIX}/books/search", "params": {"q": f"Auth {ctx.rng.randrange(1000)}"},
+        },
+    ),
+    Scenario(
+        "GET", "/books/export",
+        lambda ctx, _: {"url": f"{API_PREFIX}/books/export"},
+    ),
+    Scenario(
+        "GET", "/books/{book_id}",
+        lambda ctx, _: {"url": f"{API_PREFIX}/books/{ctx.book_id()}"},
+    ),
+    Scenario(
+        "DELETE", "/books/{book_id}",
+        lambda ctx, book: {"url": f"{API_PREFIX}/books/{book['id']}"},
+        prepare=_create_book,
+    ),
+    Scenario(
+        "PUT", "/books/{book_id}",
+        lambda ctx, book: {
+            "url": f"{API_PREFIX}/books/{book['id']}",
+            "json": {**book, "title": f"Bench {ctx.rng.randrange(10**9)}"},
+        },
+        prepare=_create_book,
+    ),
+    Scenario(
+        "PATCH", "/books/{book_id}",
+        lambda ctx, book: {
+            "url": f"{API_PREFIX}/books/{book['id']}",
+            "json": {"version": book["version"], "title": f"Bench {ctx.rng.randrange(10**9)}"},
+        },
+        prepare=_create_book,
+    ),
+    Scenario(
+        "POST", "/sellers/",
+        lambda ctx, _: {"url": f"{API_PREFIX}/sellers/", "json": ctx.new_seller()},
+    ),
+    Scenario(
+        "POST", "/sellers/login",
+        lambda ctx, seller: {
+            "url": f"{API_PREFIX}/sellers/login",
+            "json": {"email": seller["email"], "password": "bench_passworD!"},
+        },
+        prepare=_create_seller,
+    ),
+    Scenario(
+        "GET", "/sellers/",
+        lambda ctx, _: {"url": f"{API_PREFIX}/sellers/"},
+    ),
+    Scenario(
+        "GET", "/sellers/stats",
+        lambda ctx, _: {"url": f"{API_PREFIX}/sellers/stats"},
+    ),
+    Scenario(
+        "GET", "/sellers/export",
+        lambda ctx, _: {"url": f"{API_PREFIX}/sellers/export"},
+    ),
+    Scenario(
+        "GET", "/sellers/{seller_id}",
+        lambda ctx, _: {"url": f"{API_PREFIX}/sellers/{ctx.seller_id()}"},
+    ),
+    Scenario(
+        "GET", "/sellers/{seller_id}/stats",
+        lambda ctx, _: {"url": f"{API_PREFIX}/sellers/{ctx.seller_id()}/stats"},
+    ),
+    Scenario(
+        "DELETE", "/sellers/bulk",
+        lambda ctx, seller: {"url": f"{API_PREFIX}/sellers/bulk", "json": {"ids": [seller["id"]]}},
+        prepare=_create_seller,
+    ),
+    Scenario(
+        "DELETE", "/sellers/{seller_id}",
+        lambda ctx, seller: {"url": f"{API_PREFIX}/sellers/{seller['id']}"},
+        prepare=_create_seller,
+    ),
+    Scenario(
+        "PUT", "/sellers/{seller_id}",
+        lambda ctx, seller: {
+            "url": f"{API_PREFIX}/sellers/{seller['id']}",
+            "json": {**seller, "first_name": "Renamed"},
+        },
+        prepare=_create_seller,
+    ),
+    Scenario(
+        "PATCH", "/sellers/{seller_id}",
+        lambda ctx, seller: {
+            "url": f"{API_PREFIX}/sellers/{seller['id']}",
+            # Sellers are created with version 1 and patched once.
+            "json": {"version": 1, "first_name": "Renamed"},
+        },
+        prepare=_create_seller,
+    ),
+]
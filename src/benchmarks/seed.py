@@ -0,0 +1,55 @@
+import random
+
+from sqlalchemy import insert
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.migrations import upgrade
+from src.models.books import Book
+from src.models.sellers import Seller
+
+
+__all__ = ["VOLUMES", "BOOKS_PER_SELLER", "seed"]
+
+VOLUMES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+BOOKS_PER_SELLER = 100
+BATCH_SIZE = 10_000
+AUTHORS_COUNT = 1_000
+
+
+async def seed(database_url: str, books_count: int, random_seed: int = 42) -> None:
+    rng = random.Random(random_seed)
+    sellers_count = max(books_count // BOOKS_PER_SELLER, 1)
+    engine = create_async_engine(database_url)
+
+    try:
+        async with engine.connect() as conn:
+            await conn.run_sync(upgrade)
+
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                f"TRUNCATE {Book.__tablename__}, {Seller.__tablename__} RESTART IDENTITY CASCADE",
+            ))
+
+            for start in range(0, sellers_count, BATCH_SIZE):
+                await conn.execute(insert(Seller), [
+                    {
+                        "first_name": f"Seller{i}", "last_name": "Bench",
+                        "email": f"seller{i}@bench.local", "password": "bench_passworD!",
+                    }
+                    for i in range(start, min(start + BATCH_SIZE, sellers_count))
+                ])
+
+            for start in range(0, books_count, BATCH_SIZE):
+                await conn.execute(insert(Book), [
+                    {
+                        "title": f"Book {i}",
+                        "author": f"Author {rng.randrange(AUTHORS_COUNT)}",
+                        "year": rng.randint(2020, 2025),
+                        "pages": rng.randint(50, 1500),
+                        "seller_id": i % sellers_count + 1,
+                    }
+                    for i in range(start, min(start + BATCH_SIZE, books_count))
+                ])
+    finally:
+        await engine.dispose()
@@ -0,0 +1,70 @@
+import time
+from types import SimpleNamespace
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+from src.schemas import ReturnedAllSellers
+
+
+__all__ = ["make_sellers", "SERIALIZERS", "run_serialization_benchmark"]
+
+
+def make_sellers(sellers_count: int, books_per_seller: int) -> list[dict]:
+    return [
+        {
+            "first_name": f"Seller{seller_id}", "last_name": "Bench",
+            "id": seller_id, "email": f"seller{seller_id}@bench.local", "version": 1,
+            "books": [
+                {
+                    "title": f"Book {book_id}", "author": "Bench Author", "year": 2022,
+                    "id": book_id, "pages": 100,
+                }
+                for book_id in range(seller_id * books_per_seller, (seller_id + 1) * books_per_seller)
+            ],
+        }
+        for seller_id in range(sellers_count)
+    ]
+
+
+def _as_orm(sellers: list[dict]) -> list[SimpleNamespace]:
+    return [
+        SimpleNamespace(**{**seller, "books": [SimpleNamespace(**book) for book in seller["books"]]})
+        for seller in sellers
+    ]
+
+
+def _response_model(sellers: list[dict]) -> bytes:
+    # What FastAPI does for a handler returning ORM objects with response_model:
+    # validate, dump to jsonable python, then encode in the response class.
+    model = ReturnedAllSellers.model_validate({"sellers": _as_orm(sellers)}, from_attributes=True)
+    return ORJSONResponse(model.model_dump(mode="json")).body
+
+
+def _model_dump_json(sellers: list[dict]) -> bytes:
+    model = ReturnedAllSellers.model_validate({"sellers": _as_orm(sellers)}, from_attributes=True)
+    return model.model_dump_json().encode()
+
+
+def _orjson_rows(sellers: list[dict]) -> bytes:
+    return orjson.dumps({"sellers": sellers, "next_cursor": None})
+
+
+SERIALIZERS = {
+    "response_model": _response_model,
+    "model_dump_json": _model_dump_json,
+    "orjson_rows": _orjson_rows,
+}
+
+
+def run_serialization_benchmark(sellers_count: int, books_per_seller: int, repeat: int) -> dict:
+    sellers = make_sellers(sellers_count, books_per_seller)
+    results = {}
+    for name, serializer in SERIALIZERS.items():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            serializer(sellers)
+            timings.append(time.perf_counter() - started)
+        results[name] = {"best_ms": min(timings) * 1000, "mean_ms": sum(timings) / repeat * 1000}
+    return results
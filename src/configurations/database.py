@@ -1,36 +1,251 @@
+import asyncio
+import contextlib
+import itertools
 import logging
+import time
 from collections.abc import AsyncGenerator
+from collections.abc import Awaitable
 from collections.abc import Callable
 
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from src.configurations.settings import settings
-from src.models.base import BaseModel
+from src.middlewares.metrics import instrument_engine
+from src.migrations import current_revision
+from src.migrations import head_revision
 
 
-__all__ = ["global_init", "get_async_session", "create_db_and_tables"]
+__all__ = [
+    "READ_CONSISTENCY_HEADER", "ReplicaSet", "global_init", "get_async_session", "after_commit", "run_after_commit",
+    "get_async_read_session", "get_session_factory", "start_replica_monitor", "stop_replica_monitor",
+    "get_pool_stats", "pool_saturated", "verify_schema_version",
+]
 
-logger = logging.getLogger("__name__")
+READ_CONSISTENCY_HEADER = "X-Read-Consistency"
+
+logger = logging.getLogger(__name__)
 
 __async_engine: AsyncEngine | None = None
 __session_factory: Callable[[], AsyncSession] | None = None
+__read_session_factory: Callable[[], AsyncSession] | None = None
+__replicas: "ReplicaSet | None" = None
+__pool_waits = {"count": 0, "total": 0.0, "max": 0.0}
 
 SQLALCHEMY_DATABASE_URL = settings.database_url
+AFTER_COMMIT_KEY = "after_commit"
+
+
+class ReplicaSet:
+    # Round-robin over replica engines. Picking a replica never connects: one
+    # whose connection fails during a read is skipped, and the monitor probes
+    # it every retry_interval seconds until it answers again. When all of
+    # them are down, callers fall back to the primary.
+    def __init__(self, engines: list[AsyncEngine], retry_interval: float) -> None:
+        self._engines = engines
+        self._session_factories = [_read_session_factory(engine, _ReplicaSession) for engine in engines]
+        self._retry_interval = retry_interval
+        self._down_until = [0.0] * len(engines)
+        self._cursor = itertools.count()
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._engines)
+
+    def healthy(self) -> list[bool]:
+        now = time.monotonic()
+        return [down_until <= now for down_until in self._down_until]
+
+    def pick(self) -> int | None:
+        for _ in range(len(self._engines)):
+            index = next(self._cursor) % len(self._engines)
+            if self._down_until[index] <= time.monotonic():
+                return index
+
+        return None
+
+    def session(self, index: int) -> AsyncSession:
+        return self._session_factories[index]()
+
+    def report(self, index: int, exc: BaseException) -> None:
+        if not _connection_lost(exc):
+            return
+
+        self._down_until[index] = time.monotonic() + self._retry_interval
+        logger.warning("Replica %d is unavailable, skipping it for %.0fs", index, self._retry_interval)
+
+    async def check(self) -> None:
+        for index, engine in enumerate(self._engines):
+            if not self._down_until[index]:
+                continue
+
+            try:
+                async with engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+            except Exception as exc:
+                if not _connection_lost(exc):
+                    raise
+                self._down_until[index] = time.monotonic() + self._retry_interval
+            else:
+                self._down_until[index] = 0.0
+                logger.info("Replica %d is available again", index)
+
+    async def monitor(self) -> None:
+        while True:
+            await asyncio.sleep(self._retry_interval)
+            try:
+                await self.check()
+            except Exception:
+                logger.exception(msg="Exception in replica health check: %s")
+
+    def start(self) -> None:
+        if self._engines and self._task is None:
+            self._task = asyncio.create_task(self.monitor())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+
+class _TimedQueuePool(AsyncAdaptedQueuePool):
+    # Times every checkout, whichever session or stream asks for it: waiting
+    # for a free connection, or opening a new one when the pool has room.
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            _record_pool_wait(time.perf_counter() - started)
+
+
+class _ReplicaSession(AsyncSession):
+    # A query whose replica connection fails is retried once on the session
+    # returned by on_connection_lost, and so are the queries after it: a
+    # replica outage costs the request a round trip instead of an error.
+    on_connection_lost: Callable[[BaseException], AsyncSession] | None = None
+    _fallback: AsyncSession | None = None
+
+    async def _run(self, method: str, *args, **kwargs):
+        if self._fallback is None:
+            try:
+                return await getattr(super(), method)(*args, **kwargs)
+            except Exception as exc:
+                if self.on_connection_lost is None or not _connection_lost(exc):
+                    raise
+                self._fallback = self.on_connection_lost(exc)
+
+        return await getattr(self._fallback, method)(*args, **kwargs)
+
+    async def execute(self, *args, **kwargs):
+        return await self._run("execute", *args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return await self._run("scalar", *args, **kwargs)
+
+    async def scalars(self, *args, **kwargs):
+        return await self._run("scalars", *args, **kwargs)
+
+    async def close(self) -> None:
+        if self._fallback is not None:
+            await self._fallback.close()
+        await super().close()
+
+
+def _connection_lost(exc: BaseException) -> bool:
+    return isinstance(exc, (OSError, asyncio.TimeoutError)) or (
+        isinstance(exc, DBAPIError) and exc.connection_invalidated
+    )
+
+
+def _create_engine(
+        url: str, poolclass: type[AsyncAdaptedQueuePool] = AsyncAdaptedQueuePool, **connect_args,
+) -> AsyncEngine:
+    engine = create_async_engine(
+        url=url,
+        poolclass=poolclass,
+        echo=settings.db_echo,
+        pool_size=settings.max_connection_count,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args={"statement_cache_size": settings.db_statement_cache_size, **connect_args},
+    )
+    instrument_engine(engine.sync_engine)
+    return engine
+
+
+def _read_session_factory(
+        engine: AsyncEngine, class_: type[AsyncSession] = AsyncSession,
+) -> Callable[[], AsyncSession]:
+    # Autocommit shares the engine's pool but never sends BEGIN, COMMIT or
+    # ROLLBACK, so a read costs exactly the round trips of its queries.
+    return async_sessionmaker(engine.execution_options(isolation_level="AUTOCOMMIT"), class_=class_)
 
 
 def global_init() -> None:
-    global __async_engine, __session_factory
+    global __async_engine, __session_factory, __read_session_factory, __replicas
 
     if __session_factory:
         return
 
     if not __async_engine:
-        __async_engine = create_async_engine(url=SQLALCHEMY_DATABASE_URL, echo=True)
+        # Pool waits are reported for the primary pool, next to its size.
+        __async_engine = _create_engine(SQLALCHEMY_DATABASE_URL, poolclass=_TimedQueuePool)
 
     __session_factory = async_sessionmaker(__async_engine)
+    __read_session_factory = _read_session_factory(__async_engine)
+    __replicas = ReplicaSet(
+        [_create_engine(url, timeout=settings.db_replica_connect_timeout) for url in settings.db_replica_urls],
+        retry_interval=settings.db_replica_retry_interval,
+    )
+
+
+def start_replica_monitor() -> None:
+    global __replicas
+
+    if __replicas is None:
+        raise ValueError({"message": "call global_init() first"})
+
+    __replicas.start()
+
+
+async def stop_replica_monitor() -> None:
+    global __replicas
+
+    if __replicas is not None:
+        await __replicas.stop()
+
+
+def _record_pool_wait(elapsed: float) -> None:
+    __pool_waits["count"] += 1
+    __pool_waits["total"] += elapsed
+    __pool_waits["max"] = max(__pool_waits["max"], elapsed)
+
+
+def after_commit(session: AsyncSession, callback: Callable[[], Awaitable[None]]) -> None:
+    session.info.setdefault(AFTER_COMMIT_KEY, []).append(callback)
+
+
+async def run_after_commit(session: AsyncSession) -> None:
+    # The write is already durable here, so a failing callback is logged
+    # instead of turning the response into an error.
+    for callback in session.info.pop(AFTER_COMMIT_KEY, []):
+        try:
+            await callback()
+        except Exception:
+            logger.exception(msg="Exception in after_commit callback: %s")
 
 
 async def get_async_session() -> AsyncGenerator:
@@ -45,19 +260,101 @@ async def get_async_session() -> AsyncGenerator:
         await session.commit()
     except Exception:
         logger.exception(msg="Exception in get_async_session: %s")
+        session.info.pop(AFTER_COMMIT_KEY, None)
+        await session.rollback()
+        raise
+    else:
+        await run_after_commit(session)
+    finally:
+        await session.close()
+
+
+async def get_async_read_session(request: Request) -> AsyncGenerator:
+    global __read_session_factory, __replicas
+
+    if not __read_session_factory or __replicas is None:
+        raise ValueError({"message": "call global_init() first"})
+
+    # Clients that need to read their own writes ask for the primary explicitly.
+    replica = None
+    if __replicas and request.headers.get(READ_CONSISTENCY_HEADER, "").lower() != "primary":
+        replica = __replicas.pick()
+    session = __read_session_factory() if replica is None else __replicas.session(replica)
+    request.state.read_from_replica = replica is not None
+
+    def fall_back_to_primary(exc: BaseException) -> AsyncSession:
+        __replicas.report(replica, exc)
+        request.state.read_from_replica = False
+        return __read_session_factory()
+
+    if replica is not None:
+        session.on_connection_lost = fall_back_to_primary
+
+    # Nothing to commit or roll back: the session is in autocommit mode and
+    # only takes a connection on its first query, if there is one.
+    try:
+        yield session
+    except Exception as exc:
+        logger.exception(msg="Exception in get_async_read_session: %s")
+        if request.state.read_from_replica:
+            __replicas.report(replica, exc)
         raise
     finally:
-        await session.rollback()
         await session.close()
 
 
-async def create_db_and_tables() -> None:
-    from src.models.books import Book  # noqa: F401
-    from src.models.sellers import Seller  # noqa: F401
+def get_session_factory() -> Callable[[], AsyncSession]:
+    global __session_factory
+
+    if not __session_factory:
+        raise ValueError({"message": "call global_init() first"})
+
+    return __session_factory
+
+
+def get_pool_stats() -> dict:
+    global __async_engine, __replicas
+
+    if __async_engine is None:
+        raise ValueError({"message": "call global_init() first"})
+
+    pool = __async_engine.pool
+    waits = __pool_waits["count"]
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.db_max_overflow,
+        "waits": waits,
+        "wait_time_avg_ms": __pool_waits["total"] / waits * 1000 if waits else 0.0,
+        "wait_time_max_ms": __pool_waits["max"] * 1000,
+        "replicas_healthy": __replicas.healthy() if __replicas else [],
+    }
+
+
+def pool_saturated() -> bool:
+    global __async_engine
+
+    if __async_engine is None:
+        return False
+
+    pool = __async_engine.pool
+    return pool.checkedout() >= pool.size() + settings.db_max_overflow
+
+
+async def verify_schema_version() -> None:
     global __async_engine
 
     if __async_engine is None:
         raise ValueError({"message": "call global_init() first"})
 
-    async with __async_engine.begin() as conn:
-        await conn.run_sync(BaseModel.metadata.create_all)
+    # Workers never change the schema: `alembic upgrade head` does that once
+    # per deploy, and every worker only checks it is talking to that schema.
+    async with __async_engine.connect() as conn:
+        current = await conn.run_sync(current_revision)
+
+    if current != head_revision():
+        raise RuntimeError(
+            f"Database schema is at revision {current}, expected {head_revision()}: run `alembic upgrade head`",
+        )
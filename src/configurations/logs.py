@@ -0,0 +1,80 @@
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
+
+import orjson
+
+from src.configurations.settings import settings
+
+
+__all__ = ["JsonFormatter", "setup_logging", "shutdown_logging", "should_log_request"]
+
+_RECORD_ATTRS = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime"}
+
+__listener: QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        payload.update(
+            (key, value) for key, value in record.__dict__.items() if key not in _RECORD_ATTRS
+        )
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return orjson.dumps(payload, default=str).decode()
+
+
+class _DeferredQueueHandler(QueueHandler):
+    # QueueHandler.prepare() formats the record on the calling thread so it
+    # can be pickled for another process. This queue stays in the process,
+    # so the record is passed on as it is and formatted by the listener.
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging() -> None:
+    global __listener
+
+    if __listener:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    if settings.log_json:
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    # Handlers only enqueue records; formatting and the stderr write happen
+    # on the listener thread instead of the event loop.
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [_DeferredQueueHandler(log_queue)]
+    root.setLevel(settings.log_level)
+
+    __listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    __listener.start()
+
+
+def shutdown_logging() -> None:
+    global __listener
+
+    if __listener:
+        __listener.stop()
+        __listener = None
+
+
+def should_log_request(route: str, status_code: int) -> bool:
+    if status_code >= 500:  # noqa: PLR2004
+        return True
+
+    rate = settings.log_sample_rates.get(route, settings.log_sample_rate)
+    return rate >= 1 or random.random() < rate  # noqa: S311
@@ -1,3 +1,6 @@
+from typing import Literal
+
+from pydantic import Field
 from pydantic_settings import BaseSettings
 from pydantic_settings import SettingsConfigDict
 
@@ -9,6 +12,60 @@ class Settings(BaseSettings):
     db_password: str
     db_test_name: str = 'fastapi_project_test_db'
     max_connection_count: int = 10
+    db_max_overflow: int = 5
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_cache_size: int = 100
+    db_echo: bool = False
+    db_replica_urls: list[str] = []
+    db_replica_connect_timeout: float = 2.0
+    db_replica_retry_interval: float = 5.0
+    db_replica_max_lag: float = 1.0
+    cache_backend: Literal["memory", "redis", "none"] = "memory"
+    cache_ttl: float = 60.0
+    cache_max_entries: int = 10_000
+    cache_redis_timeout: float = 0.1
+    redis_url: str = "redis://localhost:6379/0"
+    rate_limit_backend: Literal["memory", "redis", "none"] = "memory"
+    rate_limit_rate: float = 100.0
+    rate_limit_burst: int = 200
+    rate_limit_routes: dict[str, tuple[float, int]] = {}
+    rate_limit_max_clients: int = 100_000
+    rate_limit_trust_forwarded: bool = False
+    rate_limit_trusted_hops: int = Field(default=1, ge=1)
+    rate_limit_redis_timeout: float = 0.1
+    admission_max_in_flight: int = 512
+    admission_max_pool_queue: int = 32
+    admission_retry_after: int = 1
+    compression_encodings: list[Literal["zstd", "br", "gzip"]] = ["zstd", "br", "gzip"]
+    compression_min_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+    compression_zstd_level: int = 3
+    jobs_run_in_app: bool = True
+    jobs_concurrency: int = 4
+    jobs_poll_interval: float = 1.0
+    jobs_lease_timeout: float = 60.0
+    jobs_max_attempts: int = 5
+    jobs_retry_backoff: float = 1.0
+    log_level: str = "INFO"
+    log_json: bool = True
+    log_sample_rate: float = 1.0
+    log_sample_rates: dict[str, float] = {}
+    log_slow_query_ms: float = 200.0
+    password_scrypt_n: int = 2 ** 14
+    password_scrypt_r: int = 8
+    password_scrypt_p: int = 1
+    password_hash_workers: int = 2
+    server_host: str = "0.0.0.0"  # noqa: S104
+    server_port: int = 8000
+    server_workers: int = 0
+    server_backlog: int = 2048
+    server_keepalive_timeout: int = 5
+    server_graceful_timeout: int = 30
+    db_server_max_connections: int = 100
+    db_reserved_connections: int = 10
 
     @property
     def database_url(self) -> str:
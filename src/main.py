@@ -1,27 +1,63 @@
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
-from fastapi.responses import ORJSONResponse
 
-from src.configurations.database import create_db_and_tables
 from src.configurations.database import global_init
+from src.configurations.database import start_replica_monitor
+from src.configurations.database import stop_replica_monitor
+from src.configurations.database import verify_schema_version
+from src.configurations.logs import setup_logging
+from src.configurations.logs import shutdown_logging
+from src.configurations.settings import settings
+from src.middlewares.admission import AdmissionMiddleware
+from src.middlewares.compression import CompressionMiddleware
+from src.middlewares.metrics import MetricsMiddleware
+from src.middlewares.metrics import TimedORJSONResponse
+from src.routers import internal_router
+from src.routers import metrics_router
 from src.routers import v1_router
+from src.services.cache import init_cache
+from src.services.hashing import init_password_hasher
+from src.services.hashing import shutdown_password_hasher
+from src.services.jobs import get_job_queue
+from src.services.jobs import init_job_queue
+from src.services.jobs import shutdown_job_queue
+from src.services.rate_limit import init_rate_limiter
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    setup_logging()
     global_init()
-    await create_db_and_tables()
+    init_cache()
+    init_rate_limiter()
+    init_password_hasher()
+    await verify_schema_version()
+    start_replica_monitor()
+    init_job_queue()
+    if settings.jobs_run_in_app:
+        get_job_queue().start()
     yield
+    await shutdown_job_queue()
+    await stop_replica_monitor()
+    shutdown_password_hasher()
+    shutdown_logging()
 
 
 app = FastAPI(
     title="Book Library App",
     description="Учебное приложение для MTS Shad",
     version="0.0.1",
-    default_response_class=ORJSONResponse,
+    default_response_class=TimedORJSONResponse,
     responses={404: {"description": "Not Found!"}},
     lifespan=lifespan,
 )
 
 app.include_router(v1_router)
+app.include_router(internal_router)
+app.include_router(metrics_router)
+
+# Added first, so it runs inside MetricsMiddleware and rejections are measured too.
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
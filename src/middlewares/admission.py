@@ -0,0 +1,110 @@
+import math
+from collections.abc import Callable
+
+from fastapi import Response
+from fastapi import status
+from starlette.routing import Match
+from starlette.types import ASGIApp
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+from src.configurations.database import pool_saturated
+from src.configurations.settings import settings
+from src.services.rate_limit import RateLimiter
+from src.services.rate_limit import get_rate_limiter
+
+
+__all__ = ["EXEMPT_PREFIXES", "AdmissionMiddleware"]
+
+# Monitoring has to keep answering precisely when the app is overloaded.
+EXEMPT_PREFIXES = ("/internal/", "/metrics")
+
+
+def _client(scope: Scope) -> str:
+    if settings.rate_limit_trust_forwarded:
+        # Each trusted proxy appends the address it got the request from, so
+        # only the last rate_limit_trusted_hops entries can't be forged by
+        # the client; anything to the left of them is whatever it sent.
+        forwarded = [
+            entry.strip()
+            for name, value in scope["headers"] if name == b"x-forwarded-for"
+            for entry in value.decode("latin-1").split(",")
+        ]
+        if len(forwarded) >= settings.rate_limit_trusted_hops:
+            return forwarded[-settings.rate_limit_trusted_hops]
+
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def _route(scope: Scope) -> str | None:
+    # Runs before routing, so the route template is looked up here; the
+    # router does the same linear scan right after.
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return f'{scope["method"]} {route.path}'
+    return None
+
+
+async def _reject(status_code: int, retry_after: float, scope: Scope, receive: Receive, send: Send) -> None:
+    response = Response(status_code=status_code, headers={"Retry-After": str(max(math.ceil(retry_after), 1))})
+    await response(scope, receive, send)
+
+
+class AdmissionMiddleware:
+    def __init__(
+            self,
+            app: ASGIApp,
+            rate_limiter: RateLimiter | None = None,
+            is_pool_saturated: Callable[[], bool] = pool_saturated,
+    ) -> None:
+        self.app = app
+        self._rate_limiter = rate_limiter
+        self._is_pool_saturated = is_pool_saturated
+        self._in_flight = 0
+
+    def _pool_queue_full(self) -> bool:
+        # Once every connection is checked out, requests beyond the pool size
+        # wait in the pool queue for up to DB_POOL_TIMEOUT seconds. A short
+        # queue absorbs bursts; past it, answering 503 right away lets
+        # clients back off instead of piling up behind the pool.
+        pool_size = settings.max_connection_count + settings.db_max_overflow
+        return (
+            self._in_flight >= pool_size + settings.admission_max_pool_queue
+            and self._is_pool_saturated()
+        )
+
+    async def _wait_for_tokens(self, scope: Scope) -> float:
+        rate_limiter = self._rate_limiter or get_rate_limiter()
+        client = _client(scope)
+        wait = await rate_limiter.acquire(client, settings.rate_limit_rate, settings.rate_limit_burst)
+        if wait or not settings.rate_limit_routes:
+            return wait
+
+        route = _route(scope)
+        if route not in settings.rate_limit_routes:
+            return 0.0
+
+        rate, burst = settings.rate_limit_routes[route]
+        return await rate_limiter.acquire(f"{client}:{route}", rate, burst)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        if wait := await self._wait_for_tokens(scope):
+            await _reject(status.HTTP_429_TOO_MANY_REQUESTS, wait, scope, receive, send)
+            return
+
+        if self._in_flight >= settings.admission_max_in_flight or self._pool_queue_full():
+            await _reject(status.HTTP_503_SERVICE_UNAVAILABLE, settings.admission_retry_after, scope, receive, send)
+            return
+
+        self._in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._in_flight -= 1
@@ -0,0 +1,242 @@
+import importlib.util
+import logging
+import zlib
+from abc import ABC
+from abc import abstractmethod
+from collections.abc import Iterable
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp
+from starlette.types import Message
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+from src.configurations.settings import settings
+
+
+__all__ = ["ENCODERS", "CompressionMiddleware", "available_encodings", "negotiate_encoding"]
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+# Below this a chunk compresses faster than a hop to the threadpool.
+THREADPOOL_MIN_SIZE = 256 * 1024
+
+
+class Encoder(ABC):
+    module: str
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes: ...
+
+    @abstractmethod
+    def flush(self) -> bytes: ...
+
+    @abstractmethod
+    def finish(self) -> bytes: ...
+
+
+class GzipEncoder(Encoder):
+    module = "zlib"
+
+    def __init__(self) -> None:
+        self._compressor = zlib.compressobj(settings.compression_gzip_level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder(Encoder):
+    module = "brotli"
+
+    def __init__(self) -> None:
+        import brotli
+
+        self._compressor = brotli.Compressor(quality=settings.compression_brotli_quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdEncoder(Encoder):
+    module = "zstandard"
+
+    def __init__(self) -> None:
+        import zstandard
+
+        self._flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        self._compressor = zstandard.ZstdCompressor(level=settings.compression_zstd_level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(self._flush_block)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+ENCODERS: dict[str, type[Encoder]] = {"gzip": GzipEncoder, "br": BrotliEncoder, "zstd": ZstdEncoder}
+
+
+def available_encodings(preferred: Iterable[str]) -> list[str]:
+    # brotli and zstandard are in requirements.txt but may be left out of an
+    # install; without them clients fall back to gzip.
+    available = []
+    for name in preferred:
+        if importlib.util.find_spec(ENCODERS[name].module) is None:
+            logger.warning(
+                "%s compression is configured but the %r package is not installed", name, ENCODERS[name].module,
+            )
+            continue
+        available.append(name)
+    return available
+
+
+def negotiate_encoding(accept_encoding: str, encodings: list[str]) -> str | None:
+    qualities = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+
+    # Equal qualities are broken by the server's order, which puts the
+    # encodings that are both faster and smaller first.
+    best, best_quality = None, 0.0
+    for name in encodings:
+        quality = qualities.get(name, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def _compressible(headers: Headers) -> bool:
+    return (
+        "content-encoding" not in headers
+        and "no-transform" not in headers.get("cache-control", "")
+        and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+    )
+
+
+def _weaken_etag(headers: MutableHeaders) -> None:
+    # The compressed bytes differ from the ones the ETag was computed over,
+    # so it can only vouch for equivalent content. Bodies too small to
+    # compress get the same weak ETag, so the validator for a resource does
+    # not depend on its size.
+    if (etag := headers.get("etag")) and not etag.startswith("W/"):
+        headers["etag"] = f"W/{etag}"
+
+
+async def _run(function, data: bytes) -> bytes:
+    if len(data) >= THREADPOOL_MIN_SIZE:
+        return await run_in_threadpool(function, data)
+    return function(data)
+
+
+class _CompressingSend:
+    def __init__(self, send: Send, encoding: str | None) -> None:
+        self._send = send
+        self._encoding = encoding
+        self._start: Message | None = None
+        self._encoder: Encoder | None = None
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Held back until the first chunk shows whether the body is
+            # worth compressing.
+            self._start = message
+            return
+
+        if message["type"] != "http.response.body":
+            if self._start is not None:
+                await self._send(self._start)
+                self._start = None
+            await self._send(message)
+            return
+
+        if self._start is not None:
+            await self._send_first(self._start, message)
+            self._start = None
+            return
+
+        if self._encoder is None:
+            await self._send(message)
+            return
+
+        more_body = message.get("more_body", False)
+        body = await _run(self._encoder.compress, message.get("body", b""))
+        body += self._encoder.flush() if more_body else self._encoder.finish()
+        await self._send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+    async def _send_first(self, start: Message, message: Message) -> None:
+        headers = MutableHeaders(raw=start.setdefault("headers", []))
+        # A 304 stands in for the compressed 200 the client cached, so it
+        # carries the same Vary and ETag as that response did.
+        if start["status"] == 204 or (start["status"] != 304 and not _compressible(headers)):
+            await self._send(start)
+            await self._send(message)
+            return
+
+        headers.add_vary_header("Accept-Encoding")
+        if self._encoding is not None:
+            _weaken_etag(headers)
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if start["status"] == 304 or self._encoding is None or (
+                not more_body and len(body) < settings.compression_min_size
+        ):
+            await self._send(start)
+            await self._send(message)
+            return
+
+        self._encoder = ENCODERS[self._encoding]()
+        body = await _run(self._encoder.compress, body)
+        if more_body:
+            # Streams are flushed chunk by chunk, so clients can decode the
+            # rows as they arrive.
+            body += self._encoder.flush()
+            del headers["content-length"]
+        else:
+            body += self._encoder.finish()
+            headers["content-length"] = str(len(body))
+
+        headers["content-encoding"] = self._encoding
+        await self._send(start)
+        await self._send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, encodings: Iterable[str] | None = None) -> None:
+        self.app = app
+        self._encodings = available_encodings(settings.compression_encodings if encodings is None else encodings)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), self._encodings)
+        await self.app(scope, receive, _CompressingSend(send, encoding))
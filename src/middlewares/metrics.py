@@ -0,0 +1,203 @@
+import logging
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp
+from starlette.types import Message
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+from src.configurations.logs import should_log_request
+from src.configurations.settings import settings
+
+
+__all__ = [
+    "RequestMetrics", "MetricsMiddleware", "TimedORJSONResponse",
+    "current_metrics", "instrument_engine", "serialization_timer", "render_metrics",
+]
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+access_logger = logging.getLogger("src.access")
+slow_query_logger = logging.getLogger("src.sql.slow")
+
+_current_metrics: ContextVar["RequestMetrics | None"] = ContextVar("request_metrics", default=None)
+
+
+@dataclass(slots=True)
+class RequestMetrics:
+    db_time: float = 0.0
+    statements: int = 0
+    rows: int = 0
+    serialization_time: float = 0.0
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self) -> None:
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.total += value
+        self.count += 1
+        for index, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+
+_histograms: dict[str, dict[tuple[str, str, str], Histogram]] = {
+    "http_request_duration_seconds": defaultdict(Histogram),
+    "http_request_db_duration_seconds": defaultdict(Histogram),
+    "http_request_serialization_duration_seconds": defaultdict(Histogram),
+}
+_counters: dict[str, dict[tuple[str, str, str], int]] = {
+    "http_requests_total": defaultdict(int),
+    "http_request_db_statements_total": defaultdict(int),
+    "http_request_db_rows_total": defaultdict(int),
+}
+
+
+def current_metrics() -> RequestMetrics | None:
+    return _current_metrics.get()
+
+
+@contextmanager
+def serialization_timer() -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics := _current_metrics.get():
+            metrics.serialization_time += time.perf_counter() - started
+
+
+class TimedORJSONResponse(ORJSONResponse):
+    def render(self, content) -> bytes:
+        with serialization_timer():
+            return super().render(content)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    context.query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    elapsed = time.perf_counter() - context.query_started
+    if elapsed * 1000 >= settings.log_slow_query_ms:
+        slow_query_logger.warning(
+            "Slow query", extra={"duration_ms": round(elapsed * 1000, 2), "statement": statement},
+        )
+
+    if metrics := _current_metrics.get():
+        metrics.db_time += elapsed
+        metrics.statements += 1
+        if cursor.description is not None and cursor.rowcount > 0:
+            metrics.rows += cursor.rowcount
+
+
+def instrument_engine(engine: Engine) -> None:
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _route_name(scope: Scope) -> str:
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+
+def _server_timing(metrics: RequestMetrics, total: float) -> bytes:
+    return (
+        f'total;dur={total * 1000:.2f}, '
+        f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.statements} statements, {metrics.rows} rows", '
+        f'ser;dur={metrics.serialization_time * 1000:.2f}'
+    ).encode()
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(metrics, time.perf_counter() - started)))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_metrics.reset(token)
+            duration = time.perf_counter() - started
+            route = f'{scope["method"]} {_route_name(scope)}'
+            if should_log_request(route, status_code):
+                access_logger.info(
+                    "%s %s", route, status_code,
+                    extra={
+                        "method": scope["method"], "path": scope["path"], "status": status_code,
+                        "duration_ms": round(duration * 1000, 2),
+                        "db_ms": round(metrics.db_time * 1000, 2), "statements": metrics.statements,
+                    },
+                )
+
+            labels = (scope["method"], _route_name(scope), str(status_code))
+            _histograms["http_request_duration_seconds"][labels].observe(duration)
+            _histograms["http_request_db_duration_seconds"][labels].observe(metrics.db_time)
+            _histograms["http_request_serialization_duration_seconds"][labels].observe(
+                metrics.serialization_time,
+            )
+            _counters["http_requests_total"][labels] += 1
+            _counters["http_request_db_statements_total"][labels] += metrics.statements
+            _counters["http_request_db_rows_total"][labels] += metrics.rows
+
+
+def _labels(labels: tuple[str, str, str], **extra: str) -> str:
+    method, route, status_code = labels
+    pairs = {"method": method, "route": route, "status": status_code, **extra}
+    return ",".join(f'{key}="{value}"' for key, value in pairs.items())
+
+
+def render_metrics() -> str:
+    lines = []
+    for name, series in _histograms.items():
+        lines.append(f"# TYPE {name} histogram")
+        for labels, histogram in series.items():
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram.counts, strict=True):
+                cumulative += count
+                lines.append(f"{name}_bucket{{{_labels(labels, le=str(bound))}}} {cumulative}")
+            lines.append(f'{name}_bucket{{{_labels(labels, le="+Inf")}}} {histogram.count}')
+            lines.append(f"{name}_sum{{{_labels(labels)}}} {histogram.total}")
+            lines.append(f"{name}_count{{{_labels(labels)}}} {histogram.count}")
+
+    for name, series in _counters.items():
+        lines.append(f"# TYPE {name} counter")
+        for labels, value in series.items():
+            lines.append(f"{name}{{{_labels(labels)}}} {value}")
+
+    return "\n".join(lines) + "\n"
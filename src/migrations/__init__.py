@@ -0,0 +1,37 @@
+import functools
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy.engine import Connection
+
+
+__all__ = ["alembic_config", "head_revision", "current_revision", "upgrade"]
+
+MIGRATIONS_DIR = Path(__file__).parent
+
+
+def alembic_config() -> Config:
+    config = Config()
+    config.set_main_option("script_location", str(MIGRATIONS_DIR))
+    return config
+
+
+@functools.cache
+def head_revision() -> str | None:
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+def current_revision(connection: Connection) -> str | None:
+    return MigrationContext.configure(connection).get_current_revision()
+
+
+def upgrade(connection: Connection, revision: str = "head") -> None:
+    # For callers that already hold a connection, e.g. through
+    # AsyncConnection.run_sync. It must not be inside a transaction:
+    # concurrent index builds commit on their own.
+    config = alembic_config()
+    config.attributes["connection"] = connection
+    command.upgrade(config, revision)
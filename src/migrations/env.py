@@ -0,0 +1,52 @@
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import pool
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.configurations.settings import settings
+from src.models.base import BaseModel
+from src.models.books import Book  # noqa: F401
+from src.models.deletions import CollectionDeletion  # noqa: F401
+from src.models.jobs import Job  # noqa: F401
+from src.models.sellers import Seller  # noqa: F401
+from src.models.stats import SellerBookStats  # noqa: F401
+
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = BaseModel.metadata
+database_url = config.get_main_option("sqlalchemy.url") or settings.database_url
+
+
+def _run_migrations(connection: Connection) -> None:
+    # One transaction per revision, so a revision can leave it for
+    # CREATE INDEX CONCURRENTLY without taking the others along.
+    context.configure(connection=connection, target_metadata=target_metadata, transaction_per_migration=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def _run_online() -> None:
+    engine = create_async_engine(database_url, poolclass=pool.NullPool)
+    try:
+        async with engine.connect() as connection:
+            await connection.run_sync(_run_migrations)
+    finally:
+        await engine.dispose()
+
+
+if context.is_offline_mode():
+    context.configure(
+        url=database_url, target_metadata=target_metadata, literal_binds=True, transaction_per_migration=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+elif (connection := config.attributes.get("connection")) is not None:
+    _run_migrations(connection)
+else:
+    asyncio.run(_run_online())
@@ -0,0 +1,133 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 12:00:00.000000
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = "0001"
+down_revision: str | None = None
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# seller_book_stats_table is maintained by statement-level triggers on
+# books_table, so bulk inserts, ORM updates and cascading seller deletes all
+# keep it in sync with one grouped upsert per statement instead of one per row.
+STATS_APPLY_FUNCTION = """
+CREATE OR REPLACE FUNCTION seller_book_stats_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE seller_book_stats_table AS stats
+        SET book_count = stats.book_count - delta.book_count,
+            total_pages = stats.total_pages - delta.total_pages
+        FROM (
+            SELECT seller_id, year, count(*) AS book_count, sum(pages) AS total_pages
+            FROM old_rows GROUP BY seller_id, year
+        ) AS delta
+        WHERE stats.seller_id = delta.seller_id AND stats.year = delta.year;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO seller_book_stats_table (seller_id, year, book_count, total_pages)
+        SELECT seller_id, year, count(*), sum(pages)
+        FROM new_rows GROUP BY seller_id, year ORDER BY seller_id, year
+        ON CONFLICT (seller_id, year) DO UPDATE
+        SET book_count = seller_book_stats_table.book_count + excluded.book_count,
+            total_pages = seller_book_stats_table.total_pages + excluded.total_pages;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM seller_book_stats_table AS stats
+        USING (SELECT DISTINCT seller_id, year FROM old_rows) AS touched
+        WHERE stats.seller_id = touched.seller_id AND stats.year = touched.year
+            AND stats.book_count = 0;
+    END IF;
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+STATS_TRIGGERS = {
+    "insert": "REFERENCING NEW TABLE AS new_rows",
+    "update": "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+    "delete": "REFERENCING OLD TABLE AS old_rows",
+}
+
+
+def upgrade() -> None:
+    op.create_table(
+        "sellers_table",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("first_name", sa.String(length=50), nullable=False),
+        sa.Column("last_name", sa.String(length=50), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("password", sa.String(length=100), nullable=False),
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "books_table",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(length=50), nullable=False),
+        sa.Column("author", sa.String(length=100), nullable=False),
+        sa.Column("year", sa.Integer(), nullable=False),
+        sa.Column("pages", sa.Integer(), nullable=False),
+        sa.Column("seller_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "search_vector", postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('simple', title || ' ' || author)", persisted=True),
+            nullable=True,
+        ),
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+        sa.ForeignKeyConstraint(["seller_id"], ["sellers_table.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "seller_book_stats_table",
+        sa.Column("seller_id", sa.Integer(), nullable=False),
+        sa.Column("year", sa.Integer(), nullable=False),
+        sa.Column("book_count", sa.Integer(), nullable=False),
+        sa.Column("total_pages", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["seller_id"], ["sellers_table.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("seller_id", "year"),
+    )
+    op.execute(STATS_APPLY_FUNCTION)
+    for operation, referencing in STATS_TRIGGERS.items():
+        op.execute(
+            f"CREATE TRIGGER books_table_stats_{operation} AFTER {operation.upper()} ON books_table "
+            f"{referencing} FOR EACH STATEMENT EXECUTE FUNCTION seller_book_stats_apply()",
+        )
+
+    op.create_table(
+        "jobs_table",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(length=100), nullable=False),
+        sa.Column("payload", postgresql.JSONB(astext_type=sa.Text()), server_default="{}", nullable=False),
+        sa.Column("status", sa.String(length=20), server_default="pending", nullable=False),
+        sa.Column("attempts", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("max_attempts", sa.Integer(), nullable=False),
+        sa.Column("run_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_jobs_table_runnable", "jobs_table", ["run_at", "id"],
+        postgresql_where=sa.text("status != 'failed'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("jobs_table")
+    for operation in STATS_TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS books_table_stats_{operation} ON books_table")
+    op.execute("DROP FUNCTION IF EXISTS seller_book_stats_apply()")
+    op.drop_table("seller_book_stats_table")
+    op.drop_table("books_table")
+    op.drop_table("sellers_table")
@@ -0,0 +1,64 @@
+"""books indexes, built concurrently
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 12:05:00.000000
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "0002"
+down_revision: str | None = "0001"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+BOOK_INDEXES = {
+    "ix_books_table_author_id": (["author", "id"], {}),
+    "ix_books_table_seller_id_id": (["seller_id", "id"], {}),
+    "ix_books_table_year": (["year"], {}),
+    "ix_books_table_search_vector": (["search_vector"], {"postgresql_using": "gin"}),
+    "ix_books_table_title_trgm": (
+        ["title"], {"postgresql_using": "gin", "postgresql_ops": {"title": "gin_trgm_ops"}},
+    ),
+    "ix_books_table_author_trgm": (
+        ["author"], {"postgresql_using": "gin", "postgresql_ops": {"author": "gin_trgm_ops"}},
+    ),
+}
+
+
+def _drop_if_invalid(name: str) -> None:
+    # A concurrent build that failed or was interrupted leaves an INVALID
+    # index behind, which IF NOT EXISTS would then happily keep. Offline
+    # (--sql) runs have no database to ask.
+    if op.get_context().as_sql:
+        return
+
+    invalid = op.get_bind().scalar(
+        sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+        {"name": name},
+    )
+    if invalid:
+        op.drop_index(name, table_name="books_table", postgresql_concurrently=True)
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # CONCURRENTLY keeps books_table writable while the indexes build, but
+    # cannot run inside a transaction. IF NOT EXISTS lets databases that
+    # were created by metadata.create_all be stamped at 0001 and upgraded.
+    with op.get_context().autocommit_block():
+        for name, (columns, options) in BOOK_INDEXES.items():
+            _drop_if_invalid(name)
+            op.create_index(
+                name, "books_table", columns, postgresql_concurrently=True, if_not_exists=True, **options,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in BOOK_INDEXES:
+            op.drop_index(name, table_name="books_table", postgresql_concurrently=True, if_exists=True)
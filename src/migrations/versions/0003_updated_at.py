@@ -0,0 +1,91 @@
+"""updated_at and deletion markers for conditional list requests
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 18:00:00.000000
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "0003"
+down_revision: str | None = "0002"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+TABLES = ("books_table", "sellers_table")
+
+RECORD_DELETION_FUNCTION = """
+CREATE OR REPLACE FUNCTION collection_deletions_record() RETURNS trigger AS $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM old_rows) THEN
+        INSERT INTO collection_deletions_table (collection, deleted_at)
+        VALUES (TG_TABLE_NAME, clock_timestamp())
+        ON CONFLICT (collection) DO UPDATE
+        SET deleted_at = greatest(collection_deletions_table.deleted_at, excluded.deleted_at);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def _drop_if_invalid(name: str, table: str) -> None:
+    # See 0002: an interrupted concurrent build leaves an INVALID index.
+    if op.get_context().as_sql:
+        return
+
+    invalid = op.get_bind().scalar(
+        sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+        {"name": name},
+    )
+    if invalid:
+        op.drop_index(name, table_name=table, postgresql_concurrently=True)
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        # now() is stable, so existing rows get it without rewriting the
+        # table; new and updated rows get clock_timestamp(), which keeps
+        # moving inside long transactions.
+        op.add_column(
+            table,
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        )
+        op.alter_column(table, "updated_at", server_default=sa.text("clock_timestamp()"))
+
+    op.create_table(
+        "collection_deletions_table",
+        sa.Column("collection", sa.String(length=63), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("collection"),
+    )
+    op.execute(RECORD_DELETION_FUNCTION)
+    for table in TABLES:
+        op.execute(
+            f"CREATE TRIGGER {table}_record_deletion AFTER DELETE ON {table} "
+            "REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION collection_deletions_record()",
+        )
+
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            name = f"ix_{table}_updated_at"
+            _drop_if_invalid(name, table)
+            op.create_index(name, table, ["updated_at"], postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.drop_index(
+                f"ix_{table}_updated_at", table_name=table, postgresql_concurrently=True, if_exists=True,
+            )
+
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_record_deletion ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS collection_deletions_record()")
+    op.drop_table("collection_deletions_table")
+    for table in TABLES:
+        op.drop_column(table, "updated_at")
@@ -0,0 +1,116 @@
+"""lock seller stats rows in key order
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 10:00:00.000000
+"""
+from collections.abc import Sequence
+
+from alembic import op
+
+
+revision: str = "0004"
+down_revision: str | None = "0003"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+STATS_APPLY_FUNCTION = """
+CREATE OR REPLACE FUNCTION seller_book_stats_apply() RETURNS trigger AS $$
+BEGIN
+    -- Concurrent statements touching the same sellers must take the row
+    -- locks in one order, or they deadlock on each other's UPDATE. An
+    -- UPDATE that moves books locks the keys it leaves and the ones it
+    -- joins together.
+    IF TG_OP = 'INSERT' THEN
+        PERFORM 1 FROM seller_book_stats_table AS stats
+        WHERE (stats.seller_id, stats.year) IN (SELECT seller_id, year FROM new_rows)
+        ORDER BY stats.seller_id, stats.year
+        FOR UPDATE;
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM 1 FROM seller_book_stats_table AS stats
+        WHERE (stats.seller_id, stats.year) IN (
+            SELECT seller_id, year FROM old_rows UNION SELECT seller_id, year FROM new_rows
+        )
+        ORDER BY stats.seller_id, stats.year
+        FOR UPDATE;
+    ELSE
+        PERFORM 1 FROM seller_book_stats_table AS stats
+        WHERE (stats.seller_id, stats.year) IN (SELECT seller_id, year FROM old_rows)
+        ORDER BY stats.seller_id, stats.year
+        FOR UPDATE;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE seller_book_stats_table AS stats
+        SET book_count = stats.book_count - delta.book_count,
+            total_pages = stats.total_pages - delta.total_pages
+        FROM (
+            SELECT seller_id, year, count(*) AS book_count, sum(pages) AS total_pages
+            FROM old_rows GROUP BY seller_id, year
+        ) AS delta
+        WHERE stats.seller_id = delta.seller_id AND stats.year = delta.year;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO seller_book_stats_table (seller_id, year, book_count, total_pages)
+        SELECT seller_id, year, count(*), sum(pages)
+        FROM new_rows GROUP BY seller_id, year ORDER BY seller_id, year
+        ON CONFLICT (seller_id, year) DO UPDATE
+        SET book_count = seller_book_stats_table.book_count + excluded.book_count,
+            total_pages = seller_book_stats_table.total_pages + excluded.total_pages;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM seller_book_stats_table AS stats
+        USING (SELECT DISTINCT seller_id, year FROM old_rows) AS touched
+        WHERE stats.seller_id = touched.seller_id AND stats.year = touched.year
+            AND stats.book_count = 0;
+    END IF;
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+PREVIOUS_STATS_APPLY_FUNCTION = """
+CREATE OR REPLACE FUNCTION seller_book_stats_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE seller_book_stats_table AS stats
+        SET book_count = stats.book_count - delta.book_count,
+            total_pages = stats.total_pages - delta.total_pages
+        FROM (
+            SELECT seller_id, year, count(*) AS book_count, sum(pages) AS total_pages
+            FROM old_rows GROUP BY seller_id, year
+        ) AS delta
+        WHERE stats.seller_id = delta.seller_id AND stats.year = delta.year;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO seller_book_stats_table (seller_id, year, book_count, total_pages)
+        SELECT seller_id, year, count(*), sum(pages)
+        FROM new_rows GROUP BY seller_id, year ORDER BY seller_id, year
+        ON CONFLICT (seller_id, year) DO UPDATE
+        SET book_count = seller_book_stats_table.book_count + excluded.book_count,
+            total_pages = seller_book_stats_table.total_pages + excluded.total_pages;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM seller_book_stats_table AS stats
+        USING (SELECT DISTINCT seller_id, year FROM old_rows) AS touched
+        WHERE stats.seller_id = touched.seller_id AND stats.year = touched.year
+            AND stats.book_count = 0;
+    END IF;
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    op.execute(STATS_APPLY_FUNCTION)
+
+
+def downgrade() -> None:
+    op.execute(PREVIOUS_STATS_APPLY_FUNCTION)
@@ -0,0 +1,79 @@
+"""append-only deletion markers
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 10:00:00.000000
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "0005"
+down_revision: str | None = "0004"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+TABLE = "collection_deletions_table"
+INDEX = "ix_collection_deletions_table_collection_deleted_at"
+
+RECORD_DELETION_FUNCTION = """
+CREATE OR REPLACE FUNCTION collection_deletions_record() RETURNS trigger AS $$
+DECLARE
+    stamp timestamptz := clock_timestamp();
+BEGIN
+    IF EXISTS (SELECT 1 FROM old_rows) THEN
+        -- Each statement appends a row of its own instead of updating one
+        -- shared row, which would hold every other deleting transaction
+        -- until this one commits. Older markers are folded into the new one
+        -- on the way; rows another transaction is already removing are
+        -- skipped rather than waited for.
+        DELETE FROM collection_deletions_table
+        WHERE id IN (
+            SELECT id FROM collection_deletions_table
+            WHERE collection = TG_TABLE_NAME AND deleted_at <= stamp
+            FOR UPDATE SKIP LOCKED
+        );
+        INSERT INTO collection_deletions_table (collection, deleted_at) VALUES (TG_TABLE_NAME, stamp);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+PREVIOUS_RECORD_DELETION_FUNCTION = """
+CREATE OR REPLACE FUNCTION collection_deletions_record() RETURNS trigger AS $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM old_rows) THEN
+        INSERT INTO collection_deletions_table (collection, deleted_at)
+        VALUES (TG_TABLE_NAME, clock_timestamp())
+        ON CONFLICT (collection) DO UPDATE
+        SET deleted_at = greatest(collection_deletions_table.deleted_at, excluded.deleted_at);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    # The table holds a row per collection, so it is changed in place.
+    op.drop_constraint(f"{TABLE}_pkey", TABLE, type_="primary")
+    op.add_column(TABLE, sa.Column("id", sa.Integer(), sa.Identity(), nullable=False))
+    op.create_primary_key(f"{TABLE}_pkey", TABLE, ["id"])
+    op.create_index(INDEX, TABLE, ["collection", "deleted_at"])
+    op.execute(RECORD_DELETION_FUNCTION)
+
+
+def downgrade() -> None:
+    op.execute(PREVIOUS_RECORD_DELETION_FUNCTION)
+    op.execute(
+        f"DELETE FROM {TABLE} AS marker USING {TABLE} AS newer "
+        "WHERE newer.collection = marker.collection "
+        "AND (newer.deleted_at, newer.id) > (marker.deleted_at, marker.id)",
+    )
+    op.drop_index(INDEX, table_name=TABLE)
+    op.drop_constraint(f"{TABLE}_pkey", TABLE, type_="primary")
+    op.drop_column(TABLE, "id")
+    op.create_primary_key(f"{TABLE}_pkey", TABLE, ["collection"])
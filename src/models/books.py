@@ -1,5 +1,12 @@
+from datetime import datetime
+
+from sqlalchemy import Computed
+from sqlalchemy import DateTime
 from sqlalchemy import ForeignKey
+from sqlalchemy import Index
 from sqlalchemy import String
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped
 from sqlalchemy.orm import mapped_column
 from sqlalchemy.orm import relationship
@@ -7,8 +14,26 @@ from sqlalchemy.orm import relationship
 from .base import BaseModel
 
 
+SEARCH_CONFIG = "simple"
+
+
 class Book(BaseModel):
     __tablename__ = "books_table"
+    __table_args__ = (
+        Index("ix_books_table_author_id", "author", "id"),
+        Index("ix_books_table_seller_id_id", "seller_id", "id"),
+        Index("ix_books_table_year", "year"),
+        Index("ix_books_table_updated_at", "updated_at"),
+        Index("ix_books_table_search_vector", "search_vector", postgresql_using="gin"),
+        Index(
+            "ix_books_table_title_trgm", "title",
+            postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_books_table_author_trgm", "author",
+            postgresql_using="gin", postgresql_ops={"author": "gin_trgm_ops"},
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     title: Mapped[str] = mapped_column(String(50), nullable=False)
@@ -19,4 +44,17 @@ class Book(BaseModel):
         ForeignKey("sellers_table.id", ondelete="CASCADE"),
         nullable=False,
     )
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(f"to_tsvector('{SEARCH_CONFIG}', title || ' ' || author)", persisted=True),
+        deferred=True,
+    )
+    version: Mapped[int] = mapped_column(nullable=False, default=1, server_default="1")
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False,
+        server_default=func.clock_timestamp(), onupdate=func.clock_timestamp(),
+    )
     seller: Mapped["Seller"] = relationship(back_populates="books")  # noqa: F821
+
+    __mapper_args__ = {"version_id_col": version}
+
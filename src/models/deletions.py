@@ -0,0 +1,26 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime
+from sqlalchemy import Identity
+from sqlalchemy import Index
+from sqlalchemy import String
+from sqlalchemy.orm import Mapped
+from sqlalchemy.orm import mapped_column
+
+from .base import BaseModel
+
+
+# Rows carry updated_at, but a delete leaves nothing behind to carry it.
+# Statement-level triggers created in migration 0003 record here when a
+# table last lost rows, so list validators notice deletions too. Since
+# migration 0005 every deleting statement appends a row and folds the older
+# ones into it, so the latest deletion is the newest row of a collection.
+class CollectionDeletion(BaseModel):
+    __tablename__ = "collection_deletions_table"
+    __table_args__ = (
+        Index("ix_collection_deletions_table_collection_deleted_at", "collection", "deleted_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Identity(), primary_key=True)
+    collection: Mapped[str] = mapped_column(String(63), nullable=False)
+    deleted_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,30 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime
+from sqlalchemy import Index
+from sqlalchemy import String
+from sqlalchemy import func
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped
+from sqlalchemy.orm import mapped_column
+
+from .base import BaseModel
+
+
+class Job(BaseModel):
+    __tablename__ = "jobs_table"
+    __table_args__ = (
+        # Workers only ever look for runnable jobs; finished ones are deleted
+        # and failed ones stay out of the index.
+        Index("ix_jobs_table_runnable", "run_at", "id", postgresql_where=text("status != 'failed'")),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kind: Mapped[str] = mapped_column(String(100), nullable=False)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False, server_default="{}")
+    status: Mapped[str] = mapped_column(String(20), nullable=False, server_default="pending")
+    attempts: Mapped[int] = mapped_column(nullable=False, server_default="0")
+    max_attempts: Mapped[int] = mapped_column(nullable=False)
+    run_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error: Mapped[str | None]
@@ -1,4 +1,9 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime
+from sqlalchemy import Index
 from sqlalchemy import String
+from sqlalchemy import func
 from sqlalchemy.orm import Mapped
 from sqlalchemy.orm import mapped_column
 from sqlalchemy.orm import relationship
@@ -8,12 +13,24 @@ from .base import BaseModel
 
 class Seller(BaseModel):
     __tablename__ = "sellers_table"
+    __table_args__ = (
+        Index("ix_sellers_table_updated_at", "updated_at"),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True)
     first_name: Mapped[str] = mapped_column(String(50), nullable=False)
     last_name: Mapped[str] = mapped_column(String(50), nullable=False)
     email: Mapped[str]
     password: Mapped[str] = mapped_column(String(100), nullable=False)
+    version: Mapped[int] = mapped_column(nullable=False, default=1, server_default="1")
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False,
+        server_default=func.clock_timestamp(), onupdate=func.clock_timestamp(),
+    )
     books: Mapped[list["Book"]] = relationship(  # noqa: F821
         back_populates="seller",
         cascade="all, delete-orphan",
+        passive_deletes=True,
     )
+
+    __mapper_args__ = {"version_id_col": version}
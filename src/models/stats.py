@@ -0,0 +1,18 @@
+from sqlalchemy import ForeignKey
+from sqlalchemy.orm import Mapped
+from sqlalchemy.orm import mapped_column
+
+from .base import BaseModel
+
+
+# Kept in sync with books_table by the statement-level triggers created in
+# migration 0001.
+class SellerBookStats(BaseModel):
+    __tablename__ = "seller_book_stats_table"
+
+    seller_id: Mapped[int] = mapped_column(
+        ForeignKey("sellers_table.id", ondelete="CASCADE"), primary_key=True,
+    )
+    year: Mapped[int] = mapped_column(primary_key=True)
+    book_count: Mapped[int] = mapped_column(nullable=False)
+    total_pages: Mapped[int] = mapped_column(nullable=False)
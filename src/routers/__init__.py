@@ -1,9 +1,13 @@
 from fastapi import APIRouter
 
+from .internal import internal_router
+from .internal import metrics_router
 from .v1.books import books_router
 from .v1.sellers import sellers_router
 
 
+__all__ = ["v1_router", "internal_router", "metrics_router"]
+
 v1_router = APIRouter(tags=["v1"], prefix="/api/v1")
 
 v1_router.include_router(books_router)
@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from src.configurations.database import get_pool_stats
+from src.middlewares.metrics import render_metrics
+from src.schemas import PoolStatus
+
+
+internal_router = APIRouter(
+    tags=["internal"],
+    prefix="/internal",
+)
+
+metrics_router = APIRouter(tags=["internal"])
+
+
+@internal_router.get("/pool", response_model=PoolStatus)
+async def get_pool_status():
+    return get_pool_stats()
+
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -1,19 +1,58 @@
+import re
+from collections.abc import Callable
 from typing import Annotated
 
+import orjson
 from fastapi import APIRouter
 from fastapi import Depends
+from fastapi import Query
+from fastapi import Request
 from fastapi import Response
 from fastapi import status
-from icecream import ic
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import Integer
+from sqlalchemy import any_
+from sqlalchemy import delete
+from sqlalchemy import func
+from sqlalchemy import insert
+from sqlalchemy import literal
+from sqlalchemy import or_
 from sqlalchemy import select
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
 
+from src.configurations.database import get_async_read_session
 from src.configurations.database import get_async_session
+from src.configurations.database import get_session_factory
+from src.models.books import SEARCH_CONFIG
 from src.models.books import Book
 from src.models.sellers import Seller
+from src.schemas import INT4_MAX
+from src.schemas import INT4_MIN
+from src.schemas import BulkDelete
 from src.schemas import IncomingBook
+from src.schemas import PatchBook
 from src.schemas import ReturnedAllBooks
 from src.schemas import ReturnedBook
+from src.schemas import ReturnedBulkBooks
+from src.schemas import ReturnedBulkDelete
+from src.schemas import ReturnedFoundBooks
+from src.schemas import UpdateBook
+from src.services.cache import BOOKS_LIST_PREFIX
+from src.services.cache import CacheBackend
+from src.services.cache import CacheEntry
+from src.services.cache import book_key
+from src.services.cache import cached_response
+from src.services.cache import get_cache
+from src.services.cache import invalidate_books
+from src.services.export import NDJSON_MEDIA_TYPE
+from src.services.export import stream_ndjson
+from src.services.freshness import last_modified
+from src.services.serialization import dump_json
+from src.services.serialization import json_response
 
 
 books_router = APIRouter(
@@ -22,60 +61,292 @@ books_router = APIRouter(
 )
 
 DBSession = Annotated[AsyncSession, Depends(get_async_session)]
+DBReadSession = Annotated[AsyncSession, Depends(get_async_read_session)]
+SessionFactory = Annotated[Callable[[], AsyncSession], Depends(get_session_factory)]
+Cache = Annotated[CacheBackend, Depends(get_cache)]
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_BULK_SIZE = 50_000
+MAX_SEARCH_OFFSET = 10_000
+
+BOOK_COLUMNS = (Book.id, Book.title, Book.author, Book.year, Book.pages, Book.seller_id, Book.version)
+BOOK_FIELDS = tuple(column.key for column in BOOK_COLUMNS)
 
 
 @books_router.post("/", response_model=ReturnedBook, status_code=status.HTTP_201_CREATED)
-async def create_book(book: IncomingBook, session: DBSession):
+async def create_book(book: IncomingBook, session: DBSession, cache: Cache):
     if not await session.get(Seller, book.seller_id):
         return Response(
             status_code=status.HTTP_404_NOT_FOUND,
         )
 
-    new_book = Book(title=book.title, author=book.author, year=book.year, pages=book.pages, seller_id=book.seller_id)
+    new_book = (await session.execute(
+        insert(Book)
+        .values(title=book.title, author=book.author, year=book.year, pages=book.pages, seller_id=book.seller_id)
+        .returning(*BOOK_COLUMNS),
+    )).one()
+    await invalidate_books(cache, seller_ids=[book.seller_id], session=session)
+
+    return json_response(new_book._asdict(), status_code=status.HTTP_201_CREATED)
+
+
+def _parse_bulk_body(body: bytes, content_type: str) -> list:
+    if content_type.startswith(NDJSON_MEDIA_TYPE):
+        items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(orjson.loads(line))
+            except orjson.JSONDecodeError:
+                items.append(None)
+        return items
+
+    items = orjson.loads(body)
+    if not isinstance(items, list):
+        raise TypeError("Expected a JSON array of books")
+    return items
+
+
+@books_router.post("/bulk", response_model=ReturnedBulkBooks)
+async def create_books_bulk(request: Request, session: DBSession, cache: Cache):
+    try:
+        items = _parse_bulk_body(
+            await request.body(), request.headers.get("content-type", ""),
+        )
+    except (orjson.JSONDecodeError, TypeError):
+        return Response(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    if len(items) > MAX_BULK_SIZE:
+        return Response(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    results: list[dict | None] = [None] * len(items)
+    books: dict[int, IncomingBook] = {}
+    for index, item in enumerate(items):
+        try:
+            books[index] = IncomingBook.model_validate(item)
+        except ValidationError as exc:
+            results[index] = {
+                "index": index, "status": "error", "id": None, "detail": exc.errors()[0]["msg"],
+            }
+
+    seller_ids = {book.seller_id for book in books.values()}
+    existing_seller_ids = set()
+    if seller_ids:
+        existing_seller_ids = set(await session.scalars(
+            select(Seller.id).where(Seller.id == any_(literal(list(seller_ids), ARRAY(Integer)))),
+        ))
+
+    for index, book in list(books.items()):
+        if book.seller_id not in existing_seller_ids:
+            results[index] = {
+                "index": index, "status": "error", "id": None, "detail": "Seller not found",
+            }
+            del books[index]
+
+    if books:
+        new_ids = await session.scalars(
+            insert(Book).returning(Book.id, sort_by_parameter_order=True),
+            [
+                {
+                    "title": book.title, "author": book.author, "year": book.year,
+                    "pages": book.pages, "seller_id": book.seller_id,
+                }
+                for book in books.values()
+            ],
+        )
+        for index, new_id in zip(books, new_ids, strict=True):
+            results[index] = {"index": index, "status": "created", "id": new_id, "detail": None}
+        await invalidate_books(
+            cache, seller_ids={book.seller_id for book in books.values()}, session=session,
+        )
+
+    return json_response({
+        "created": len(books), "failed": len(items) - len(books), "results": results,
+    })
+
 
-    session.add(new_book)
-    await session.flush()
+@books_router.delete("/bulk", response_model=ReturnedBulkDelete)
+async def delete_books_bulk(bulk: BulkDelete, session: DBSession, cache: Cache):
+    if len(bulk.ids) > MAX_BULK_SIZE:
+        return Response(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
 
-    return new_book
+    # One array parameter instead of an IN list, which would run into the
+    # protocol's bind parameter limit for large batches.
+    deleted = (await session.execute(
+        delete(Book.__table__)
+        .where(Book.id == any_(literal(bulk.ids, ARRAY(Integer))))
+        .returning(Book.id, Book.seller_id),
+    )).all()
+
+    deleted_ids = {book.id for book in deleted}
+    await invalidate_books(cache, deleted_ids, {book.seller_id for book in deleted}, session=session)
+    return json_response({
+        "deleted": sorted(deleted_ids),
+        "not_found": sorted(set(bulk.ids) - deleted_ids),
+    })
 
 
 @books_router.get("/", response_model=ReturnedAllBooks)
-async def get_all_books(session: DBSession):
-    query = select(Book)
-    result = await session.execute(query)
-    books = result.scalars().all()
-    return {"books": books}
+async def get_all_books(  # noqa: PLR0913
+        request: Request,
+        session: DBReadSession,
+        cache: Cache,
+        limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+        after: Annotated[int | None, Query(ge=0, le=INT4_MAX)] = None,
+        author: str | None = None,
+        year_from: Annotated[int | None, Query(ge=INT4_MIN, le=INT4_MAX)] = None,
+        year_to: Annotated[int | None, Query(ge=INT4_MIN, le=INT4_MAX)] = None,
+        seller_id: Annotated[int | None, Query(ge=INT4_MIN, le=INT4_MAX)] = None,
+):
+    # The page carries when books_table last changed, which becomes its
+    # Last-Modified header without a second round trip. It is the last
+    # column of every row, after the book itself.
+    query = select(*BOOK_COLUMNS, last_modified(Book).label("changed_at")).order_by(Book.id).limit(limit + 1)
+    if after is not None:
+        query = query.where(Book.id > after)
+    if author is not None:
+        query = query.where(Book.author == author)
+    if year_from is not None:
+        query = query.where(Book.year >= year_from)
+    if year_to is not None:
+        query = query.where(Book.year <= year_to)
+    if seller_id is not None:
+        query = query.where(Book.seller_id == seller_id)
+
+    async def build() -> CacheEntry:
+        books = (await session.execute(query)).all()
+        changed_at = books[0].changed_at if books else None
+
+        next_cursor = None
+        if len(books) > limit:
+            books = books[:limit]
+            next_cursor = books[-1].id
+
+        body = dump_json({
+            "books": [dict(zip(BOOK_FIELDS, book[:-1], strict=True)) for book in books],
+            "next_cursor": next_cursor,
+        })
+        return CacheEntry.from_body(body, changed_at)
+
+    params = orjson.dumps([limit, after, author, year_from, year_to, seller_id]).decode()
+    return await cached_response(request, cache, BOOKS_LIST_PREFIX + params, build)
+
+
+@books_router.get("/search", response_model=ReturnedFoundBooks)
+async def search_books(
+        session: DBReadSession,
+        q: Annotated[str, Query(min_length=1, max_length=100)],
+        limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+        offset: Annotated[int, Query(ge=0, le=MAX_SEARCH_OFFSET)] = 0,
+):
+    # Every word is matched as a prefix against the tsvector column, and
+    # pg_trgm similarity on title/author catches misspelled queries.
+    words = re.findall(r"\w+", q.lower())
+    if not words:
+        return json_response({"books": [], "next_offset": None})
+
+    ts_query = func.to_tsquery(SEARCH_CONFIG, " & ".join(f"{word}:*" for word in words))
+    rank = func.ts_rank(Book.search_vector, ts_query) + func.greatest(
+        func.similarity(Book.title, q), func.similarity(Book.author, q),
+    )
+    query = (
+        select(*BOOK_COLUMNS)
+        .where(or_(
+            Book.search_vector.bool_op("@@")(ts_query),
+            Book.title.bool_op("%")(q),
+            Book.author.bool_op("%")(q),
+        ))
+        .order_by(rank.desc(), Book.id)
+        .offset(offset)
+        .limit(limit + 1)
+    )
+    books = (await session.execute(query)).all()
+
+    next_offset = None
+    if len(books) > limit:
+        books = books[:limit]
+        next_offset = offset + limit
+
+    return json_response({"books": [book._asdict() for book in books], "next_offset": next_offset})
+
+
+@books_router.get("/export", response_class=StreamingResponse)
+async def export_books(session_factory: SessionFactory):
+    query = select(*BOOK_COLUMNS).order_by(Book.id)
+    return StreamingResponse(
+        stream_ndjson(session_factory, query), media_type=NDJSON_MEDIA_TYPE,
+    )
 
 
 @books_router.get("/{book_id}", response_model=ReturnedBook)
-async def get_book(book_id: int, session: DBSession):
-    if result := await session.get(Book, book_id):
-        return result
+async def get_book(book_id: int, request: Request, session: DBReadSession, cache: Cache):
+    async def build() -> bytes | None:
+        book = (await session.execute(select(*BOOK_COLUMNS).where(Book.id == book_id))).first()
+        return dump_json(book._asdict()) if book else None
 
-    return Response(status_code=status.HTTP_404_NOT_FOUND)
+    return await cached_response(request, cache, book_key(book_id), build)
 
 
 @books_router.delete("/{book_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_book(book_id: int, session: DBSession):
-    deleted_book = await session.get(Book, book_id)
-    ic(deleted_book)
-    if deleted_book:
-        await session.delete(deleted_book)
-        return None
+async def delete_book(book_id: int, session: DBSession, cache: Cache):
+    result = await session.execute(
+        delete(Book.__table__).where(Book.id == book_id).returning(Book.seller_id),
+    )
+    if (seller_id := result.scalar()) is None:
+        return Response(status_code=status.HTTP_404_NOT_FOUND)
 
-    return Response(status_code=status.HTTP_404_NOT_FOUND)
+    await invalidate_books(cache, [book_id], [seller_id], session=session)
+    return None
 
 
 @books_router.put("/{book_id}", response_model=ReturnedBook)
-async def update_book(book_id: int, new_book_data: ReturnedBook, session: DBSession):
+async def update_book(book_id: int, new_book_data: UpdateBook, session: DBSession, cache: Cache):
     if updated_book := await session.get(Book, book_id):
+        old_seller_id = updated_book.seller_id
         updated_book.author = new_book_data.author
         updated_book.title = new_book_data.title
         updated_book.year = new_book_data.year
         updated_book.pages = new_book_data.pages
         updated_book.seller_id = new_book_data.seller_id
 
-        await session.flush()
-        return updated_book
+        # The version check fails when the row changed since it was read.
+        try:
+            await session.flush()
+        except StaleDataError:
+            await session.rollback()
+            return Response(status_code=status.HTTP_409_CONFLICT)
+        await invalidate_books(cache, [book_id], {old_seller_id, updated_book.seller_id}, session=session)
+        return json_response({column.key: getattr(updated_book, column.key) for column in BOOK_COLUMNS})
 
     return Response(status_code=status.HTTP_404_NOT_FOUND)
+
+
+@books_router.patch("/{book_id}", response_model=ReturnedBook)
+async def patch_book(book_id: int, changes: PatchBook, session: DBSession, cache: Cache):
+    # One round trip: the version check, the partial update and the read-back
+    # happen in a single UPDATE. The self-join keeps the pre-update seller_id
+    # so a moved book invalidates both sellers.
+    old = Book.__table__.alias("old")
+    conditions = [Book.id == book_id, Book.version == changes.version, old.c.id == Book.id]
+    if changes.seller_id is not None:
+        # A missing seller fails the UPDATE like a stale version does, instead
+        # of raising on the foreign key.
+        conditions.append(select(Seller.id).where(Seller.id == changes.seller_id).exists())
+
+    result = await session.execute(
+        update(Book.__table__)
+        .where(*conditions)
+        .values(**changes.model_dump(exclude_unset=True, exclude={"version"}), version=Book.version + 1)
+        .returning(*BOOK_COLUMNS, old.c.seller_id.label("old_seller_id")),
+    )
+    if (book := result.first()) is None:
+        version = await session.scalar(select(Book.version).where(Book.id == book_id))
+        if version is not None and version != changes.version:
+            return Response(status_code=status.HTTP_409_CONFLICT)
+        return Response(status_code=status.HTTP_404_NOT_FOUND)
+
+    book = book._asdict()
+    await invalidate_books(cache, [book_id], {book.pop("old_seller_id"), book["seller_id"]}, session=session)
+    return json_response(book)
@@ -1,23 +1,64 @@
+from collections.abc import Callable
+from collections.abc import Iterable
 from typing import Annotated
 
+import orjson
 from fastapi import APIRouter
 from fastapi import Depends
+from fastapi import Query
+from fastapi import Request
 from fastapi import Response
 from fastapi import status
-from icecream import ic
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Integer
+from sqlalchemy import Text
+from sqlalchemy import any_
+from sqlalchemy import cast
+from sqlalchemy import delete
+from sqlalchemy import func
+from sqlalchemy import literal
+from sqlalchemy import literal_column
 from sqlalchemy import select
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.exc import StaleDataError
 
+from src.configurations.database import get_async_read_session
 from src.configurations.database import get_async_session
+from src.configurations.database import get_session_factory
 from src.models.books import Book
 from src.models.sellers import Seller
+from src.models.stats import SellerBookStats
+from src.schemas import INT4_MAX
+from src.schemas import BulkDelete
 from src.schemas import IncomingSeller
 from src.schemas import NewSeller
+from src.schemas import PatchSeller
+from src.schemas import ReturnedAllSellerStats
 from src.schemas import ReturnedAllSellers
+from src.schemas import ReturnedBulkDelete
 from src.schemas import ReturnedSeller
-from src.schemas import SellerBook
+from src.schemas import SellerCredentials
+from src.schemas import SellerStats
+from src.schemas import UpdatedSeller
 from src.schemas import UpdateSeller
+from src.services.cache import SELLER_STATS_PREFIX
+from src.services.cache import SELLERS_LIST_PREFIX
+from src.services.cache import CacheBackend
+from src.services.cache import CacheEntry
+from src.services.cache import cached_response
+from src.services.cache import get_cache
+from src.services.cache import invalidate_sellers
+from src.services.cache import seller_key
+from src.services.export import NDJSON_MEDIA_TYPE
+from src.services.export import stream_ndjson
+from src.services.freshness import last_modified
+from src.services.hashing import PasswordHasher
+from src.services.hashing import get_password_hasher
+from src.services.serialization import JSON_MEDIA_TYPE
+from src.services.serialization import json_response
 
 
 sellers_router = APIRouter(
@@ -26,72 +67,309 @@ sellers_router = APIRouter(
 )
 
 DBSession = Annotated[AsyncSession, Depends(get_async_session)]
+DBReadSession = Annotated[AsyncSession, Depends(get_async_read_session)]
+SessionFactory = Annotated[Callable[[], AsyncSession], Depends(get_session_factory)]
+Cache = Annotated[CacheBackend, Depends(get_cache)]
+Hasher = Annotated[PasswordHasher, Depends(get_password_hasher)]
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_BULK_SIZE = 10_000
+DEFAULT_BOOKS_PER_SELLER = 100
+MAX_BOOKS_PER_SELLER = 1000
+
+SELLER_FIELDS = {
+    "first_name": Seller.first_name,
+    "last_name": Seller.last_name,
+    "id": Seller.id,
+    "email": Seller.email,
+    "version": Seller.version,
+}
+# A list asks for any of the seller columns and "books"; without ?fields=
+# it gets all of them.
+LIST_FIELDS = (*SELLER_FIELDS, "books")
+_FIELD = "|".join(LIST_FIELDS)
+FIELDS_PATTERN = f"^({_FIELD})(,({_FIELD}))*$"
+
+
+def _seller_json(fields: Iterable[str] = SELLER_FIELDS, books_limit: int | None = None):
+    # Builds the ReturnedSeller document in Postgres so a seller read is one
+    # statement and skips pydantic entirely. Only the requested fields are
+    # selected, and books are joined in only when asked for, capped per seller.
+    document = []
+    for field in fields:
+        document += [field, SELLER_FIELDS[field]]
+
+    if books_limit != 0:
+        books = (
+            select(Book.id, Book.title, Book.author, Book.year, Book.pages)
+            .where(Book.seller_id == Seller.id)
+            .order_by(Book.id)
+            .limit(books_limit)
+            .correlate(Seller)
+            .subquery()
+        )
+        document += ["books", (
+            select(
+                func.coalesce(
+                    func.json_agg(aggregate_order_by(
+                        func.json_build_object(
+                            "title", books.c.title, "author", books.c.author, "year", books.c.year,
+                            "id", books.c.id, "pages", books.c.pages,
+                        ),
+                        books.c.id,
+                    )),
+                    literal_column("'[]'::json"),
+                ),
+            )
+            .scalar_subquery()
+        )]
+
+    return cast(func.json_build_object(*document), Text)
 
 
 @sellers_router.post("/", response_model=NewSeller, status_code=status.HTTP_201_CREATED)
-async def create_seller(seller: IncomingSeller, session: DBSession):
+async def create_seller(seller: IncomingSeller, session: DBSession, hasher: Hasher, cache: Cache):
     new_seller = Seller(
         first_name=seller.first_name, last_name=seller.last_name,
-        email=seller.email, password=seller.get_password(),
+        email=seller.email, password=await hasher.hash(seller.get_password()),
     )
 
     session.add(new_seller)
     await session.flush()
+    await invalidate_sellers(cache, [new_seller.id], session=session)
 
     return new_seller
 
 
+@sellers_router.post("/login", response_model=UpdateSeller)
+async def login_seller(credentials: SellerCredentials, session: DBSession, hasher: Hasher):
+    sellers = (await session.scalars(select(Seller).where(Seller.email == credentials.email))).all()
+    if not sellers:
+        await hasher.verify_dummy(credentials.get_password())
+
+    for seller in sellers:
+        is_valid, new_hash = await hasher.verify_and_update(credentials.get_password(), seller.password)
+        if is_valid:
+            if new_hash:
+                # A rehash is not an edit clients can see: version and
+                # updated_at stay as they are, so cached documents and the
+                # versions clients hold for PATCH remain valid.
+                await session.execute(
+                    update(Seller.__table__)
+                    .where(Seller.id == seller.id)
+                    .values(password=new_hash, updated_at=Seller.updated_at),
+                )
+            return seller
+
+    return Response(status_code=status.HTTP_401_UNAUTHORIZED)
+
+
 @sellers_router.get("/", response_model=ReturnedAllSellers)
-async def get_all_sellers(session: DBSession):
-    query = select(Seller).options(selectinload(Seller.books))
-    result = await session.execute(query)
-    sellers = result.scalars().all()
-    return {"sellers": sellers}
+async def get_all_sellers(  # noqa: PLR0913
+        request: Request,
+        session: DBReadSession,
+        cache: Cache,
+        limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+        after: Annotated[int | None, Query(ge=0, le=INT4_MAX)] = None,
+        fields: Annotated[str | None, Query(pattern=FIELDS_PATTERN, examples=["first_name,last_name"])] = None,
+        books_limit: Annotated[int, Query(ge=1, le=MAX_BOOKS_PER_SELLER)] = DEFAULT_BOOKS_PER_SELLER,
+):
+    # Books are only joined in when the requested fields include them, so a
+    # list of names only reads sellers_table. Each seller embeds at most
+    # books_limit of them, so a page stays bounded however many books a
+    # seller has.
+    requested = LIST_FIELDS if fields is None else fields.split(",")
+    selected = [field for field in SELLER_FIELDS if field in requested]
+    with_books = "books" in requested
+    document = _seller_json(selected, books_limit if with_books else 0)
+    # A page with books is stale once either table changes.
+    freshness = last_modified(Seller, Book) if with_books else last_modified(Seller)
+    query = select(Seller.id, document, freshness).order_by(Seller.id).limit(limit + 1)
+    if after is not None:
+        query = query.where(Seller.id > after)
+
+    async def build() -> CacheEntry:
+        sellers = (await session.execute(query)).all()
+        changed_at = sellers[0][2] if sellers else None
+
+        next_cursor = None
+        if len(sellers) > limit:
+            sellers = sellers[:limit]
+            next_cursor = sellers[-1].id
+
+        body = (
+            b'{"sellers":[' + ",".join(seller[1] for seller in sellers).encode()
+            + b'],"next_cursor":' + orjson.dumps(next_cursor) + b"}"
+        )
+        return CacheEntry.from_body(body, changed_at)
+
+    params = orjson.dumps([limit, after, selected, with_books, books_limit]).decode()
+    return await cached_response(request, cache, SELLERS_LIST_PREFIX + params, build)
+
+
+def _seller_stats_json():
+    # Reads the trigger-maintained summary table, so the cost depends on the
+    # number of (seller, year) pairs rather than on the number of books.
+    years = func.coalesce(
+        func.json_agg(aggregate_order_by(
+            func.json_build_object(
+                "year", SellerBookStats.year, "book_count", SellerBookStats.book_count,
+                "total_pages", SellerBookStats.total_pages,
+            ),
+            SellerBookStats.year,
+        )).filter(SellerBookStats.year.is_not(None)),
+        literal_column("'[]'::json"),
+    )
+    return (
+        select(cast(
+            func.json_build_object(
+                "seller_id", Seller.id,
+                "book_count", func.coalesce(func.sum(SellerBookStats.book_count), 0),
+                "total_pages", func.coalesce(func.sum(SellerBookStats.total_pages), 0),
+                "years", years,
+            ),
+            Text,
+        ))
+        .outerjoin(SellerBookStats, SellerBookStats.seller_id == Seller.id)
+        .group_by(Seller.id)
+    )
+
+
+@sellers_router.get("/stats", response_model=ReturnedAllSellerStats)
+async def get_all_seller_stats(
+        request: Request,
+        session: DBReadSession,
+        cache: Cache,
+        limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+        after: Annotated[int | None, Query(ge=0, le=INT4_MAX)] = None,
+):
+    query = (
+        _seller_stats_json()
+        .add_columns(Seller.id, last_modified(Seller, Book))
+        .order_by(Seller.id)
+        .limit(limit + 1)
+    )
+    if after is not None:
+        query = query.where(Seller.id > after)
+
+    async def build() -> CacheEntry:
+        stats = (await session.execute(query)).all()
+        changed_at = stats[0][2] if stats else None
+
+        next_cursor = None
+        if len(stats) > limit:
+            stats = stats[:limit]
+            next_cursor = stats[-1].id
+
+        body = (
+            b'{"sellers":[' + ",".join(seller[0] for seller in stats).encode()
+            + b'],"next_cursor":' + orjson.dumps(next_cursor) + b"}"
+        )
+        return CacheEntry.from_body(body, changed_at)
+
+    params = orjson.dumps([limit, after]).decode()
+    return await cached_response(request, cache, SELLER_STATS_PREFIX + params, build)
+
+
+@sellers_router.get("/export", response_class=StreamingResponse)
+async def export_sellers(session_factory: SessionFactory):
+    query = select(
+        Seller.id, Seller.first_name, Seller.last_name, Seller.email,
+    ).order_by(Seller.id)
+    return StreamingResponse(
+        stream_ndjson(session_factory, query), media_type=NDJSON_MEDIA_TYPE,
+    )
 
 
 @sellers_router.get("/{seller_id}", response_model=ReturnedSeller)
-async def get_seller(seller_id: int, session: DBSession):
-    result = await session.get(Seller, seller_id)
-    if not result:
+async def get_seller(seller_id: int, request: Request, session: DBReadSession, cache: Cache):
+    async def build() -> bytes | None:
+        result = await session.scalar(select(_seller_json()).where(Seller.id == seller_id))
+        return result.encode() if result else None
+
+    return await cached_response(request, cache, seller_key(seller_id), build)
+
+
+@sellers_router.get("/{seller_id}/stats", response_model=SellerStats)
+async def get_seller_stats(seller_id: int, session: DBReadSession):
+    stats = await session.scalar(_seller_stats_json().where(Seller.id == seller_id))
+    if stats is None:
         return Response(status_code=status.HTTP_404_NOT_FOUND)
+    return Response(stats.encode(), media_type=JSON_MEDIA_TYPE)
 
-    books_result = await session.execute(
-        select(Book).where(Book.seller_id == seller_id),
+
+def _delete_sellers(*condition):
+    # Books go away through the ON DELETE CASCADE foreign key. Their ids are
+    # collected in RETURNING, which still sees them, for cache invalidation.
+    book_ids = (
+        select(func.coalesce(func.array_agg(Book.id), literal_column("'{}'::integer[]")))
+        .where(Book.seller_id == Seller.id)
+        .scalar_subquery()
     )
+    return delete(Seller.__table__).where(*condition).returning(Seller.id, book_ids.label("book_ids"))
 
-    books = books_result.scalars().all()
 
-    return ReturnedSeller(
-        id=result.id,
-        first_name=result.first_name,
-        last_name=result.last_name,
-        email=result.email,
-        password=result.password,
-        books=[SellerBook.model_validate(book) for book in books],
-    )
+@sellers_router.delete("/bulk", response_model=ReturnedBulkDelete)
+async def delete_sellers_bulk(bulk: BulkDelete, session: DBSession, cache: Cache):
+    if len(bulk.ids) > MAX_BULK_SIZE:
+        return Response(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    deleted = (await session.execute(
+        _delete_sellers(Seller.id == any_(literal(bulk.ids, ARRAY(Integer)))),
+    )).all()
+
+    deleted_ids = {seller.id for seller in deleted}
+    book_ids = [book_id for seller in deleted for book_id in seller.book_ids]
+    await invalidate_sellers(cache, deleted_ids, book_ids, session=session)
+    return json_response({
+        "deleted": sorted(deleted_ids),
+        "not_found": sorted(set(bulk.ids) - deleted_ids),
+    })
 
 
 @sellers_router.delete("/{seller_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_seller(seller_id: int, session: DBSession):
-    deleted_seller = await session.get(Seller, seller_id)
-    ic(deleted_seller)
-    if deleted_seller:
-        await session.delete(deleted_seller)
-        return None
+async def delete_seller(seller_id: int, session: DBSession, cache: Cache):
+    deleted = (await session.execute(_delete_sellers(Seller.id == seller_id))).first()
+    if deleted is None:
+        return Response(status_code=status.HTTP_404_NOT_FOUND)
 
-    return Response(status_code=status.HTTP_404_NOT_FOUND)
+    await invalidate_sellers(cache, [seller_id], deleted.book_ids, session=session)
+    return None
 
 
-@sellers_router.put("/{seller_id}", response_model=UpdateSeller)
+@sellers_router.put("/{seller_id}", response_model=UpdatedSeller)
 async def update_seller(
-        seller_id: int, new_seller_data: UpdateSeller, session: DBSession,
+        seller_id: int, new_seller_data: UpdateSeller, session: DBSession, cache: Cache,
 ):
     if updated_seller := await session.get(Seller, seller_id):
         updated_seller.first_name = new_seller_data.first_name
         updated_seller.last_name = new_seller_data.last_name
         updated_seller.email = new_seller_data.email
 
-        await session.flush()
-        return updated_seller
+        # The version check fails when the row changed since it was read.
+        try:
+            await session.flush()
+        except StaleDataError:
+            await session.rollback()
+            return Response(status_code=status.HTTP_409_CONFLICT)
+        await invalidate_sellers(cache, [seller_id], session=session)
+        return json_response({field: getattr(updated_seller, field) for field in UpdatedSeller.model_fields})
 
     return Response(status_code=status.HTTP_404_NOT_FOUND)
+
+
+@sellers_router.patch("/{seller_id}", response_model=UpdatedSeller)
+async def patch_seller(seller_id: int, changes: PatchSeller, session: DBSession, cache: Cache):
+    result = await session.execute(
+        update(Seller.__table__)
+        .where(Seller.id == seller_id, Seller.version == changes.version)
+        .values(**changes.model_dump(exclude_unset=True, exclude={"version"}), version=Seller.version + 1)
+        .returning(Seller.id, Seller.first_name, Seller.last_name, Seller.email, Seller.version),
+    )
+    if (seller := result.first()) is None:
+        exists = await session.scalar(select(Seller.id).where(Seller.id == seller_id))
+        return Response(status_code=status.HTTP_409_CONFLICT if exists else status.HTTP_404_NOT_FOUND)
+
+    await invalidate_sellers(cache, [seller_id], session=session)
+    return json_response(seller._asdict())
@@ -1,5 +1,6 @@
 from .books import *  # noqa: F403
+from .internal import *  # noqa: F403
 from .sellers import *  # noqa: F403
 
 
-__all__ = books.__all__ + sellers.__all__  # noqa: F405
+__all__ = books.__all__ + internal.__all__ + sellers.__all__  # noqa: F405
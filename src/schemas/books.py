@@ -1,21 +1,37 @@
+from typing import Annotated
+from typing import Literal
+
 from pydantic import BaseModel
 from pydantic import Field
 from pydantic import field_validator
 from pydantic_core import PydanticCustomError
 
 
-__all__ = ["IncomingBook", "ReturnedBook", "ReturnedAllBooks", "SellerBook"]
+__all__ = [
+    "IncomingBook", "UpdateBook", "PatchBook", "ReturnedBook", "ReturnedAllBooks", "SellerBook",
+    "BulkBookResult", "ReturnedBulkBooks", "ReturnedFoundBooks", "BulkDelete", "ReturnedBulkDelete",
+    "INT4_MIN", "INT4_MAX",
+]
+
+
+# Limits of the books_table columns, so a value the database would reject
+# fails validation instead of the statement.
+Title = Annotated[str, Field(max_length=50)]
+Author = Annotated[str, Field(max_length=100)]
+INT4_MIN = -2 ** 31
+INT4_MAX = 2 ** 31 - 1
+Int4 = Annotated[int, Field(ge=INT4_MIN, le=INT4_MAX)]
 
 
 class BaseBook(BaseModel):
-    title: str
-    author: str
-    year: int
+    title: Title
+    author: Author
+    year: Int4
 
 
 class IncomingBook(BaseBook):
-    pages: int = Field(default=150, alias="count_pages")
-    seller_id: int
+    pages: Int4 = Field(default=150, alias="count_pages")
+    seller_id: Int4
 
     @field_validator("year")
     @staticmethod
@@ -26,14 +42,39 @@ class IncomingBook(BaseBook):
         return val
 
 
-class ReturnedBook(BaseBook):
+class UpdateBook(BaseBook):
     id: int
-    pages: int
-    seller_id: int
+    pages: Int4
+    seller_id: Int4
+
+
+class ReturnedBook(UpdateBook):
+    version: int
 
     model_config = {"from_attributes": True}
 
 
+class PatchBook(BaseModel):
+    version: Int4
+    title: Title | None = None
+    author: Author | None = None
+    year: Int4 | None = None
+    pages: Int4 | None = None
+    seller_id: Int4 | None = None
+
+    @field_validator("title", "author", "year", "pages", "seller_id")
+    @staticmethod
+    def validate_not_null(val):
+        if val is None:
+            raise PydanticCustomError("Valdation error", "Field can not be null")
+        return val
+
+    @field_validator("year")
+    @staticmethod
+    def validate_year(val: int) -> int:
+        return IncomingBook.validate_year(val)
+
+
 class SellerBook(BaseBook):
     id: int
     pages: int
@@ -43,3 +84,31 @@ class SellerBook(BaseBook):
 
 class ReturnedAllBooks(BaseModel):
     books: list[ReturnedBook]
+    next_cursor: int | None = None
+
+
+class ReturnedFoundBooks(BaseModel):
+    books: list[ReturnedBook]
+    next_offset: int | None = None
+
+
+class BulkBookResult(BaseModel):
+    index: int
+    status: Literal["created", "error"]
+    id: int | None = None
+    detail: str | None = None
+
+
+class ReturnedBulkBooks(BaseModel):
+    created: int
+    failed: int
+    results: list[BulkBookResult]
+
+
+class BulkDelete(BaseModel):
+    ids: list[Int4]
+
+
+class ReturnedBulkDelete(BaseModel):
+    deleted: list[int]
+    not_found: list[int]
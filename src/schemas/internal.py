@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+
+
+__all__ = ["PoolStatus"]
+
+
+class PoolStatus(BaseModel):
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    max_overflow: int
+    waits: int
+    wait_time_avg_ms: float
+    wait_time_max_ms: float
+    replicas_healthy: list[bool] = []
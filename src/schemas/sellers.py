@@ -1,19 +1,29 @@
 import re
+from typing import Annotated
 
 from pydantic import BaseModel
+from pydantic import Field
 from pydantic import SecretStr
 from pydantic import field_validator
 from pydantic_core import PydanticCustomError
 
+from .books import Int4
 from .books import SellerBook
 
 
-__all__ = ["IncomingSeller", "ReturnedSeller", "ReturnedAllSellers", "NewSeller", "UpdateSeller"]
+__all__ = [
+    "IncomingSeller", "ReturnedSeller", "ListedSeller", "ReturnedAllSellers", "NewSeller", "UpdateSeller", "PatchSeller",
+    "UpdatedSeller", "SellerCredentials", "SellerYearStats", "SellerStats", "ReturnedAllSellerStats",
+]
+
+
+# Limit of the sellers_table name columns.
+Name = Annotated[str, Field(max_length=50)]
 
 
 class BaseSeller(BaseModel):
-    first_name: str
-    last_name: str
+    first_name: Name
+    last_name: Name
 
 
 class IncomingSeller(BaseSeller):
@@ -50,6 +60,7 @@ class IncomingSeller(BaseSeller):
 class ReturnedSeller(BaseSeller):
     id: int
     email: str
+    version: int
     books: list[SellerBook] = []
 
 
@@ -64,5 +75,66 @@ class UpdateSeller(BaseSeller):
     email: str
 
 
+class UpdatedSeller(UpdateSeller):
+    version: int
+
+
+class PatchSeller(BaseModel):
+    version: Int4
+    first_name: Name | None = None
+    last_name: Name | None = None
+    email: str | None = None
+
+    @field_validator("first_name", "last_name", "email")
+    @staticmethod
+    def validate_not_null(val):
+        if val is None:
+            raise PydanticCustomError("Valdation error", "Field can not be null")
+        return val
+
+    @field_validator("email")
+    @staticmethod
+    def validate_email(val: str) -> str:
+        return IncomingSeller.validate_email(val)
+
+
+# ?fields= leaves out whatever was not asked for, so a list item may lack
+# any of them.
+class ListedSeller(BaseModel):
+    first_name: str | None = None
+    last_name: str | None = None
+    id: int | None = None
+    email: str | None = None
+    version: int | None = None
+    books: list[SellerBook] | None = None
+
+
 class ReturnedAllSellers(BaseModel):
-    sellers: list[ReturnedSeller]
+    sellers: list[ListedSeller]
+    next_cursor: int | None = None
+
+
+class SellerCredentials(BaseModel):
+    email: str
+    password: SecretStr
+
+    def get_password(self) -> str:
+        return self.password.get_secret_value()
+
+
+class SellerYearStats(BaseModel):
+    year: int
+    book_count: int
+    total_pages: int
+
+
+class SellerStats(BaseModel):
+    seller_id: int
+    book_count: int
+    total_pages: int
+    years: list[SellerYearStats]
+
+
+class ReturnedAllSellerStats(BaseModel):
+    sellers: list[SellerStats]
+    next_cursor: int | None = None
@@ -0,0 +1,109 @@
+import argparse
+import logging
+import os
+
+import orjson
+import uvicorn
+
+from src.configurations.settings import settings
+
+
+__all__ = ["resolve_workers", "plan_worker_pool", "per_process_overrides", "main"]
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_workers(workers: int) -> int:
+    return workers if workers > 0 else os.cpu_count() or 1
+
+
+def plan_worker_pool(workers: int) -> tuple[int, int]:
+    # Every worker process builds its own engine, so the Postgres connection
+    # budget is split between them: workers * (pool_size + max_overflow)
+    # must stay below max_connections minus what admins and replication keep.
+    budget = settings.db_server_max_connections - settings.db_reserved_connections
+    per_worker = budget // workers
+    if per_worker < 1:
+        raise ValueError(
+            {"message": f"{workers} workers do not fit into {budget} available database connections"},
+        )
+
+    pool_size = min(settings.max_connection_count, per_worker)
+    max_overflow = min(settings.db_max_overflow, per_worker - pool_size)
+    return pool_size, max_overflow
+
+
+def per_process_overrides(workers: int) -> dict[str, str]:
+    # Memory backends live in each worker process. With several workers a
+    # write would only clear the cache of the worker that served it, so the
+    # cache is switched off instead. Every worker would also hand out the
+    # full rate limit, so each gets its share of it: a client is never let
+    # through faster than configured, but one that sticks to a single
+    # connection is held to a worker's share.
+    if workers == 1:
+        return {}
+
+    overrides = {}
+    if settings.rate_limit_backend == "memory":
+        logger.warning(
+            "RATE_LIMIT_BACKEND=memory keeps separate buckets in each of %d workers; each worker gets "
+            "1/%d of the rate limit, use RATE_LIMIT_BACKEND=redis to share it", workers, workers,
+        )
+        overrides["RATE_LIMIT_RATE"] = str(settings.rate_limit_rate / workers)
+        overrides["RATE_LIMIT_BURST"] = str(max(settings.rate_limit_burst // workers, 1))
+        overrides["RATE_LIMIT_ROUTES"] = orjson.dumps({
+            route: (rate / workers, max(burst // workers, 1))
+            for route, (rate, burst) in settings.rate_limit_routes.items()
+        }).decode()
+
+    if settings.cache_backend == "memory":
+        logger.warning(
+            "CACHE_BACKEND=memory keeps a separate cache in each of %d workers, which would serve stale "
+            "entries after a write; caching is off, use CACHE_BACKEND=redis to enable it", workers,
+        )
+        overrides["CACHE_BACKEND"] = "none"
+
+    return overrides
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m src.server")
+    parser.add_argument("--host", default=settings.server_host)
+    parser.add_argument("--port", type=int, default=settings.server_port)
+    parser.add_argument("--workers", type=int, default=settings.server_workers, help="0 means one per CPU")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = _parse_args(argv)
+    workers = resolve_workers(args.workers)
+    pool_size, max_overflow = plan_worker_pool(workers)
+    overrides = per_process_overrides(workers)
+
+    # Workers are spawned processes that build Settings from the environment.
+    os.environ.update(overrides)
+    os.environ["MAX_CONNECTION_COUNT"] = str(pool_size)
+    os.environ["DB_MAX_OVERFLOW"] = str(max_overflow)
+    settings.max_connection_count = pool_size
+    settings.db_max_overflow = max_overflow
+
+    uvicorn.run(
+        "src.main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        lifespan="on",
+        backlog=settings.server_backlog,
+        timeout_keep_alive=settings.server_keepalive_timeout,
+        timeout_graceful_shutdown=settings.server_graceful_timeout,
+        # Logging is configured by the app lifespan, and MetricsMiddleware
+        # already writes a sampled access log.
+        log_config=None,
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
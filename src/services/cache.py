@@ -0,0 +1,470 @@
+import asyncio
+import hashlib
+import logging
+import time
+from abc import ABC
+from abc import abstractmethod
+from collections import OrderedDict
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import datetime
+from datetime import timezone
+from email.utils import format_datetime
+from typing import TypeVar
+
+from fastapi import Request
+from fastapi import Response
+from fastapi import status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configurations.database import READ_CONSISTENCY_HEADER
+from src.configurations.database import after_commit
+from src.configurations.settings import settings
+from src.services.jobs import enqueue
+from src.services.jobs import job_handler
+
+
+__all__ = [
+    "CacheEntry", "CacheBackend", "MemoryCache", "RedisCache", "NullCache",
+    "init_cache", "get_cache", "single_flight", "cached_response",
+    "BOOKS_LIST_PREFIX", "SELLERS_LIST_PREFIX", "SELLER_STATS_PREFIX", "book_key", "seller_key",
+    "invalidate_books", "invalidate_sellers",
+]
+
+logger = logging.getLogger(__name__)
+
+__cache: "CacheBackend | None" = None
+__in_flight: dict[str, "_Flight"] = {}
+
+T = TypeVar("T")
+
+BOOKS_LIST_PREFIX = "books:list:"
+SELLERS_LIST_PREFIX = "sellers:list:"
+# Stats follow every book and seller write, which all drop the seller list
+# pages, so they are kept under the same prefix.
+SELLER_STATS_PREFIX = SELLERS_LIST_PREFIX + "stats:"
+INVALIDATED_PREFIX = "inv:"
+
+
+@dataclass(frozen=True, slots=True)
+class CacheEntry:
+    body: bytes
+    etag: str
+    last_modified: str = ""
+
+    @classmethod
+    def from_body(cls, body: bytes, last_modified: datetime | None = None) -> "CacheEntry":
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        if last_modified is None:
+            return cls(body=body, etag=etag)
+
+        return cls(
+            body=body,
+            etag=etag,
+            last_modified=format_datetime(last_modified.astimezone(timezone.utc), usegmt=True),
+        )
+
+
+class CacheBackend(ABC):
+    # Shared backends are seen by every worker process, so clearing them can
+    # be left to whichever process runs the job queue.
+    shared = False
+
+    @abstractmethod
+    async def get(self, key: str) -> CacheEntry | None: ...
+
+    @abstractmethod
+    async def set(self, key: str, entry: CacheEntry) -> None: ...
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None: ...
+
+    @abstractmethod
+    async def delete_prefix(self, prefix: str) -> None: ...
+
+    # Marks keys and prefixes as just written for ttl seconds, and tells
+    # whether any of the names carries such a mark. Kept next to the entries,
+    # so a shared backend makes the marks visible to every worker.
+    @abstractmethod
+    async def mark_invalidated(self, names: Iterable[str], ttl: float) -> None: ...
+
+    @abstractmethod
+    async def invalidated(self, names: Iterable[str]) -> bool: ...
+
+
+class NullCache(CacheBackend):
+    async def get(self, key: str) -> CacheEntry | None:
+        return None
+
+    async def set(self, key: str, entry: CacheEntry) -> None:
+        pass
+
+    async def delete(self, *keys: str) -> None:
+        pass
+
+    async def delete_prefix(self, prefix: str) -> None:
+        pass
+
+    async def mark_invalidated(self, names: Iterable[str], ttl: float) -> None:
+        pass
+
+    async def invalidated(self, names: Iterable[str]) -> bool:
+        return False
+
+
+class MemoryCache(CacheBackend):
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, CacheEntry]] = OrderedDict()
+        self._invalidated: dict[str, float] = {}
+
+    async def get(self, key: str) -> CacheEntry | None:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+
+        expires_at, entry = item
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: CacheEntry) -> None:
+        self._entries[key] = (time.monotonic() + self._ttl, entry)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def delete_prefix(self, prefix: str) -> None:
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
+
+    async def mark_invalidated(self, names: Iterable[str], ttl: float) -> None:
+        now = time.monotonic()
+        self._invalidated = {name: expires_at for name, expires_at in self._invalidated.items() if expires_at > now}
+        for name in names:
+            self._invalidated[name] = now + ttl
+
+    async def invalidated(self, names: Iterable[str]) -> bool:
+        now = time.monotonic()
+        return any(self._invalidated.get(name, 0.0) > now for name in names)
+
+
+class RedisCache(CacheBackend):
+    shared = True
+
+    def __init__(self, url: str, ttl: float) -> None:
+        try:
+            from redis.asyncio import Redis
+            from redis.exceptions import RedisError
+        except ImportError as exc:
+            raise RuntimeError("Install the 'redis' package to use the redis cache backend") from exc
+
+        self._client = Redis.from_url(
+            url, socket_timeout=settings.cache_redis_timeout, socket_connect_timeout=settings.cache_redis_timeout,
+        )
+        self._ttl = max(int(ttl), 1)
+        self._errors = (RedisError, OSError, asyncio.TimeoutError)
+        self._failing = False
+
+    def _failed(self) -> None:
+        if not self._failing:
+            logger.exception("Cache can't reach Redis, reading from the database")
+        self._failing = True
+
+    def _recovered(self) -> None:
+        if self._failing:
+            logger.warning("Cache reached Redis again")
+        self._failing = False
+
+    async def get(self, key: str) -> CacheEntry | None:
+        # The cache only saves work: while Redis is unreachable every read
+        # is a miss that goes to the database and is not stored.
+        try:
+            value = await self._client.get(key)
+        except self._errors:
+            self._failed()
+            return None
+
+        self._recovered()
+        if value is None:
+            return None
+
+        parts = value.split(b"\n", 2)
+        if len(parts) != 3:
+            # Written before entries carried Last-Modified; rebuilt on the next miss.
+            return None
+
+        etag, last_modified, body = parts
+        return CacheEntry(body=body, etag=etag.decode(), last_modified=last_modified.decode())
+
+    async def set(self, key: str, entry: CacheEntry) -> None:
+        value = b"\n".join((entry.etag.encode(), entry.last_modified.encode(), entry.body))
+        try:
+            await self._client.set(key, value, ex=self._ttl)
+        except self._errors:
+            self._failed()
+            return
+
+        self._recovered()
+
+    async def delete(self, *keys: str) -> None:
+        # Unlike reads, failed deletes raise: the write has committed, so the
+        # caller has to retry them or the entries outlive it until the TTL.
+        if keys:
+            await self._client.unlink(*keys)
+
+    async def delete_prefix(self, prefix: str) -> None:
+        keys = [key async for key in self._client.scan_iter(match=f"{prefix}*")]
+        if keys:
+            await self._client.unlink(*keys)
+
+    async def mark_invalidated(self, names: Iterable[str], ttl: float) -> None:
+        async with self._client.pipeline(transaction=False) as pipe:
+            for name in names:
+                pipe.set(INVALIDATED_PREFIX + name, b"", px=max(int(ttl * 1000), 1))
+            await pipe.execute()
+
+    async def invalidated(self, names: Iterable[str]) -> bool:
+        # Not knowing is treated as a recent write: the entry is not stored.
+        try:
+            count = await self._client.exists(*(INVALIDATED_PREFIX + name for name in names))
+        except self._errors:
+            self._failed()
+            return True
+
+        self._recovered()
+        return count > 0
+
+
+def init_cache() -> None:
+    global __cache
+
+    if __cache:
+        return
+
+    if settings.cache_backend == "redis":
+        __cache = RedisCache(settings.redis_url, settings.cache_ttl)
+    elif settings.cache_backend == "memory":
+        __cache = MemoryCache(settings.cache_max_entries, settings.cache_ttl)
+    else:
+        __cache = NullCache()
+
+
+def get_cache() -> CacheBackend:
+    global __cache
+
+    if not __cache:
+        raise ValueError({"message": "call init_cache() first"})
+
+    return __cache
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+class _Flight:
+    def __init__(self) -> None:
+        self.result: asyncio.Future = asyncio.get_running_loop().create_future()
+        # Set when a write to the key commits while the flight is running.
+        self.invalidated = False
+
+
+async def single_flight(
+        key: str,
+        build: Callable[[], Awaitable[T]],
+        store: Callable[[T], Awaitable[None]] | None = None,
+) -> T:
+    # Concurrent callers with the same key share the first caller's result
+    # instead of each running the same query. The flight lives in this
+    # process only and ends once the result is ready and stored.
+    flight = __in_flight.get(key)
+    if flight is not None:
+        try:
+            return await asyncio.shield(flight.result)
+        except asyncio.CancelledError:
+            if not flight.result.cancelled():
+                raise
+        # The leading request failed or was cancelled together with its
+        # session, so this one queries on its own.
+        return await build()
+
+    flight = _Flight()
+    __in_flight[key] = flight
+    try:
+        result = await build()
+        flight.result.set_result(result)
+        # Only the leader stores the result, and not when a write committed
+        # since it started: its query may have read the rows from before.
+        if store is not None and not flight.invalidated:
+            await store(result)
+    except BaseException:
+        if not flight.result.done():
+            flight.result.cancel()
+        raise
+    finally:
+        del __in_flight[key]
+
+    return result
+
+
+def _invalidate_flights(keys: Iterable[str], prefixes: tuple[str, ...]) -> None:
+    keys = set(keys)
+    for key, flight in __in_flight.items():
+        if key in keys or key.startswith(prefixes):
+            flight.invalidated = True
+
+
+async def _recently_invalidated(cache: CacheBackend, key: str) -> bool:
+    # A replica may not have replayed a write for up to db_replica_max_lag
+    # seconds after it committed, so what it returns in that window must not
+    # be cached. The marks live in the cache backend, so with a shared one a
+    # write in any worker counts.
+    prefixes = [prefix for prefix in (BOOKS_LIST_PREFIX, SELLERS_LIST_PREFIX) if key.startswith(prefix)]
+    return await cache.invalidated([key, *prefixes])
+
+
+async def cached_response(
+        request: Request,
+        cache: CacheBackend,
+        key: str,
+        build: Callable[[], Awaitable[bytes | CacheEntry | None]],
+) -> Response:
+    # build() returns the body, or a whole CacheEntry when it also knows
+    # when the data last changed.
+    async def build_entry() -> CacheEntry | None:
+        result = await build()
+        return result if result is None or isinstance(result, CacheEntry) else CacheEntry.from_body(result)
+
+    async def store(entry: CacheEntry | None) -> None:
+        if entry is None:
+            return
+        if getattr(request.state, "read_from_replica", False) and await _recently_invalidated(cache, key):
+            return
+        await cache.set(key, entry)
+
+    # Reads that must see the client's own writes skip the cache and the
+    # flights of other requests, which may come from a lagging replica.
+    if request.headers.get(READ_CONSISTENCY_HEADER, "").lower() == "primary":
+        entry = await build_entry()
+    else:
+        # Requests waiting on a flight never query, and their read session
+        # only checks out a connection on its first query.
+        entry = await cache.get(key)
+        if entry is None:
+            entry = await single_flight(key, build_entry, store)
+
+    if entry is None:
+        return Response(status_code=status.HTTP_404_NOT_FOUND)
+
+    headers = {"ETag": entry.etag}
+    if entry.last_modified:
+        # Only informational: updated_at is stamped when a statement runs,
+        # not when it commits, so a write that commits late can carry an
+        # older time than a page already served. Revalidation goes by the
+        # ETag alone, and no-cache keeps clients from guessing a lifetime
+        # from the date.
+        headers["Last-Modified"] = entry.last_modified
+        headers["Cache-Control"] = "no-cache"
+
+    if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+def book_key(book_id: int) -> str:
+    return f"books:{book_id}"
+
+
+def seller_key(seller_id: int) -> str:
+    return f"sellers:{seller_id}"
+
+
+async def _invalidate(
+        cache: CacheBackend, session: AsyncSession | None, keys: list[str], prefixes: tuple[str, ...],
+) -> None:
+    # Dropping list pages from a shared cache means a SCAN over its keys, so
+    # it goes to the job queue and runs after the write commits.
+    local_prefixes = prefixes
+    if cache.shared and session is not None:
+        await enqueue(session, "cache.delete_prefixes", {"prefixes": list(prefixes)})
+        local_prefixes = ()
+
+    async def drop() -> None:
+        _invalidate_flights(keys, prefixes)
+        # Marked before the delete: a replica read that stores its entry in
+        # between is still dropped by the delete that follows.
+        await cache.mark_invalidated([*keys, *prefixes], settings.db_replica_max_lag)
+        await cache.delete(*keys)
+        for prefix in local_prefixes:
+            await cache.delete_prefix(prefix)
+
+    async def drop_or_retry() -> None:
+        # The write has committed by now. If the cache can't be reached, the
+        # delete is queued in a transaction of its own and retried from there.
+        try:
+            await drop()
+        except Exception:
+            logger.warning("Cache invalidation failed, queueing a retry", exc_info=True)
+            await enqueue(session, "cache.delete_keys", {"keys": keys, "prefixes": list(local_prefixes)})
+            await session.commit()
+
+    # Dropped before the commit, an entry could be cached again from the
+    # old rows by a read that runs in between.
+    if session is None:
+        await drop()
+    else:
+        after_commit(session, drop_or_retry)
+
+
+@job_handler("cache.delete_keys")
+async def _delete_keys_job(payload: dict) -> None:
+    cache = get_cache()
+    await cache.delete(*payload["keys"])
+    for prefix in payload["prefixes"]:
+        await cache.delete_prefix(prefix)
+
+
+@job_handler("cache.delete_prefixes")
+async def _delete_prefixes_job(payload: dict) -> None:
+    cache = get_cache()
+    for prefix in payload["prefixes"]:
+        await cache.delete_prefix(prefix)
+
+
+async def invalidate_books(
+        cache: CacheBackend,
+        book_ids: Iterable[int] = (),
+        seller_ids: Iterable[int] = (),
+        session: AsyncSession | None = None,
+) -> None:
+    # Sellers embed their books, so every book write touches seller entries too.
+    keys = [*(book_key(book_id) for book_id in book_ids), *(seller_key(seller_id) for seller_id in seller_ids)]
+    await _invalidate(cache, session, keys, (BOOKS_LIST_PREFIX, SELLERS_LIST_PREFIX))
+
+
+async def invalidate_sellers(
+        cache: CacheBackend,
+        seller_ids: Iterable[int],
+        book_ids: Iterable[int] = (),
+        session: AsyncSession | None = None,
+) -> None:
+    book_ids = list(book_ids)
+    keys = [*(seller_key(seller_id) for seller_id in seller_ids), *(book_key(book_id) for book_id in book_ids)]
+    prefixes = (SELLERS_LIST_PREFIX, BOOKS_LIST_PREFIX) if book_ids else (SELLERS_LIST_PREFIX,)
+    await _invalidate(cache, session, keys, prefixes)
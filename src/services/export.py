@@ -0,0 +1,28 @@
+from collections.abc import AsyncIterator
+from collections.abc import Callable
+
+import orjson
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+__all__ = ["NDJSON_MEDIA_TYPE", "stream_ndjson"]
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+EXPORT_BATCH_SIZE = 1000
+
+
+async def stream_ndjson(
+        session_factory: Callable[[], AsyncSession], query: Select,
+) -> AsyncIterator[bytes]:
+    # The request-scoped session is closed before the body is sent,
+    # so the export owns a session for the lifetime of the stream.
+    async with session_factory() as session:
+        result = await session.stream(
+            query.execution_options(yield_per=EXPORT_BATCH_SIZE),
+        )
+        async for rows in result.mappings().partitions():
+            yield b"".join(
+                orjson.dumps(dict(row), option=orjson.OPT_APPEND_NEWLINE)
+                for row in rows
+            )
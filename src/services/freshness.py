@@ -0,0 +1,26 @@
+from datetime import datetime
+
+from sqlalchemy import ColumnElement
+from sqlalchemy import func
+from sqlalchemy import select
+
+from src.models.deletions import CollectionDeletion
+
+
+__all__ = ["last_modified"]
+
+
+def last_modified(*models) -> ColumnElement[datetime]:
+    # The newest change to any of the tables: their latest updated_at, or the
+    # last time rows were deleted from them. Each part is one index lookup,
+    # and greatest() skips the NULLs of empty tables.
+    return func.greatest(*(
+        part
+        for model in models
+        for part in (
+            select(func.max(model.updated_at)).scalar_subquery(),
+            select(func.max(CollectionDeletion.deleted_at))
+            .where(CollectionDeletion.collection == model.__tablename__)
+            .scalar_subquery(),
+        )
+    ))
@@ -0,0 +1,120 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from src.configurations.settings import settings
+
+
+__all__ = ["PasswordHasher", "init_password_hasher", "get_password_hasher", "shutdown_password_hasher"]
+
+SCHEME = "scrypt"
+SALT_SIZE = 16
+KEY_SIZE = 32
+DUMMY_SALT = bytes(SALT_SIZE)
+
+__hasher: "PasswordHasher | None" = None
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p, dklen=KEY_SIZE, maxmem=256 * n * r,
+    )
+
+
+class PasswordHasher:
+    # hashlib.scrypt releases the GIL, so a small thread pool both keeps the
+    # event loop free and caps how many hashes burn CPU at the same time.
+    def __init__(self, n: int, r: int, p: int, max_workers: int) -> None:
+        self.n = n
+        self.r = r
+        self.p = p
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hasher")
+
+    @property
+    def _params(self) -> str:
+        return f"n={self.n},r={self.r},p={self.p}"
+
+    async def _run(self, password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, _scrypt, password, salt, n, r, p)
+
+    async def hash(self, password: str) -> str:
+        salt = os.urandom(SALT_SIZE)
+        key = await self._run(password, salt, self.n, self.r, self.p)
+        return f"${SCHEME}${self._params}${_b64encode(salt)}${_b64encode(key)}"
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        parts = hashed.split("$")
+        if len(parts) != 5 or parts[1] != SCHEME:  # noqa: PLR2004
+            # Rows written before hashing was introduced hold the plain password.
+            return hmac.compare_digest(password.encode(), hashed.encode())
+
+        try:
+            params = dict(item.split("=") for item in parts[2].split(","))
+            salt, expected = _b64decode(parts[3]), _b64decode(parts[4])
+            key = await self._run(password, salt, int(params["n"]), int(params["r"]), int(params["p"]))
+        except (KeyError, ValueError):
+            # A corrupt hash matches no password; it must not turn into a 500.
+            return await self.verify_dummy(password)
+        return hmac.compare_digest(key, expected)
+
+    async def verify_dummy(self, password: str) -> bool:
+        # Costs as much as verifying a current hash, so a login for an unknown
+        # email takes as long as one with a wrong password.
+        await self._run(password, DUMMY_SALT, self.n, self.r, self.p)
+        return False
+
+    def needs_rehash(self, hashed: str) -> bool:
+        return not hashed.startswith(f"${SCHEME}${self._params}$")
+
+    async def verify_and_update(self, password: str, hashed: str) -> tuple[bool, str | None]:
+        if not await self.verify(password, hashed):
+            return False, None
+        if self.needs_rehash(hashed):
+            return True, await self.hash(password)
+        return True, None
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+def init_password_hasher() -> None:
+    global __hasher
+
+    if __hasher:
+        return
+
+    __hasher = PasswordHasher(
+        n=settings.password_scrypt_n,
+        r=settings.password_scrypt_r,
+        p=settings.password_scrypt_p,
+        max_workers=settings.password_hash_workers,
+    )
+
+
+def get_password_hasher() -> PasswordHasher:
+    global __hasher
+
+    if not __hasher:
+        raise ValueError({"message": "call init_password_hasher() first"})
+
+    return __hasher
+
+
+def shutdown_password_hasher() -> None:
+    global __hasher
+
+    if __hasher:
+        __hasher.shutdown()
+        __hasher = None
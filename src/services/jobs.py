@@ -0,0 +1,227 @@
+import asyncio
+import contextlib
+import logging
+from collections.abc import Awaitable
+from collections.abc import Callable
+from datetime import timedelta
+from typing import Any
+
+from sqlalchemy import delete
+from sqlalchemy import event
+from sqlalchemy import func
+from sqlalchemy import insert
+from sqlalchemy import select
+from sqlalchemy import update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.configurations.database import get_session_factory
+from src.configurations.settings import settings
+from src.models.jobs import Job
+
+
+__all__ = [
+    "JobHandler", "JobQueue", "job_handler", "enqueue",
+    "init_job_queue", "get_job_queue", "shutdown_job_queue",
+]
+
+JobHandler = Callable[[dict[str, Any]], Awaitable[None]]
+
+logger = logging.getLogger(__name__)
+
+__handlers: dict[str, JobHandler] = {}
+__job_queue: "JobQueue | None" = None
+
+
+class JobQueue:
+    # Jobs live in jobs_table and are claimed one at a time with
+    # FOR UPDATE SKIP LOCKED, so any number of API processes and standalone
+    # workers can drain the same table. A claim leases the job for
+    # lease_timeout seconds: if the process dies mid-job, it runs again
+    # until max_attempts is used up.
+    # Connections are only held for the claim and for the final update,
+    # never while a handler runs.
+    def __init__(
+            self,
+            session_factory: Callable[[], AsyncSession],
+            handlers: dict[str, JobHandler],
+            concurrency: int,
+            poll_interval: float,
+            lease_timeout: float,
+            retry_backoff: float,
+    ) -> None:
+        self._session_factory = session_factory
+        self._handlers = handlers
+        self._concurrency = concurrency
+        self._poll_interval = poll_interval
+        self._lease = timedelta(seconds=lease_timeout)
+        self._retry_backoff = retry_backoff
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def run(self, drain: bool = False) -> None:
+        # With drain=True every worker returns as soon as nothing is runnable;
+        # jobs waiting for a retry later on stay in the table.
+        await asyncio.gather(*(self._work(drain) for _ in range(self._concurrency)))
+
+    async def _work(self, drain: bool) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                job = await self._claim()
+            except Exception:
+                if drain:
+                    raise
+                logger.exception("Failed to claim a job")
+                job = None
+
+            if job is not None:
+                # Recording the outcome can fail like the claim can. The job
+                # then keeps its lease and runs again once it expires; the
+                # worker itself has to survive to drain the rest.
+                try:
+                    await self._execute(job)
+                except Exception:
+                    logger.exception("Failed to finish job %d (%s)", job.id, job.kind)
+                    if not drain:
+                        with contextlib.suppress(asyncio.TimeoutError):
+                            await asyncio.wait_for(self._wakeup.wait(), self._poll_interval)
+            elif drain:
+                return
+            else:
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), self._poll_interval)
+
+    async def _claim(self) -> Row | None:
+        # A running job whose lease ran out took its worker down with it. On
+        # its last attempt it is failed instead of being handed to the next
+        # worker, in the same statement as the claim.
+        expired = (
+            update(Job.__table__)
+            .where(Job.status == "running", Job.run_at <= func.now(), Job.attempts >= Job.max_attempts)
+            .values(status="failed", last_error="lease expired on the last attempt")
+            .cte("expired")
+        )
+        runnable = (
+            select(Job.id)
+            .where(Job.status != "failed", Job.run_at <= func.now(), Job.attempts < Job.max_attempts)
+            .order_by(Job.run_at, Job.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        async with self._session_factory() as session, session.begin():
+            return (await session.execute(
+                update(Job.__table__)
+                .add_cte(expired)
+                .where(Job.id == runnable)
+                .values(status="running", attempts=Job.attempts + 1, run_at=func.now() + self._lease)
+                .returning(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts),
+            )).first()
+
+    async def _execute(self, job: Row) -> None:
+        handler = self._handlers.get(job.kind)
+        if handler is None:
+            logger.error("No handler for job %d of kind %r", job.id, job.kind)
+            await self._fail(job, f"no handler for job kind {job.kind!r}", retry=False)
+            return
+
+        try:
+            await handler(job.payload)
+        except Exception as exc:
+            logger.warning("Job %d (%s) failed on attempt %d", job.id, job.kind, job.attempts, exc_info=True)
+            await self._fail(job, repr(exc), retry=job.attempts < job.max_attempts)
+            return
+
+        async with self._session_factory() as session, session.begin():
+            await session.execute(delete(Job.__table__).where(Job.id == job.id))
+
+    async def _fail(self, job: Row, error: str, retry: bool) -> None:
+        if retry:
+            delay = timedelta(seconds=self._retry_backoff * 2 ** (job.attempts - 1))
+            values = {"status": "pending", "run_at": func.now() + delay}
+        else:
+            values = {"status": "failed"}
+
+        async with self._session_factory() as session, session.begin():
+            await session.execute(
+                update(Job.__table__).where(Job.id == job.id).values(**values, last_error=error),
+            )
+
+
+def job_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    def register(handler: JobHandler) -> JobHandler:
+        __handlers[kind] = handler
+        return handler
+
+    return register
+
+
+async def enqueue(session: AsyncSession, kind: str, payload: dict[str, Any], max_attempts: int | None = None) -> None:
+    # The job is written in the caller's transaction: it only becomes visible
+    # to workers once the change that caused it commits, and disappears with
+    # it on rollback.
+    await session.execute(
+        insert(Job.__table__).values(
+            kind=kind, payload=payload, max_attempts=max_attempts or settings.jobs_max_attempts,
+        ),
+    )
+    session.info["jobs_enqueued"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_job_queue(session: Session) -> None:
+    global __job_queue
+
+    if session.info.pop("jobs_enqueued", False) and __job_queue is not None:
+        __job_queue.wake()
+
+
+def init_job_queue() -> None:
+    global __job_queue
+
+    if __job_queue:
+        return
+
+    __job_queue = JobQueue(
+        get_session_factory(),
+        __handlers,
+        concurrency=settings.jobs_concurrency,
+        poll_interval=settings.jobs_poll_interval,
+        lease_timeout=settings.jobs_lease_timeout,
+        retry_backoff=settings.jobs_retry_backoff,
+    )
+
+
+def get_job_queue() -> JobQueue:
+    global __job_queue
+
+    if not __job_queue:
+        raise ValueError({"message": "call init_job_queue() first"})
+
+    return __job_queue
+
+
+async def shutdown_job_queue() -> None:
+    global __job_queue
+
+    if __job_queue:
+        await __job_queue.stop()
+        __job_queue = None
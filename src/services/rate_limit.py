@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import time
+from abc import ABC
+from abc import abstractmethod
+from collections import OrderedDict
+
+from src.configurations.settings import settings
+
+
+__all__ = [
+    "RateLimiter", "MemoryRateLimiter", "RedisRateLimiter", "NullRateLimiter",
+    "init_rate_limiter", "get_rate_limiter",
+]
+
+logger = logging.getLogger(__name__)
+
+__rate_limiter: "RateLimiter | None" = None
+
+# Token bucket in one round trip: refill by elapsed time, take a token if
+# there is one, otherwise report how long until there will be. Redis TIME
+# keeps every app server on the same clock.
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or burst
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RateLimiter(ABC):
+    # acquire() takes one token from the bucket under key and returns 0.0, or
+    # the number of seconds until a token is available if the bucket is empty.
+    @abstractmethod
+    async def acquire(self, key: str, rate: float, burst: int) -> float: ...
+
+
+class NullRateLimiter(RateLimiter):
+    async def acquire(self, key: str, rate: float, burst: int) -> float:
+        return 0.0
+
+
+class MemoryRateLimiter(RateLimiter):
+    def __init__(self, max_keys: int) -> None:
+        self._max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def acquire(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        # Evicting the least recently seen client hands it a full bucket,
+        # which only matters once max_keys clients are active at once.
+        while len(self._buckets) > self._max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class RedisRateLimiter(RateLimiter):
+    def __init__(self, url: str) -> None:
+        try:
+            from redis.asyncio import Redis
+            from redis.exceptions import RedisError
+        except ImportError as exc:
+            raise RuntimeError("Install the 'redis' package to use the redis rate limit backend") from exc
+
+        self._client = Redis.from_url(
+            url, socket_timeout=settings.rate_limit_redis_timeout,
+            socket_connect_timeout=settings.rate_limit_redis_timeout,
+        )
+        self._script = self._client.register_script(_TOKEN_BUCKET_SCRIPT)
+        self._errors = (RedisError, OSError, asyncio.TimeoutError)
+        self._failing = False
+
+    async def acquire(self, key: str, rate: float, burst: int) -> float:
+        # Rate limiting protects the service but is not part of it: while
+        # Redis is unreachable every request is let through.
+        try:
+            wait = float(await self._script(keys=[f"ratelimit:{key}"], args=[rate, burst]))
+        except self._errors:
+            if not self._failing:
+                logger.exception("Rate limiter can't reach Redis, letting requests through")
+            self._failing = True
+            return 0.0
+
+        if self._failing:
+            logger.warning("Rate limiter reached Redis again")
+        self._failing = False
+        return wait
+
+
+def init_rate_limiter() -> None:
+    global __rate_limiter
+
+    if __rate_limiter:
+        return
+
+    if settings.rate_limit_backend == "redis":
+        __rate_limiter = RedisRateLimiter(settings.redis_url)
+    elif settings.rate_limit_backend == "memory":
+        __rate_limiter = MemoryRateLimiter(settings.rate_limit_max_clients)
+    else:
+        __rate_limiter = NullRateLimiter()
+
+
+def get_rate_limiter() -> RateLimiter:
+    global __rate_limiter
+
+    if not __rate_limiter:
+        raise ValueError({"message": "call init_rate_limiter() first"})
+
+    return __rate_limiter
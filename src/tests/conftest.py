@@ -1,67 +1,203 @@
-import asyncio
+import os
 from collections.abc import AsyncGenerator
 
 import httpx
 import pytest
 import pytest_asyncio
+from pytest_asyncio import is_async_test
+from sqlalchemy import event
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.ext.asyncio import create_async_engine
 
+from src.configurations.database import run_after_commit
 from src.configurations.settings import settings
+from src.middlewares.metrics import instrument_engine
+from src.migrations import upgrade
 from src.models.base import BaseModel
+from src.models.books import Book  # noqa: F401
+from src.models.deletions import CollectionDeletion  # noqa: F401
+from src.models.jobs import Job  # noqa: F401
+from src.models.sellers import Seller  # noqa: F401
+from src.models.stats import SellerBookStats  # noqa: F401
 
 
-async_test_engine = create_async_engine(settings.database_test_url, echo=True)
+# Under pytest-xdist every worker gets its own database next to the
+# configured test database, so workers never see each other's rows.
+XDIST_WORKER = os.environ.get("PYTEST_XDIST_WORKER")
+TEST_DB_NAME = f"{settings.db_test_name}_{XDIST_WORKER}" if XDIST_WORKER else settings.db_test_name
+TEST_DATABASE_URL = settings.database_test_url.rsplit("/", 1)[0] + f"/{TEST_DB_NAME}"
+# Without a test database the tests that need one fail, so a broken CI
+# database can't pass as a green run; ALLOW_NO_DB=1 skips them instead.
+ALLOW_NO_DB = os.environ.get("ALLOW_NO_DB") == "1"
+
+# Every test request comes from the same client address, so the app under
+# test does not rate limit; test_admission drives the limiter on its own app.
+settings.rate_limit_backend = "none"
+
+async_test_engine = create_async_engine(TEST_DATABASE_URL, echo=settings.db_echo)
+instrument_engine(async_test_engine.sync_engine)
 
 async_test_session = async_sessionmaker(
     async_test_engine, expire_on_commit=False, autoflush=False,
 )
 
 
-@pytest_asyncio.fixture(scope="session")
-def event_loop():
-    loop = asyncio.get_event_loop()
-    yield loop
-    loop.close()
+def pytest_collection_modifyitems(items):
+    # One event loop for the whole run, so the pooled asyncpg connections
+    # created by session fixtures stay usable in every test.
+    session_loop = pytest.mark.asyncio(loop_scope="session")
+    for item in items:
+        if is_async_test(item):
+            item.add_marker(session_loop, append=False)
 
 
-@pytest_asyncio.fixture(scope="session", autouse=True)
-async def create_tables() -> None:
-    async with async_test_engine.begin() as connection:
-        await connection.run_sync(BaseModel.metadata.drop_all)
-        await connection.run_sync(BaseModel.metadata.create_all)
+async def _create_worker_database() -> None:
+    engine = create_async_engine(settings.database_test_url, isolation_level="AUTOCOMMIT")
+    try:
+        async with engine.connect() as connection:
+            exists = await connection.scalar(
+                text("SELECT 1 FROM pg_database WHERE datname = :name"), {"name": TEST_DB_NAME},
+            )
+            if not exists:
+                await connection.execute(text(f'CREATE DATABASE "{TEST_DB_NAME}"'))
+    finally:
+        await engine.dispose()
+
+
+@pytest_asyncio.fixture(scope="session")
+async def create_tables() -> AsyncGenerator:
+    try:
+        if XDIST_WORKER:
+            await _create_worker_database()
+        async with async_test_engine.begin() as connection:
+            await connection.run_sync(BaseModel.metadata.drop_all)
+            await connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
+        # The test schema is built by the same migrations as production.
+        async with async_test_engine.connect() as connection:
+            await connection.run_sync(upgrade)
+    except (OSError, DBAPIError) as exc:
+        if not ALLOW_NO_DB:
+            raise
+        pytest.skip(f"test database is not available: {exc}")
+
+    yield
+    await async_test_engine.dispose()
 
 
 @pytest_asyncio.fixture(scope="function")
-async def db_session() -> AsyncGenerator:
+async def db_connection(create_tables) -> AsyncGenerator:
+    # Everything a test writes happens inside this transaction and is rolled
+    # back afterwards, so tables are created once per run, not per test.
     async with async_test_engine.connect() as connection:
-        async with async_test_session(bind=connection) as session:
-            yield session
-            await session.rollback()
+        transaction = await connection.begin()
+        yield connection
+        await transaction.rollback()
+
+
+@pytest_asyncio.fixture(scope="function")
+async def db_session(db_connection) -> AsyncGenerator:
+    # Commits and rollbacks issued by the code under test only release or
+    # roll back a savepoint inside the test transaction.
+    async with async_test_session(
+            bind=db_connection, join_transaction_mode="create_savepoint",
+    ) as session:
+        await session.connection()
+        yield session
+
+
+class QueryCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, *args, **kwargs) -> None:
+        self.count += 1
+
+    def reset(self) -> None:
+        self.count = 0
+
+
+@pytest.fixture(scope="function")
+def query_counter():
+    counter = QueryCounter()
+    event.listen(async_test_engine.sync_engine, "before_cursor_execute", counter)
+    yield counter
+    event.remove(async_test_engine.sync_engine, "before_cursor_execute", counter)
 
 
 @pytest.fixture(scope="function")
 def override_get_async_session(db_session):
     async def _override_get_async_session():
         yield db_session
+        # Nothing is committed here, but the app sees the writes as if it were.
+        await run_after_commit(db_session)
 
     return _override_get_async_session
 
 
 @pytest.fixture(scope="function")
-def test_app(override_get_async_session):
+def override_get_session_factory(db_connection):
+    session_factory = async_sessionmaker(
+        bind=db_connection, join_transaction_mode="create_savepoint",
+    )
+
+    def _override_get_session_factory():
+        return session_factory
+
+    return _override_get_session_factory
+
+
+@pytest.fixture(scope="function")
+def test_cache():
+    from src.services.cache import MemoryCache
+
+    return MemoryCache(max_entries=100, ttl=60)
+
+
+@pytest.fixture(scope="session")
+def test_password_hasher():
+    from src.services.hashing import PasswordHasher
+
+    hasher = PasswordHasher(n=2 ** 4, r=8, p=1, max_workers=1)
+    yield hasher
+    hasher.shutdown()
+
+
+@pytest.fixture(scope="function")
+def test_app(
+        override_get_async_session, override_get_session_factory, test_cache, test_password_hasher,
+):
+    from src.configurations.database import get_async_read_session
     from src.configurations.database import get_async_session
+    from src.configurations.database import get_session_factory
     from src.main import app
+    from src.services.cache import get_cache
+    from src.services.hashing import get_password_hasher
+    from src.services.rate_limit import init_rate_limiter
+
+    init_rate_limiter()
 
     app.dependency_overrides[get_async_session] = override_get_async_session
+    app.dependency_overrides[get_async_read_session] = override_get_async_session
+    app.dependency_overrides[get_session_factory] = override_get_session_factory
+    app.dependency_overrides[get_cache] = lambda: test_cache
+    app.dependency_overrides[get_password_hasher] = lambda: test_password_hasher
 
     return app
 
 
+def _asgi_client(app, base_url: str = "http://test") -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url=base_url)
+
+
+@pytest.fixture(scope="session")
+def asgi_client():
+    # Tests that build their own small app talk to it through this.
+    return _asgi_client
+
+
 @pytest_asyncio.fixture(scope="function")
 async def async_client(test_app):
-    transport = httpx.ASGITransport(app=test_app)
-    async with httpx.AsyncClient(
-            transport=transport, base_url="http://127.0.0.1:8000",
-    ) as test_client:
+    async with _asgi_client(test_app, base_url="http://127.0.0.1:8000") as test_client:
         yield test_client
@@ -0,0 +1,44 @@
+import itertools
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.books import Book
+from src.models.sellers import Seller
+
+
+__all__ = ["seller_data", "book_data", "create_sellers", "create_books"]
+
+_sequence = itertools.count()
+
+
+def seller_data(**overrides) -> dict:
+    number = next(_sequence)
+    return {
+        "first_name": f"Seller{number}", "last_name": "Factory",
+        "email": f"seller{number}@factory.local", "password": "malo_poloviN!",
+        **overrides,
+    }
+
+
+def book_data(seller_id: int, **overrides) -> dict:
+    number = next(_sequence)
+    return {
+        "title": f"Book {number}", "author": "Factory Author", "year": 2022,
+        "pages": 100, "seller_id": seller_id,
+        **overrides,
+    }
+
+
+async def create_sellers(session: AsyncSession, count: int, **overrides) -> list[Seller]:
+    # add_all + flush goes out as one batched INSERT ... RETURNING.
+    sellers = [Seller(**seller_data(**overrides)) for _ in range(count)]
+    session.add_all(sellers)
+    await session.flush()
+    return sellers
+
+
+async def create_books(session: AsyncSession, seller: Seller, count: int, **overrides) -> list[Book]:
+    books = [Book(**book_data(seller.id, **overrides)) for _ in range(count)]
+    session.add_all(books)
+    await session.flush()
+    return books
@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+
+from src.configurations.settings import settings
+from src.middlewares.admission import AdmissionMiddleware
+from src.middlewares.admission import _client as client_address
+from src.services.rate_limit import MemoryRateLimiter
+from src.services.rate_limit import RedisRateLimiter
+
+
+def _app(**middleware_options) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    @app.get("/other")
+    async def get_other():
+        return {}
+
+    @app.get("/internal/pool")
+    async def get_pool():
+        return {}
+
+    app.add_middleware(AdmissionMiddleware, **middleware_options)
+    return app
+
+
+@pytest.mark.asyncio()
+async def test_memory_rate_limiter_refills_over_time():
+    limiter = MemoryRateLimiter(max_keys=10)
+
+    assert await limiter.acquire("client", rate=10, burst=2) == 0
+    assert await limiter.acquire("client", rate=10, burst=2) == 0
+    assert 0 < await limiter.acquire("client", rate=10, burst=2) <= 0.1
+    assert await limiter.acquire("other", rate=10, burst=2) == 0
+
+    await asyncio.sleep(0.15)
+    assert await limiter.acquire("client", rate=10, burst=2) == 0
+
+
+@pytest.mark.asyncio()
+async def test_client_over_its_rate_gets_429(monkeypatch, asgi_client):
+    monkeypatch.setattr(settings, "rate_limit_rate", 1.0)
+    monkeypatch.setattr(settings, "rate_limit_burst", 2)
+
+    async with asgi_client(_app(rate_limiter=MemoryRateLimiter(max_keys=10))) as client:
+        assert (await client.get("/items/1")).status_code == 200
+        assert (await client.get("/other")).status_code == 200
+
+        response = await client.get("/items/1")
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "1"
+
+        assert (await client.get("/internal/pool")).status_code == 200
+
+
+@pytest.mark.asyncio()
+async def test_route_limit_applies_per_route(monkeypatch, asgi_client):
+    monkeypatch.setattr(settings, "rate_limit_routes", {"GET /items/{item_id}": (0.5, 1)})
+
+    async with asgi_client(_app(rate_limiter=MemoryRateLimiter(max_keys=10))) as client:
+        assert (await client.get("/items/1")).status_code == 200
+
+        response = await client.get("/items/2")
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "2"
+
+        assert (await client.get("/other")).status_code == 200
+
+
+@pytest.mark.asyncio()
+async def test_saturated_pool_sheds_load_past_its_queue(monkeypatch, asgi_client):
+    monkeypatch.setattr(settings, "max_connection_count", 1)
+    monkeypatch.setattr(settings, "db_max_overflow", 0)
+    monkeypatch.setattr(settings, "admission_max_pool_queue", 0)
+    saturated = False
+    release = asyncio.Event()
+    app = _app(rate_limiter=MemoryRateLimiter(max_keys=10), is_pool_saturated=lambda: saturated)
+
+    @app.get("/slow")
+    async def get_slow():
+        await release.wait()
+        return {}
+
+    async with asgi_client(app) as client:
+        slow = asyncio.create_task(client.get("/slow"))
+        await asyncio.sleep(0.01)
+        assert (await client.get("/items/1")).status_code == 200
+
+        saturated = True
+        response = await client.get("/items/1")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == str(settings.admission_retry_after)
+        assert (await client.get("/internal/pool")).status_code == 200
+
+        release.set()
+        assert (await slow).status_code == 200
+        assert (await client.get("/items/1")).status_code == 200
+
+
+@pytest.mark.asyncio()
+async def test_in_flight_cap_sheds_load(monkeypatch, asgi_client):
+    monkeypatch.setattr(settings, "admission_max_in_flight", 1)
+    release = asyncio.Event()
+    app = _app(rate_limiter=MemoryRateLimiter(max_keys=10))
+
+    @app.get("/slow")
+    async def get_slow():
+        await release.wait()
+        return {}
+
+    async with asgi_client(app) as client:
+        slow = asyncio.create_task(client.get("/slow"))
+        await asyncio.sleep(0.01)
+
+        assert (await client.get("/other")).status_code == 503
+
+        release.set()
+        assert (await slow).status_code == 200
+        assert (await client.get("/other")).status_code == 200
+
+
+def test_forwarded_client_is_taken_from_trusted_hops(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_trust_forwarded", True)
+    scope = {
+        "client": ("10.0.0.2", 1234),
+        "headers": [(b"x-forwarded-for", b"1.1.1.1, 203.0.113.7"), (b"x-forwarded-for", b"10.0.0.1")],
+    }
+
+    # The leftmost entries come from the client and can be anything.
+    assert client_address(scope) == "10.0.0.1"
+    monkeypatch.setattr(settings, "rate_limit_trusted_hops", 2)
+    assert client_address(scope) == "203.0.113.7"
+    monkeypatch.setattr(settings, "rate_limit_trusted_hops", 4)
+    assert client_address(scope) == "10.0.0.2"
+
+
+@pytest.mark.asyncio()
+async def test_redis_rate_limiter_fails_open():
+    pytest.importorskip("redis")
+
+    rate_limiter = RedisRateLimiter("redis://127.0.0.1:1/0")
+
+    assert await rate_limiter.acquire("client", 1.0, 1) == 0.0
+    assert await rate_limiter.acquire("client", 1.0, 1) == 0.0
@@ -0,0 +1,66 @@
+import orjson
+import pytest
+
+from src.benchmarks.__main__ import _parse_args
+from src.benchmarks.runner import compare_results
+from src.benchmarks.runner import percentile
+from src.benchmarks.scenarios import SCENARIOS
+from src.benchmarks.serialization import SERIALIZERS
+from src.benchmarks.serialization import make_sellers
+from src.configurations.settings import settings
+from src.routers import v1_router
+
+
+def test_every_v1_route_has_scenario():
+    routes = {
+        f"{method} {route.path}"
+        for route in v1_router.routes
+        for method in route.methods
+    }
+
+    assert routes == {scenario.name for scenario in SCENARIOS}
+
+
+def test_percentile():
+    values = [float(i) for i in range(1, 101)]
+
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 95) == 95.0
+    assert percentile(values, 99) == 99.0
+
+
+def test_compare_results_detects_regression():
+    baseline = {
+        "routes": {
+            "GET /api/v1/books/": {"p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 30.0, "rps": 100.0},
+            "GET /api/v1/sellers/": {"p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 30.0, "rps": 100.0},
+        },
+    }
+    current = {
+        "routes": {
+            "GET /api/v1/books/": {"p50_ms": 10.5, "p95_ms": 21.0, "p99_ms": 31.0, "rps": 98.0},
+            "GET /api/v1/sellers/": {"p50_ms": 10.0, "p95_ms": 40.0, "p99_ms": 30.0, "rps": 60.0},
+        },
+    }
+
+    assert compare_results(baseline, current, threshold=0.1) == [
+        "GET /api/v1/sellers/: p95_ms 20.00 -> 40.00",
+        "GET /api/v1/sellers/: rps 100.0 -> 60.0",
+    ]
+
+
+def test_serializers_produce_same_document():
+    sellers = make_sellers(sellers_count=3, books_per_seller=2)
+
+    documents = [orjson.loads(serializer(sellers)) for serializer in SERIALIZERS.values()]
+
+    assert all(document == {"sellers": sellers, "next_cursor": None} for document in documents)
+
+
+def test_writing_to_app_database_needs_confirmation():
+    assert _parse_args(["seed"]).database_url == settings.database_test_url
+
+    for command in (["seed"], ["run"]):
+        with pytest.raises(SystemExit):
+            _parse_args(["--database-url", settings.database_url, *command])
+        assert _parse_args(["--database-url", settings.database_url, "--yes", *command]).yes
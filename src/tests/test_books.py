@@ -1,9 +1,19 @@
+from datetime import datetime
+from datetime import timezone
+
+import orjson
 import pytest
 from fastapi import status
 from sqlalchemy import select
+from sqlalchemy import update
 
 from src.models.books import Book
+from src.models.deletions import CollectionDeletion
 from src.models.sellers import Seller
+from src.services.cache import BOOKS_LIST_PREFIX
+from src.services.freshness import last_modified
+from src.tests.factories import create_books
+from src.tests.factories import create_sellers
 
 
 @pytest.mark.asyncio()
@@ -93,9 +103,140 @@ async def test_create_book(db_session, async_client):
         "year": 2022,
         "pages": 7,
         "seller_id": seller.id,
+        "version": 1,
     }
 
 
+@pytest.mark.asyncio()
+async def test_create_books_bulk(db_session, async_client):
+    seller = Seller(
+        first_name="Olga",
+        last_name="Buzova",
+        email="best_singer@mail.com",
+        password="malo_poloviN!",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    books = [
+        {
+            "title": "How to sing if bear stepped on your ear",
+            "author": "Buzova Olga", "year": 2022,
+            "count_pages": 7, "seller_id": seller.id,
+        },
+        {
+            "title": "'Dom 2' made a person of me",
+            "author": "Buzova Olga", "year": 2000,
+            "count_pages": 35, "seller_id": seller.id,
+        },
+        {
+            "title": "Say yes for money",
+            "author": "Zoteeva Dasha", "year": 2023,
+            "count_pages": 100, "seller_id": seller.id + 1,
+        },
+    ]
+
+    response = await async_client.post("/api/v1/books/bulk", json=books)
+    assert response.status_code == status.HTTP_200_OK
+
+    result_data = response.json()
+    assert result_data["created"] == 1
+    assert result_data["failed"] == 2
+
+    created, too_old, unknown_seller = result_data["results"]
+    assert created["status"] == "created"
+    assert too_old == {"index": 1, "status": "error", "id": None, "detail": "Year is too old"}
+    assert unknown_seller == {"index": 2, "status": "error", "id": None, "detail": "Seller not found"}
+
+    res = await db_session.get(Book, created["id"])
+    assert res.title == "How to sing if bear stepped on your ear"
+    assert res.pages == 7
+    assert res.seller_id == seller.id
+
+
+@pytest.mark.asyncio()
+async def test_create_books_bulk_rejects_values_the_columns_cannot_hold(db_session, async_client):
+    seller = Seller(
+        first_name="Olga",
+        last_name="Buzova",
+        email="best_singer@mail.com",
+        password="malo_poloviN!",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    book = {"title": "Say yes for money", "author": "Zoteeva Dasha", "year": 2023, "count_pages": 100}
+    books = [
+        {**book, "seller_id": seller.id},
+        {**book, "title": "x" * 60, "seller_id": seller.id},
+        {**book, "author": "x" * 101, "seller_id": seller.id},
+        {**book, "count_pages": 2 ** 31, "seller_id": seller.id},
+        {**book, "seller_id": 2 ** 31},
+    ]
+
+    response = await async_client.post("/api/v1/books/bulk", json=books)
+    assert response.status_code == status.HTTP_200_OK
+
+    result_data = response.json()
+    assert result_data["created"] == 1
+    assert result_data["failed"] == 4
+    assert [item["status"] for item in result_data["results"]] == ["created"] + ["error"] * 4
+
+    titles = await db_session.scalars(select(Book.title))
+    assert list(titles) == ["Say yes for money"]
+
+
+@pytest.mark.asyncio()
+async def test_create_books_bulk_with_many_sellers(db_session, async_client):
+    [seller] = await create_sellers(db_session, 1)
+
+    # More distinct seller ids than a statement can bind as parameters.
+    books = [
+        {"title": "Book", "author": "Author", "year": 2022, "count_pages": 10, "seller_id": seller.id + i}
+        for i in range(33_000)
+    ]
+
+    response = await async_client.post("/api/v1/books/bulk", json=books)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["created"] == 1
+    assert response.json()["failed"] == 32_999
+
+
+@pytest.mark.asyncio()
+async def test_create_books_bulk_from_ndjson(db_session, async_client):
+    seller = Seller(
+        first_name="Olga",
+        last_name="Buzova",
+        email="best_singer@mail.com",
+        password="malo_poloviN!",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    books = [
+        {
+            "title": f"Book {i}", "author": "Buzova Olga", "year": 2022,
+            "count_pages": 10, "seller_id": seller.id,
+        }
+        for i in range(3)
+    ]
+    content = b"".join(orjson.dumps(book) + b"\n" for book in books) + b"not a json\n"
+
+    response = await async_client.post(
+        "/api/v1/books/bulk", content=content,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    result_data = response.json()
+    assert result_data["created"] == 3
+    assert result_data["failed"] == 1
+    assert [item["status"] for item in result_data["results"]] == ["created"] * 3 + ["error"]
+
+    all_books = await db_session.execute(select(Book).order_by(Book.id))
+    assert [book.title for book in all_books.scalars()] == ["Book 0", "Book 1", "Book 2"]
+
+
 @pytest.mark.asyncio()
 async def test_create_book_with_invalid_year(db_session, async_client):
     seller = Seller(
@@ -163,6 +304,7 @@ async def test_get_books(db_session, async_client):
                 "year": 2022,
                 "pages": 7,
                 "seller_id": seller.id,
+                "version": 1,
             },
             {
                 "id": book2.id,
@@ -171,11 +313,174 @@ async def test_get_books(db_session, async_client):
                 "year": 2023,
                 "pages": 100,
                 "seller_id": seller.id,
+                "version": 1,
             },
         ],
+        "next_cursor": None,
     }
 
 
+@pytest.mark.asyncio()
+async def test_get_books_pagination(db_session, async_client):
+    seller = Seller(
+        first_name="Olga", last_name="Buzova",
+        email="best_singer@mail.com", password="malo_poloviN!",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    books = [
+        Book(
+            title=f"Book {i}", author="Buzova Olga",
+            year=2022, pages=10, seller_id=seller.id,
+        )
+        for i in range(3)
+    ]
+    db_session.add_all(books)
+    await db_session.flush()
+
+    response = await async_client.get("/api/v1/books/", params={"limit": 2})
+    assert response.status_code == status.HTTP_200_OK
+
+    first_page = response.json()
+    assert [book["id"] for book in first_page["books"]] == [books[0].id, books[1].id]
+    assert first_page["next_cursor"] == books[1].id
+
+    response = await async_client.get(
+        "/api/v1/books/", params={"limit": 2, "after": first_page["next_cursor"]},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    second_page = response.json()
+    assert [book["id"] for book in second_page["books"]] == [books[2].id]
+    assert second_page["next_cursor"] is None
+
+
+@pytest.mark.asyncio()
+async def test_get_books_with_filters(db_session, async_client):
+    seller = Seller(
+        first_name="Olga", last_name="Buzova",
+        email="best_singer@mail.com", password="malo_poloviN!",
+    )
+    seller2 = Seller(
+        first_name="Dasha", last_name="Zoteeva",
+        email="instasamka@mail.com", password="Za_dengi_Da!",
+    )
+    db_session.add_all([seller, seller2])
+    await db_session.flush()
+
+    book = Book(
+        title="How to sing if bear stepped on your ear",
+        author="Buzova Olga", year=2021, pages=7, seller_id=seller.id,
+    )
+    book2 = Book(
+        title="Say yes for money",
+        author="Zoteeva Dasha", year=2023, pages=100, seller_id=seller2.id,
+    )
+    book3 = Book(
+        title="Dom 2 made a person of me",
+        author="Buzova Olga", year=2024, pages=35, seller_id=seller.id,
+    )
+    db_session.add_all([book, book2, book3])
+    await db_session.flush()
+
+    response = await async_client.get(
+        "/api/v1/books/", params={"author": "Buzova Olga", "year_from": 2022},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [book["id"] for book in response.json()["books"]] == [book3.id]
+
+    response = await async_client.get(
+        "/api/v1/books/", params={"seller_id": seller2.id, "year_to": 2023},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [book["id"] for book in response.json()["books"]] == [book2.id]
+
+    for param in ("after", "seller_id", "year_from", "year_to"):
+        response = await async_client.get("/api/v1/books/", params={param: 2 ** 40})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio()
+async def test_search_books(db_session, async_client):
+    seller = Seller(
+        first_name="Olga", last_name="Buzova",
+        email="best_singer@mail.com", password="malo_poloviN!",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    book = Book(title="Mtzyri", author="Lermontov", year=2023, pages=100, seller_id=seller.id)
+    book2 = Book(title="Demon", author="Lermontov", year=2022, pages=80, seller_id=seller.id)
+    book3 = Book(
+        title="Say yes for money", author="Zoteeva Dasha", year=2023, pages=100, seller_id=seller.id,
+    )
+    db_session.add_all([book, book2, book3])
+    await db_session.flush()
+
+    response = await async_client.get("/api/v1/books/search", params={"q": "lermo"})
+    assert response.status_code == status.HTTP_200_OK
+    assert [book["id"] for book in response.json()["books"]] == [book.id, book2.id]
+
+    response = await async_client.get("/api/v1/books/search", params={"q": "Lermantov mtzyri"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["books"][0] == {
+        "id": book.id, "title": "Mtzyri", "author": "Lermontov",
+        "year": 2023, "pages": 100, "seller_id": seller.id, "version": 1,
+    }
+
+    response = await async_client.get("/api/v1/books/search", params={"q": "lermontov", "limit": 1})
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()["books"]) == 1
+    assert response.json()["next_offset"] == 1
+
+
+@pytest.mark.asyncio()
+async def test_export_books(db_session, async_client):
+    seller = Seller(
+        first_name="Olga", last_name="Buzova",
+        email="best_singer@mail.com", password="malo_poloviN!",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    book = Book(
+        title="How to sing if bear stepped on your ear",
+        author="Buzova Olga", year=2022, pages=7, seller_id=seller.id,
+    )
+    book2 = Book(
+        title="Say yes for money",
+        author="Zoteeva Dasha", year=2023, pages=100, seller_id=seller.id,
+    )
+    db_session.add_all([book, book2])
+    await db_session.flush()
+
+    response = await async_client.get("/api/v1/books/export")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    assert [orjson.loads(line) for line in response.text.splitlines()] == [
+        {
+            "id": book.id,
+            "title": "How to sing if bear stepped on your ear",
+            "author": "Buzova Olga",
+            "year": 2022,
+            "pages": 7,
+            "seller_id": seller.id,
+            "version": 1,
+        },
+        {
+            "id": book2.id,
+            "title": "Say yes for money",
+            "author": "Zoteeva Dasha",
+            "year": 2023,
+            "pages": 100,
+            "seller_id": seller.id,
+            "version": 1,
+        },
+    ]
+
+
 @pytest.mark.asyncio()
 async def test_get_single_book(db_session, async_client):
     seller = Seller(
@@ -217,6 +522,7 @@ async def test_get_single_book(db_session, async_client):
         "year": 2022,
         "pages": 7,
         "seller_id": seller.id,
+        "version": 1,
     }
 
 
@@ -257,3 +563,325 @@ async def test_update_book(db_session, async_client):
     assert res.pages == 18335
     assert res.id == book.id
     assert res.seller_id == seller.id
+
+
+@pytest.mark.asyncio()
+async def test_update_book_conflicts_with_concurrent_write(db_session, async_client):
+    [seller] = await create_sellers(db_session, 1)
+    [book] = await create_books(db_session, seller, 1)
+    book_id = book.id
+    new_book_data = {
+        "id": book_id, "title": "Overwrite", "author": "Kirkorov Philippe",
+        "year": 2023, "pages": 18335, "seller_id": seller.id,
+    }
+    await db_session.commit()
+
+    # Another request commits a change after this session loaded the book.
+    await db_session.execute(
+        update(Book.__table__).where(Book.id == book_id).values(title="Patched meanwhile", version=Book.version + 1),
+    )
+    await db_session.commit()
+
+    response = await async_client.put(f"/api/v1/books/{book_id}", json=new_book_data)
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert await db_session.scalar(select(Book.title).where(Book.id == book_id)) == "Patched meanwhile"
+
+
+@pytest.mark.asyncio()
+async def test_get_single_book_is_cached(db_session, async_client):
+    seller = Seller(
+        first_name="Olga", last_name="Buzova",
+        email="best_singer@mail.com", password="malo_poloviN!",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    book = Book(
+        title="How to sing if bear stepped on your ear",
+        author="Buzova Olga", year=2022,
+        pages=7, seller_id=seller.id,
+    )
+    db_session.add(book)
+    await db_session.flush()
+
+    response = await async_client.get(f"/api/v1/books/{book.id}")
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["etag"]
+
+    book.title = "Changed behind the cache"
+    await db_session.flush()
+
+    response = await async_client.get(f"/api/v1/books/{book.id}")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["title"] == "How to sing if bear stepped on your ear"
+
+    response = await async_client.get(
+        f"/api/v1/books/{book.id}", headers={"If-None-Match": etag},
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+
+    # Primary reads skip the cache and do not fill it.
+    response = await async_client.get(f"/api/v1/books/{book.id}", headers={"X-Read-Consistency": "primary"})
+    assert response.json()["title"] == "Changed behind the cache"
+    response = await async_client.get(f"/api/v1/books/{book.id}")
+    assert response.json()["title"] == "How to sing if bear stepped on your ear"
+
+
+@pytest.mark.asyncio()
+async def test_update_book_invalidates_cache(db_session, async_client):
+    seller = Seller(
+        first_name="Olga", last_name="Buzova",
+        email="best_singer@mail.com", password="malo_poloviN!",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    book = Book(
+        title="How to sing if bear stepped on your ear",
+        author="Buzova Olga", year=2022,
+        pages=7, seller_id=seller.id,
+    )
+    db_session.add(book)
+    await db_session.flush()
+
+    response = await async_client.get(f"/api/v1/books/{book.id}")
+    etag = response.headers["etag"]
+    response = await async_client.get("/api/v1/books/")
+    assert response.json()["books"][0]["title"] == "How to sing if bear stepped on your ear"
+
+    new_book_data = {
+        "id": book.id, "title": "What to do if you enter the wrong door",
+        "author": "Kirkorov Philippe", "year": 2023,
+        "pages": 18335, "seller_id": seller.id,
+    }
+    response = await async_client.put(f"/api/v1/books/{book.id}", json=new_book_data)
+    assert response.status_code == status.HTTP_200_OK
+
+    response = await async_client.get(
+        f"/api/v1/books/{book.id}", headers={"If-None-Match": etag},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] != etag
+    assert response.json()["title"] == "What to do if you enter the wrong door"
+
+    response = await async_client.get("/api/v1/books/")
+    assert response.json()["books"][0]["title"] == "What to do if you enter the wrong door"
+
+
+@pytest.mark.asyncio()
+async def test_book_reads_use_single_statement(db_session, async_client, query_counter):
+    seller = Seller(
+        first_name="Olga", last_name="Buzova",
+        email="best_singer@mail.com", password="malo_poloviN!",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    book = Book(
+        title="How to sing if bear stepped on your ear",
+        author="Buzova Olga", year=2022,
+        pages=7, seller_id=seller.id,
+    )
+    db_session.add(book)
+    await db_session.flush()
+    db_session.expunge(book)
+
+    query_counter.reset()
+    response = await async_client.get(f"/api/v1/books/{book.id}")
+    assert response.status_code == status.HTTP_200_OK
+    assert query_counter.count == 1
+
+    query_counter.reset()
+    response = await async_client.get("/api/v1/books/")
+    assert response.status_code == status.HTTP_200_OK
+    assert query_counter.count == 1
+
+
+@pytest.mark.asyncio()
+async def test_patch_book(db_session, async_client, query_counter):
+    seller = Seller(
+        first_name="Olga", last_name="Buzova",
+        email="best_singer@mail.com", password="malo_poloviN!",
+    )
+    seller2 = Seller(
+        first_name="Dasha", last_name="Zoteeva",
+        email="instasamka@mail.com", password="Za_dengi_Da!",
+    )
+    db_session.add_all([seller, seller2])
+    await db_session.flush()
+
+    book = Book(author="Pushkin", title="Eugeny Onegin", year=2001, pages=104, seller_id=seller.id)
+    db_session.add(book)
+    await db_session.flush()
+
+    response = await async_client.get(f"/api/v1/sellers/{seller.id}")
+    assert len(response.json()["books"]) == 1
+
+    query_counter.reset()
+    response = await async_client.patch(
+        f"/api/v1/books/{book.id}", json={"version": 1, "pages": 200, "seller_id": seller2.id},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert query_counter.count == 1
+    assert response.json() == {
+        "id": book.id, "title": "Eugeny Onegin", "author": "Pushkin", "year": 2001,
+        "pages": 200, "seller_id": seller2.id, "version": 2,
+    }
+
+    response = await async_client.get(f"/api/v1/sellers/{seller.id}")
+    assert response.json()["books"] == []
+
+    response = await async_client.patch(f"/api/v1/books/{book.id}", json={"version": 1, "pages": 300})
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+    response = await async_client.get(f"/api/v1/books/{book.id}")
+    assert response.json()["pages"] == 200
+
+    response = await async_client.patch(f"/api/v1/books/{book.id}", json={"version": 2, "title": None})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    response = await async_client.patch(f"/api/v1/books/{book.id + 1}", json={"version": 1, "pages": 1})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    response = await async_client.patch(f"/api/v1/books/{book.id}", json={"version": 2, "year": 2019})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    response = await async_client.patch(f"/api/v1/books/{book.id}", json={"version": 2 ** 40, "pages": 1})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    response = await async_client.patch(
+        f"/api/v1/books/{book.id}", json={"version": 2, "seller_id": seller2.id + 1},
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    response = await async_client.get(f"/api/v1/books/{book.id}")
+    assert response.json()["seller_id"] == seller2.id
+
+
+@pytest.mark.asyncio()
+async def test_update_book_bumps_version(db_session, async_client):
+    seller = Seller(
+        first_name="Olga", last_name="Buzova",
+        email="best_singer@mail.com", password="malo_poloviN!",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    book = Book(author="Pushkin", title="Eugeny Onegin", year=2001, pages=104, seller_id=seller.id)
+    db_session.add(book)
+    await db_session.flush()
+
+    response = await async_client.put(f"/api/v1/books/{book.id}", json={
+        "id": book.id, "title": "Mziri", "author": "Lermontov", "year": 2007,
+        "pages": 104, "seller_id": seller.id,
+    })
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["version"] == 2
+
+    response = await async_client.patch(f"/api/v1/books/{book.id}", json={"version": 1, "title": "Stale"})
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+
+@pytest.mark.asyncio()
+async def test_delete_books_bulk(db_session, async_client, query_counter):
+    [seller] = await create_sellers(db_session, 1)
+    books = await create_books(db_session, seller, 3)
+
+    response = await async_client.get(f"/api/v1/books/{books[0].id}")
+    assert response.status_code == status.HTTP_200_OK
+
+    query_counter.reset()
+    missing_id = books[-1].id + 1
+    response = await async_client.request(
+        "DELETE", "/api/v1/books/bulk", json={"ids": [books[0].id, books[1].id, missing_id]},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"deleted": [books[0].id, books[1].id], "not_found": [missing_id]}
+    assert query_counter.count == 1
+
+    response = await async_client.get(f"/api/v1/books/{books[0].id}")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    response = await async_client.get("/api/v1/books/")
+    assert [book["id"] for book in response.json()["books"]] == [books[2].id]
+
+    for route in ("/api/v1/books/bulk", "/api/v1/sellers/bulk"):
+        response = await async_client.request("DELETE", route, json={"ids": [2 ** 40]})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio()
+async def test_list_books_last_modified(db_session, async_client):
+    [seller] = await create_sellers(db_session, 1)
+    await create_books(db_session, seller, 2)
+    await db_session.execute(update(Book).values(updated_at=datetime(2021, 1, 1, tzinfo=timezone.utc)))
+
+    response = await async_client.get("/api/v1/books/")
+    assert response.headers["last-modified"] == "Fri, 01 Jan 2021 00:00:00 GMT"
+
+    assert response.headers["cache-control"] == "no-cache"
+    etag = response.headers["etag"]
+
+    response = await async_client.get("/api/v1/books/", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["last-modified"] == "Fri, 01 Jan 2021 00:00:00 GMT"
+
+    # The date is never used to revalidate.
+    response = await async_client.get("/api/v1/books/", headers={"If-Modified-Since": "Fri, 01 Jan 2021 00:00:00 GMT"})
+    assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.asyncio()
+async def test_late_commit_is_not_hidden_by_last_modified(db_session, async_client, test_cache):
+    [seller] = await create_sellers(db_session, 1)
+    books = await create_books(db_session, seller, 2)
+    await db_session.execute(update(Book).values(updated_at=datetime(2021, 1, 1, tzinfo=timezone.utc)))
+
+    response = await async_client.get("/api/v1/books/")
+    etag, served_at = response.headers["etag"], response.headers["last-modified"]
+
+    # A write whose statement ran before that page was built but committed
+    # after it carries an older updated_at than the page's Last-Modified.
+    await db_session.execute(
+        update(Book).where(Book.id == books[0].id)
+        .values(title="Committed late", updated_at=datetime(2020, 12, 31, tzinfo=timezone.utc)),
+    )
+    await test_cache.delete_prefix(BOOKS_LIST_PREFIX)
+
+    for headers in ({"If-Modified-Since": served_at}, {"If-None-Match": etag, "If-Modified-Since": served_at}):
+        response = await async_client.get("/api/v1/books/", headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["books"][0]["title"] == "Committed late"
+
+
+@pytest.mark.asyncio()
+async def test_last_modified_moves_on_delete(db_session):
+    [seller] = await create_sellers(db_session, 1)
+    books = await create_books(db_session, seller, 2)
+    before = await db_session.scalar(select(last_modified(Book)))
+
+    # The newest row goes away, so only the deletion marker can move the
+    # timestamp forward.
+    await db_session.delete(books[1])
+    await db_session.flush()
+
+    assert await db_session.scalar(select(last_modified(Book))) > before
+
+
+@pytest.mark.asyncio()
+async def test_deletion_markers_fold_into_the_newest(db_session):
+    [seller] = await create_sellers(db_session, 1)
+    books = await create_books(db_session, seller, 3)
+
+    stamps = []
+    for book in books:
+        await db_session.delete(book)
+        await db_session.flush()
+        stamps.append(await db_session.scalar(select(last_modified(Book))))
+
+    assert stamps == sorted(stamps)
+    markers = (await db_session.execute(
+        select(CollectionDeletion.deleted_at).where(CollectionDeletion.collection == Book.__tablename__),
+    )).scalars().all()
+    assert markers == [stamps[-1]]
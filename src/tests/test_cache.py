@@ -0,0 +1,176 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from src.configurations.database import run_after_commit
+from src.services.cache import BOOKS_LIST_PREFIX
+from src.services.cache import CacheEntry
+from src.services.cache import RedisCache
+from src.services.cache import book_key
+from src.services.cache import cached_response
+from src.services.cache import invalidate_books
+from src.services.cache import single_flight
+
+
+@pytest.mark.asyncio()
+async def test_single_flight_shares_result():
+    calls = 0
+
+    async def build() -> bytes:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return b"body"
+
+    results = await asyncio.gather(*(single_flight("key", build) for _ in range(5)))
+
+    assert results == [b"body"] * 5
+    assert calls == 1
+
+    assert await single_flight("key", build) == b"body"
+    assert calls == 2
+
+
+@pytest.mark.asyncio()
+async def test_single_flight_followers_retry_after_leader_failure():
+    calls = 0
+
+    async def build() -> bytes:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        if calls == 1:
+            raise RuntimeError("leader failed")
+        return b"body"
+
+    results = await asyncio.gather(
+        *(single_flight("key", build) for _ in range(3)), return_exceptions=True,
+    )
+
+    assert isinstance(results[0], RuntimeError)
+    assert results[1:] == [b"body", b"body"]
+    assert calls == 3
+
+
+@pytest.mark.asyncio()
+async def test_single_flight_follower_cancellation_keeps_flight():
+    async def build() -> bytes:
+        await asyncio.sleep(0.01)
+        return b"body"
+
+    leader = asyncio.ensure_future(single_flight("key", build))
+    follower = asyncio.ensure_future(single_flight("key", build))
+    await asyncio.sleep(0)
+    follower.cancel()
+
+    assert await leader == b"body"
+    with pytest.raises(asyncio.CancelledError):
+        await follower
+
+
+@pytest.mark.asyncio()
+async def test_invalidation_waits_for_commit(db_session, test_cache):
+    entry = CacheEntry.from_body(b"body")
+    await test_cache.set(book_key(1), entry)
+
+    await invalidate_books(test_cache, [1], session=db_session)
+    # A read before the commit still sees the old rows, so the entry stays.
+    assert await test_cache.get(book_key(1)) == entry
+
+    await run_after_commit(db_session)
+    assert await test_cache.get(book_key(1)) is None
+
+
+@pytest.mark.asyncio()
+async def test_single_flight_only_leader_stores():
+    stored = []
+
+    async def build() -> bytes:
+        await asyncio.sleep(0.01)
+        return b"body"
+
+    async def store(body: bytes) -> None:
+        stored.append(body)
+
+    results = await asyncio.gather(*(single_flight("key", build, store) for _ in range(5)))
+
+    assert results == [b"body"] * 5
+    assert stored == [b"body"]
+
+
+@pytest.mark.asyncio()
+async def test_invalidation_during_flight_skips_store(db_session, test_cache):
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def build() -> bytes:
+        started.set()
+        await release.wait()
+        return b"stale"
+
+    async def store(body: bytes) -> None:
+        await test_cache.set(book_key(1), CacheEntry.from_body(body))
+
+    flight = asyncio.ensure_future(single_flight(book_key(1), build, store))
+    await started.wait()
+
+    # A write commits while the flight still holds the rows it read before.
+    await invalidate_books(test_cache, [1], session=db_session)
+    await run_after_commit(db_session)
+    release.set()
+
+    assert await flight == b"stale"
+    assert await test_cache.get(book_key(1)) is None
+
+
+@pytest.mark.asyncio()
+async def test_replica_read_after_invalidation_is_not_cached(db_session, test_cache):
+    async def build() -> bytes:
+        return b"maybe stale"
+
+    await invalidate_books(test_cache, [1], session=db_session)
+    await run_after_commit(db_session)
+
+    request = Request({"type": "http", "method": "GET", "headers": []})
+    request.state.read_from_replica = True
+    response = await cached_response(request, test_cache, book_key(1), build)
+    assert response.body == b"maybe stale"
+    assert await test_cache.get(book_key(1)) is None
+
+    request.state.read_from_replica = False
+    await cached_response(request, test_cache, book_key(1), build)
+    assert await test_cache.get(book_key(1)) is not None
+
+
+@pytest.mark.asyncio()
+async def test_replica_read_after_write_in_another_worker_is_not_cached(test_cache):
+    async def build() -> bytes:
+        return b"maybe stale"
+
+    # Another worker's write leaves its mark in the shared backend only.
+    await test_cache.mark_invalidated([book_key(1), BOOKS_LIST_PREFIX], ttl=60)
+
+    request = Request({"type": "http", "method": "GET", "headers": []})
+    request.state.read_from_replica = True
+    for key in (book_key(1), f"{BOOKS_LIST_PREFIX}limit=10"):
+        await cached_response(request, test_cache, key, build)
+        assert await test_cache.get(key) is None
+
+    await cached_response(request, test_cache, book_key(10), build)
+    assert await test_cache.get(book_key(10)) is not None
+
+
+@pytest.mark.asyncio()
+async def test_unreachable_redis_cache_reads_through():
+    pytest.importorskip("redis")
+
+    async def build() -> bytes:
+        return b"body"
+
+    cache = RedisCache("redis://127.0.0.1:1/0", ttl=60)
+    request = Request({"type": "http", "method": "GET", "headers": []})
+
+    response = await cached_response(request, cache, book_key(1), build)
+    assert response.status_code == 200
+    assert response.body == b"body"
@@ -0,0 +1,147 @@
+import zlib
+
+import orjson
+import pytest
+from fastapi import FastAPI
+from fastapi import Response
+from fastapi import status
+
+from src.middlewares.compression import BrotliEncoder
+from src.middlewares.compression import CompressionMiddleware
+from src.middlewares.compression import available_encodings
+from src.middlewares.compression import negotiate_encoding
+from src.tests.factories import create_books
+from src.tests.factories import create_sellers
+
+LARGE_BODY = orjson.dumps({"books": [{"id": index, "title": "War and Peace"} for index in range(500)]})
+
+
+def _app(encodings: list[str]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/large")
+    async def get_large():
+        return Response(content=LARGE_BODY, media_type="application/json", headers={"ETag": '"large"'})
+
+    @app.get("/small")
+    async def get_small():
+        return Response(content=b'{"id":1}', media_type="application/json")
+
+    app.add_middleware(CompressionMiddleware, encodings=encodings)
+    return app
+
+
+def test_negotiate_encoding():
+    encodings = ["zstd", "br", "gzip"]
+
+    assert negotiate_encoding("gzip, br", encodings) == "br"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5", encodings) == "gzip"
+    assert negotiate_encoding("gzip;q=0", encodings) is None
+    assert negotiate_encoding("*;q=0.1, zstd;q=0", encodings) == "br"
+    assert negotiate_encoding("identity", encodings) is None
+    assert negotiate_encoding("", encodings) is None
+
+
+def test_missing_encoder_package_is_reported(monkeypatch, caplog):
+    monkeypatch.setattr(BrotliEncoder, "module", "not_installed_brotli")
+
+    assert available_encodings(["br", "gzip"]) == ["gzip"]
+    assert "not_installed_brotli" in caplog.text
+
+
+@pytest.mark.asyncio()
+async def test_large_body_is_gzipped(asgi_client):
+    async with asgi_client(_app(["gzip"])) as client:
+        response = await client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"large"'
+    assert int(response.headers["content-length"]) < len(LARGE_BODY) / 5
+    assert response.content == LARGE_BODY
+
+
+@pytest.mark.asyncio()
+async def test_small_or_unaccepted_bodies_are_not_compressed(asgi_client):
+    async with asgi_client(_app(["gzip"])) as client:
+        small = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+        identity = await client.get("/large", headers={"Accept-Encoding": "gzip;q=0"})
+
+    assert "content-encoding" not in small.headers
+    assert small.headers["vary"] == "Accept-Encoding"
+    assert "content-encoding" not in identity.headers
+    assert identity.headers["etag"] == '"large"'
+    assert identity.content == LARGE_BODY
+
+
+@pytest.mark.asyncio()
+async def test_stream_is_flushed_per_chunk():
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start", "status": 200,
+            "headers": [(b"content-type", b"application/x-ndjson")],
+        })
+        for index in range(3):
+            body = orjson.dumps({"id": index}, option=orjson.OPT_APPEND_NEWLINE) * 100
+            await send({"type": "http.response.body", "body": body, "more_body": index < 2})
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    await CompressionMiddleware(app, encodings=["gzip"])(scope, None, send)
+
+    start, *bodies = messages
+    assert (b"content-encoding", b"gzip") in start["headers"]
+    assert not any(name == b"content-length" for name, _ in start["headers"])
+
+    # Every chunk decodes to its rows before the next one arrives.
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    assert [decompressor.decompress(body["body"]).count(b"\n") for body in bodies] == [100, 100, 100]
+    assert decompressor.eof
+
+
+@pytest.mark.asyncio()
+@pytest.mark.parametrize(("encoding", "module"), [("br", "brotli"), ("zstd", "zstandard")])
+async def test_optional_encodings(encoding, module, asgi_client):
+    decoder = pytest.importorskip(module)
+
+    async with asgi_client(_app([encoding, "gzip"])) as client, client.stream(
+            "GET", "/large", headers={"Accept-Encoding": f"gzip, {encoding}"},
+    ) as response:
+        assert response.headers["content-encoding"] == encoding
+        raw = b"".join([chunk async for chunk in response.aiter_raw()])
+
+    if encoding == "br":
+        assert decoder.decompress(raw) == LARGE_BODY
+    else:
+        assert decoder.ZstdDecompressor().decompress(raw, max_output_size=len(LARGE_BODY)) == LARGE_BODY
+
+
+@pytest.mark.asyncio()
+async def test_compressed_list_revalidates(db_session, async_client):
+    [seller] = await create_sellers(db_session, 1)
+    await create_books(db_session, seller, 50)
+
+    response = await async_client.get("/api/v1/books/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"].startswith("W/")
+    assert len(response.json()["books"]) == 50
+
+    response = await async_client.get(
+        "/api/v1/books/", headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]},
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"].startswith("W/")
+    assert response.headers["vary"] == "Accept-Encoding"
+
+    response = await async_client.get(
+        "/api/v1/books/", headers={"Accept-Encoding": "identity", "If-None-Match": response.headers["etag"]},
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert not response.headers["etag"].startswith("W/")
+    assert response.headers["vary"] == "Accept-Encoding"
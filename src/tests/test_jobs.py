@@ -0,0 +1,169 @@
+import pytest
+from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy import update
+
+from src.configurations.database import run_after_commit
+from src.models.jobs import Job
+from src.services import cache as cache_module
+from src.services import jobs as jobs_module
+from src.services.cache import MemoryCache
+from src.services.cache import book_key
+from src.services.cache import invalidate_books
+from src.services.jobs import JobQueue
+from src.services.jobs import enqueue
+
+
+def _queue(override_get_session_factory, handlers: dict) -> JobQueue:
+    return JobQueue(
+        override_get_session_factory(), handlers,
+        concurrency=1, poll_interval=0.01, lease_timeout=60, retry_backoff=0,
+    )
+
+
+@pytest.mark.asyncio()
+async def test_job_queue_runs_and_removes_jobs(db_session, override_get_session_factory):
+    seen = []
+
+    async def record(payload: dict) -> None:
+        seen.append(payload["value"])
+
+    await enqueue(db_session, "record", {"value": 1})
+    await enqueue(db_session, "record", {"value": 2})
+
+    await _queue(override_get_session_factory, {"record": record}).run(drain=True)
+
+    assert seen == [1, 2]
+    assert (await db_session.execute(select(Job.id))).all() == []
+
+
+@pytest.mark.asyncio()
+async def test_worker_survives_failing_to_finish_a_job(db_session, override_get_session_factory, monkeypatch):
+    seen = []
+
+    async def record(payload: dict) -> None:
+        seen.append(payload["value"])
+
+    delete = jobs_module.delete
+    failures = [ConnectionResetError("connection lost")]
+
+    def flaky_delete(*args, **kwargs):
+        if failures:
+            raise failures.pop()
+        return delete(*args, **kwargs)
+
+    monkeypatch.setattr(jobs_module, "delete", flaky_delete)
+    await enqueue(db_session, "record", {"value": 1})
+    await enqueue(db_session, "record", {"value": 2})
+
+    await _queue(override_get_session_factory, {"record": record}).run(drain=True)
+
+    # The first job keeps its lease and runs again later; the second one
+    # is still processed by the same worker.
+    assert seen == [1, 2]
+    assert (await db_session.execute(select(Job.status))).scalars().all() == ["running"]
+
+
+@pytest.mark.asyncio()
+async def test_job_queue_retries_then_gives_up(db_session, override_get_session_factory):
+    calls = 0
+
+    async def flaky(payload: dict) -> None:
+        nonlocal calls
+        calls += 1
+        raise RuntimeError("still broken")
+
+    await enqueue(db_session, "flaky", {}, max_attempts=3)
+    await enqueue(db_session, "unknown", {})
+
+    await _queue(override_get_session_factory, {"flaky": flaky}).run(drain=True)
+
+    assert calls == 3
+    jobs = {
+        job.kind: job
+        for job in (await db_session.execute(select(Job.kind, Job.status, Job.attempts, Job.last_error))).all()
+    }
+    assert jobs["flaky"].status == "failed"
+    assert jobs["flaky"].attempts == 3
+    assert "still broken" in jobs["flaky"].last_error
+    assert jobs["unknown"].status == "failed"
+    assert jobs["unknown"].attempts == 1
+
+
+@pytest.mark.asyncio()
+async def test_expired_lease_on_last_attempt_fails_the_job(db_session, override_get_session_factory):
+    calls = 0
+
+    async def crash(payload: dict) -> None:
+        nonlocal calls
+        calls += 1
+
+    await enqueue(db_session, "crash", {}, max_attempts=2)
+    await enqueue(db_session, "crash", {}, max_attempts=2)
+    # Both were claimed by workers that died: one on its last attempt.
+    await db_session.execute(update(Job).values(status="running", run_at=func.now()))
+    last, retried = (await db_session.execute(select(Job.id).order_by(Job.id))).scalars().all()
+    await db_session.execute(update(Job).where(Job.id == last).values(attempts=2))
+    await db_session.execute(update(Job).where(Job.id == retried).values(attempts=1))
+
+    await _queue(override_get_session_factory, {"crash": crash}).run(drain=True)
+
+    assert calls == 1
+    job = (await db_session.execute(select(Job.id, Job.status, Job.attempts, Job.last_error))).one()
+    assert job.id == last
+    assert job.status == "failed"
+    assert job.attempts == 2
+    assert job.last_error == "lease expired on the last attempt"
+
+
+@pytest.mark.asyncio()
+async def test_shared_cache_list_invalidation_is_queued(db_session, override_get_session_factory, monkeypatch):
+    shared_cache = MemoryCache(max_entries=10, ttl=60)
+    shared_cache.shared = True
+    monkeypatch.setattr(cache_module, "get_cache", lambda: shared_cache)
+
+    entry = cache_module.CacheEntry.from_body(b"{}")
+    await shared_cache.set(book_key(1), entry)
+    await shared_cache.set(f"{cache_module.BOOKS_LIST_PREFIX}limit=10", entry)
+
+    await invalidate_books(shared_cache, [1], session=db_session)
+    await run_after_commit(db_session)
+
+    assert await shared_cache.get(book_key(1)) is None
+    assert await shared_cache.get(f"{cache_module.BOOKS_LIST_PREFIX}limit=10") is not None
+    assert (await db_session.execute(select(Job.kind))).scalars().all() == ["cache.delete_prefixes"]
+
+    await _queue(
+        override_get_session_factory, {"cache.delete_prefixes": cache_module._delete_prefixes_job},
+    ).run(drain=True)
+
+    assert await shared_cache.get(f"{cache_module.BOOKS_LIST_PREFIX}limit=10") is None
+
+
+@pytest.mark.asyncio()
+async def test_failed_cache_delete_is_retried_from_the_queue(
+        db_session, override_get_session_factory, test_cache, monkeypatch,
+):
+    monkeypatch.setattr(cache_module, "get_cache", lambda: test_cache)
+    entry = cache_module.CacheEntry.from_body(b"{}")
+    await test_cache.set(book_key(1), entry)
+
+    delete = test_cache.delete
+
+    async def unreachable(*keys: str) -> None:
+        raise ConnectionError("cache is unreachable")
+
+    monkeypatch.setattr(test_cache, "delete", unreachable)
+    await invalidate_books(test_cache, [1], session=db_session)
+    await run_after_commit(db_session)
+
+    assert await test_cache.get(book_key(1)) == entry
+    assert (await db_session.execute(select(Job.kind))).scalars().all() == ["cache.delete_keys"]
+
+    monkeypatch.setattr(test_cache, "delete", delete)
+    await _queue(
+        override_get_session_factory, {"cache.delete_keys": cache_module._delete_keys_job},
+    ).run(drain=True)
+
+    assert await test_cache.get(book_key(1)) is None
+    assert (await db_session.execute(select(Job.id))).all() == []
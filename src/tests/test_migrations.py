@@ -0,0 +1,35 @@
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import text
+
+from src.migrations import current_revision
+from src.migrations import head_revision
+from src.models.base import BaseModel
+from src.models.books import Book
+
+
+@pytest.mark.asyncio()
+async def test_migrations_reach_head(db_connection):
+    assert await db_connection.run_sync(current_revision) == head_revision()
+
+
+@pytest.mark.asyncio()
+@pytest.mark.filterwarnings("ignore:Computed default")
+async def test_migrations_match_models(db_connection):
+    diff = await db_connection.run_sync(
+        lambda connection: compare_metadata(MigrationContext.configure(connection), BaseModel.metadata),
+    )
+
+    assert diff == []
+
+
+@pytest.mark.asyncio()
+async def test_book_indexes_are_valid(db_connection):
+    valid = dict((await db_connection.execute(text(
+        "SELECT c.relname, i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE i.indrelid = 'books_table'::regclass",
+    ))).all())
+
+    assert {index.name for index in Book.__table__.indexes} <= valid.keys()
+    assert all(valid.values())
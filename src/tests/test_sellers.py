@@ -1,9 +1,18 @@
+import asyncio
+from datetime import datetime
+from datetime import timezone
+
+import orjson
 import pytest
 from fastapi import status
+from sqlalchemy import func
 from sqlalchemy import select
+from sqlalchemy import update
 
 from src.models.books import Book
 from src.models.sellers import Seller
+from src.tests.factories import create_books
+from src.tests.factories import create_sellers
 
 
 @pytest.mark.asyncio()
@@ -46,6 +55,125 @@ async def test_create_seller(db_session, async_client):
     }
 
 
+@pytest.mark.asyncio()
+async def test_create_seller_hashes_password(db_session, async_client, test_password_hasher):
+    seller = {
+        "first_name": "Olga",
+        "last_name": "Buzova",
+        "email": "best_singer@mail.com",
+        "password": "malo_poloviN!",
+    }
+
+    response = await async_client.post("/api/v1/sellers/", json=seller)
+    assert response.status_code == status.HTTP_201_CREATED
+
+    res = await db_session.get(Seller, response.json()["id"])
+    assert res.password != "malo_poloviN!"
+    assert res.password.startswith("$scrypt$")
+    assert await test_password_hasher.verify("malo_poloviN!", res.password)
+    assert not await test_password_hasher.verify("Za_dengi_Da!", res.password)
+
+
+@pytest.mark.asyncio()
+async def test_login_seller(db_session, async_client):
+    seller = {
+        "first_name": "Olga",
+        "last_name": "Buzova",
+        "email": "best_singer@mail.com",
+        "password": "malo_poloviN!",
+    }
+    response = await async_client.post("/api/v1/sellers/", json=seller)
+    assert response.status_code == status.HTTP_201_CREATED
+    seller_id = response.json()["id"]
+
+    response = await async_client.post(
+        "/api/v1/sellers/login", json={"email": "best_singer@mail.com", "password": "malo_poloviN!"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "first_name": "Olga", "last_name": "Buzova",
+        "id": seller_id, "email": "best_singer@mail.com",
+    }
+
+    response = await async_client.post(
+        "/api/v1/sellers/login", json={"email": "best_singer@mail.com", "password": "Za_dengi_Da!"},
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.asyncio()
+async def test_login_seller_rehashes_legacy_password(db_session, async_client, test_password_hasher):
+    seller = Seller(
+        first_name="Olga", last_name="Buzova",
+        email="best_singer@mail.com", password="malo_poloviN!",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    response = await async_client.post(
+        "/api/v1/sellers/login", json={"email": "best_singer@mail.com", "password": "malo_poloviN!"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    await db_session.refresh(seller)
+    assert seller.password.startswith("$scrypt$")
+    assert not test_password_hasher.needs_rehash(seller.password)
+
+
+@pytest.mark.asyncio()
+async def test_login_rehash_keeps_seller_version(db_session, async_client):
+    seller = Seller(
+        first_name="Olga", last_name="Buzova",
+        email="best_singer@mail.com", password="malo_poloviN!",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    response = await async_client.get(f"/api/v1/sellers/{seller.id}")
+    assert response.json()["version"] == 1
+
+    response = await async_client.post(
+        "/api/v1/sellers/login", json={"email": "best_singer@mail.com", "password": "malo_poloviN!"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    response = await async_client.get(f"/api/v1/sellers/{seller.id}")
+    version = response.json()["version"]
+    assert version == await db_session.scalar(select(Seller.version).where(Seller.id == seller.id))
+
+    response = await async_client.patch(
+        f"/api/v1/sellers/{seller.id}", json={"version": version, "last_name": "Zoteeva"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["version"] == version + 1
+
+
+@pytest.mark.asyncio()
+async def test_login_costs_a_hash_for_unknown_or_corrupt_accounts(
+        db_session, async_client, test_password_hasher, monkeypatch,
+):
+    db_session.add(Seller(
+        first_name="Olga", last_name="Buzova",
+        email="best_singer@mail.com", password="$scrypt$n=16,r=8$broken$",
+    ))
+    await db_session.flush()
+
+    hashed = []
+    run = test_password_hasher._run
+
+    async def counting_run(*args):
+        hashed.append(args[0])
+        return await run(*args)
+
+    monkeypatch.setattr(test_password_hasher, "_run", counting_run)
+
+    for email in ("nobody@mail.com", "best_singer@mail.com"):
+        response = await async_client.post("/api/v1/sellers/login", json={"email": email, "password": "malo_poloviN!"})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    assert hashed == ["malo_poloviN!", "malo_poloviN!"]
+
+
 @pytest.mark.asyncio()
 async def test_get_all_sellers(db_session, async_client):
     seller = Seller(
@@ -70,18 +198,112 @@ async def test_get_all_sellers(db_session, async_client):
         "sellers": [
             {
                 "first_name": "Olga", "last_name": "Buzova",
-                "id": seller.id, "email": "best_singer@mail.com",
+                "id": seller.id, "email": "best_singer@mail.com", "version": 1,
                 "books": [],
             },
             {
                 "first_name": "Dasha", "last_name": "Zoteeva",
-                "id": seller2.id, "email": "instasamka@mail.com",
+                "id": seller2.id, "email": "instasamka@mail.com", "version": 1,
                 "books": [],
             },
         ],
+        "next_cursor": None,
     }
 
 
+@pytest.mark.asyncio()
+async def test_get_all_sellers_shape(db_session, async_client, query_counter):
+    sellers = await create_sellers(db_session, 3)
+    books = await create_books(db_session, sellers[0], 5)
+
+    query_counter.reset()
+    response = await async_client.get("/api/v1/sellers/", params={"fields": "id,email", "limit": 2})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "sellers": [
+            {"id": sellers[0].id, "email": sellers[0].email},
+            {"id": sellers[1].id, "email": sellers[1].email},
+        ],
+        "next_cursor": sellers[1].id,
+    }
+    assert query_counter.count == 1
+
+    response = await async_client.get(
+        "/api/v1/sellers/", params={"fields": "first_name", "after": sellers[1].id},
+    )
+    assert response.json() == {"sellers": [{"first_name": sellers[2].first_name}], "next_cursor": None}
+
+    response = await async_client.get(
+        "/api/v1/sellers/", params={"fields": "id,books", "books_limit": 2, "limit": 1},
+    )
+    embedded = response.json()["sellers"][0]["books"]
+    assert [book["id"] for book in embedded] == [books[0].id, books[1].id]
+
+    response = await async_client.get("/api/v1/sellers/", params={"fields": "id,password"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio()
+async def test_seller_list_caps_embedded_books_by_default(db_session, async_client):
+    [seller] = await create_sellers(db_session, 1)
+    books = await create_books(db_session, seller, 101)
+
+    response = await async_client.get("/api/v1/sellers/", params={"fields": "id,books"})
+    embedded = response.json()["sellers"][0]["books"]
+    assert [book["id"] for book in embedded] == [book.id for book in books[:100]]
+
+    response = await async_client.get("/api/v1/sellers/", params={"fields": "id,books", "books_limit": 1000})
+    assert len(response.json()["sellers"][0]["books"]) == 101
+
+
+@pytest.mark.asyncio()
+async def test_list_sellers_last_modified(db_session, async_client):
+    sellers = await create_sellers(db_session, 2)
+    await create_books(db_session, sellers[0], 1)
+    await db_session.execute(update(Seller).values(updated_at=datetime(2020, 1, 1, tzinfo=timezone.utc)))
+    await db_session.execute(update(Book).values(updated_at=datetime(2021, 1, 1, tzinfo=timezone.utc)))
+
+    response = await async_client.get("/api/v1/sellers/", params={"fields": "id,first_name"})
+    assert response.headers["last-modified"] == "Wed, 01 Jan 2020 00:00:00 GMT"
+
+    # Embedded books make the page as fresh as the newest book.
+    response = await async_client.get("/api/v1/sellers/")
+    assert response.headers["last-modified"] == "Fri, 01 Jan 2021 00:00:00 GMT"
+
+    response = await async_client.get("/api/v1/sellers/", headers={"If-None-Match": response.headers["etag"]})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+@pytest.mark.asyncio()
+async def test_export_sellers(db_session, async_client):
+    seller = Seller(
+        first_name="Olga", last_name="Buzova",
+        email="best_singer@mail.com", password="malo_poloviN!",
+    )
+
+    seller2 = Seller(
+        first_name="Dasha", last_name="Zoteeva",
+        email="instasamka@mail.com", password="Za_dengi_Da!",
+    )
+    db_session.add_all([seller, seller2])
+    await db_session.flush()
+
+    response = await async_client.get("/api/v1/sellers/export")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    assert [orjson.loads(line) for line in response.text.splitlines()] == [
+        {
+            "id": seller.id, "first_name": "Olga", "last_name": "Buzova",
+            "email": "best_singer@mail.com",
+        },
+        {
+            "id": seller2.id, "first_name": "Dasha", "last_name": "Zoteeva",
+            "email": "instasamka@mail.com",
+        },
+    ]
+
+
 @pytest.mark.asyncio()
 async def test_get_single_seller(db_session, async_client):
     seller = Seller(
@@ -104,6 +326,7 @@ async def test_get_single_seller(db_session, async_client):
         "last_name": "Buzova",
         "id": seller.id,
         "email": "best_singer@mail.com",
+        "version": 1,
         "books": [],
     }
 
@@ -130,7 +353,7 @@ async def test_get_seller_with_book(db_session, async_client):
 
     assert response.json() == {
         "first_name": "Olga", "last_name": "Buzova", "id": seller.id,
-        "email": "best_singer@mail.com",
+        "email": "best_singer@mail.com", "version": 1,
         "books": [
             {
                 "id": book.id,
@@ -191,6 +414,10 @@ async def test_update_seller(db_session, async_client):
     )
 
     assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "id": seller.id, "first_name": "Dasha", "last_name": "Zoteeva",
+        "email": "instasamka@mail.com", "version": 2,
+    }
     await db_session.flush()
 
     res = await db_session.get(Seller, seller.id)
@@ -199,3 +426,308 @@ async def test_update_seller(db_session, async_client):
     assert res.last_name == "Zoteeva"
     assert res.email == "instasamka@mail.com"
     assert res.password == "malo_poloviN!"
+
+
+@pytest.mark.asyncio()
+async def test_update_seller_conflicts_with_concurrent_write(db_session, async_client):
+    [seller] = await create_sellers(db_session, 1)
+    seller_id = seller.id
+    await db_session.commit()
+
+    # Another request commits a change after this session loaded the seller.
+    await db_session.execute(
+        update(Seller.__table__).where(Seller.id == seller_id)
+        .values(first_name="Patched", version=Seller.version + 1),
+    )
+    await db_session.commit()
+
+    response = await async_client.put(f"/api/v1/sellers/{seller_id}", json={
+        "id": seller_id, "first_name": "Dasha", "last_name": "Zoteeva", "email": "instasamka@mail.com",
+    })
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert await db_session.scalar(select(Seller.first_name).where(Seller.id == seller_id)) == "Patched"
+
+
+@pytest.mark.asyncio()
+async def test_create_seller_invalidates_list_cache(db_session, async_client):
+    [seller] = await create_sellers(db_session, 1)
+
+    response = await async_client.get("/api/v1/sellers/")
+    assert [item["id"] for item in response.json()["sellers"]] == [seller.id]
+    etag = response.headers["etag"]
+
+    response = await async_client.post("/api/v1/sellers/", json={
+        "first_name": "Dasha", "last_name": "Zoteeva",
+        "email": "instasamka@mail.com", "password": "Za_dengi_Da!",
+    })
+    new_id = response.json()["id"]
+
+    response = await async_client.get("/api/v1/sellers/", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert [item["id"] for item in response.json()["sellers"]] == [seller.id, new_id]
+
+
+@pytest.mark.asyncio()
+async def test_delete_seller_invalidates_cache(db_session, async_client):
+    seller = Seller(
+        first_name="Olga", last_name="Buzova",
+        email="best_singer@mail.com", password="malo_poloviN!",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    book = Book(
+        title="How to sing if bear stepped on your ear",
+        author="Buzova Olga", year=2022, pages=7, seller_id=seller.id,
+    )
+    db_session.add(book)
+    await db_session.flush()
+
+    response = await async_client.get(f"/api/v1/sellers/{seller.id}")
+    assert response.status_code == status.HTTP_200_OK
+    response = await async_client.get(f"/api/v1/books/{book.id}")
+    assert response.status_code == status.HTTP_200_OK
+
+    response = await async_client.delete(f"/api/v1/sellers/{seller.id}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    await db_session.flush()
+
+    response = await async_client.get(f"/api/v1/sellers/{seller.id}")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    response = await async_client.get(f"/api/v1/books/{book.id}")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.asyncio()
+async def test_seller_reads_use_single_statement(db_session, async_client, query_counter):
+    seller = Seller(
+        first_name="Olga", last_name="Buzova",
+        email="best_singer@mail.com", password="malo_poloviN!",
+    )
+    seller2 = Seller(
+        first_name="Dasha", last_name="Zoteeva",
+        email="instasamka@mail.com", password="Za_dengi_Da!",
+    )
+    db_session.add_all([seller, seller2])
+    await db_session.flush()
+
+    db_session.add_all([
+        Book(
+            title=f"Book {i}", author="Buzova Olga", year=2022, pages=7,
+            seller_id=seller.id if i % 2 else seller2.id,
+        )
+        for i in range(6)
+    ])
+    await db_session.flush()
+
+    query_counter.reset()
+    response = await async_client.get(f"/api/v1/sellers/{seller.id}")
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()["books"]) == 3
+    assert query_counter.count == 1
+
+    query_counter.reset()
+    response = await async_client.get("/api/v1/sellers/")
+    assert response.status_code == status.HTTP_200_OK
+    assert [len(seller["books"]) for seller in response.json()["sellers"]] == [3, 3]
+    assert query_counter.count == 1
+
+
+@pytest.mark.asyncio()
+async def test_seller_stats_follow_book_writes(db_session, async_client):
+    seller = Seller(
+        first_name="Olga", last_name="Buzova",
+        email="best_singer@mail.com", password="malo_poloviN!",
+    )
+    seller2 = Seller(
+        first_name="Dasha", last_name="Zoteeva",
+        email="instasamka@mail.com", password="Za_dengi_Da!",
+    )
+    db_session.add_all([seller, seller2])
+    await db_session.flush()
+
+    response = await async_client.post("/api/v1/books/bulk", json=[
+        {"title": "Book 1", "author": "Buzova Olga", "year": 2021, "count_pages": 100, "seller_id": seller.id},
+        {"title": "Book 2", "author": "Buzova Olga", "year": 2022, "count_pages": 200, "seller_id": seller.id},
+        {"title": "Book 3", "author": "Buzova Olga", "year": 2022, "count_pages": 300, "seller_id": seller.id},
+    ])
+    assert response.status_code == status.HTTP_200_OK
+    book_ids = [result["id"] for result in response.json()["results"]]
+
+    response = await async_client.get(f"/api/v1/sellers/{seller.id}/stats")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "seller_id": seller.id, "book_count": 3, "total_pages": 600,
+        "years": [
+            {"year": 2021, "book_count": 1, "total_pages": 100},
+            {"year": 2022, "book_count": 2, "total_pages": 500},
+        ],
+    }
+
+    response = await async_client.put(f"/api/v1/books/{book_ids[0]}", json={
+        "id": book_ids[0], "title": "Book 1", "author": "Buzova Olga", "year": 2022,
+        "pages": 150, "seller_id": seller2.id,
+    })
+    assert response.status_code == status.HTTP_200_OK
+    response = await async_client.delete(f"/api/v1/books/{book_ids[1]}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    await db_session.flush()
+
+    response = await async_client.get("/api/v1/sellers/stats")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "sellers": [
+            {
+                "seller_id": seller.id, "book_count": 1, "total_pages": 300,
+                "years": [{"year": 2022, "book_count": 1, "total_pages": 300}],
+            },
+            {
+                "seller_id": seller2.id, "book_count": 1, "total_pages": 150,
+                "years": [{"year": 2022, "book_count": 1, "total_pages": 150}],
+            },
+        ],
+        "next_cursor": None,
+    }
+
+
+@pytest.mark.asyncio()
+async def test_seller_stats_pages_are_cached(db_session, async_client):
+    sellers = await create_sellers(db_session, 3)
+    await create_books(db_session, sellers[0], 2)
+
+    response = await async_client.get("/api/v1/sellers/stats", params={"limit": 2})
+    assert response.status_code == status.HTTP_200_OK
+    page = response.json()
+    assert [seller["seller_id"] for seller in page["sellers"]] == [sellers[0].id, sellers[1].id]
+    assert page["sellers"][0]["book_count"] == 2
+    assert page["next_cursor"] == sellers[1].id
+
+    response = await async_client.get(
+        "/api/v1/sellers/stats", params={"limit": 2, "after": page["next_cursor"]},
+    )
+    assert response.json() == {
+        "sellers": [{"seller_id": sellers[2].id, "book_count": 0, "total_pages": 0, "years": []}],
+        "next_cursor": None,
+    }
+
+    response = await async_client.get("/api/v1/sellers/stats", params={"limit": 2})
+    response = await async_client.get(
+        "/api/v1/sellers/stats", params={"limit": 2}, headers={"If-None-Match": response.headers["ETag"]},
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # A book write drops the cached pages.
+    response = await async_client.post("/api/v1/books/", json={
+        "title": "Book", "author": "Author", "year": 2022, "count_pages": 10, "seller_id": sellers[1].id,
+    })
+    assert response.status_code == status.HTTP_201_CREATED
+    response = await async_client.get("/api/v1/sellers/stats", params={"limit": 2})
+    assert response.json()["sellers"][1]["book_count"] == 1
+
+
+@pytest.mark.asyncio()
+async def test_seller_lists_reject_cursor_outside_int4(db_session, async_client):
+    for route in ("/api/v1/sellers/", "/api/v1/sellers/stats"):
+        response = await async_client.get(route, params={"after": 2 ** 40})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio()
+async def test_seller_stats_without_books(db_session, async_client):
+    seller = Seller(
+        first_name="Olga", last_name="Buzova",
+        email="best_singer@mail.com", password="malo_poloviN!",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    response = await async_client.get(f"/api/v1/sellers/{seller.id}/stats")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"seller_id": seller.id, "book_count": 0, "total_pages": 0, "years": []}
+
+    response = await async_client.get(f"/api/v1/sellers/{seller.id + 1}/stats")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.asyncio()
+async def test_concurrent_seller_reads_share_one_query(db_session, async_client, query_counter):
+    seller = Seller(
+        first_name="Olga", last_name="Buzova",
+        email="best_singer@mail.com", password="malo_poloviN!",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    query_counter.reset()
+    responses = await asyncio.gather(*(
+        async_client.get(f"/api/v1/sellers/{seller.id}") for _ in range(10)
+    ))
+
+    assert {response.status_code for response in responses} == {status.HTTP_200_OK}
+    assert len({response.content for response in responses}) == 1
+    assert query_counter.count == 1
+
+
+@pytest.mark.asyncio()
+async def test_patch_seller(db_session, async_client):
+    seller = Seller(
+        first_name="Olga", last_name="Buzova",
+        email="best_singer@mail.com", password="malo_poloviN!",
+    )
+    db_session.add(seller)
+    await db_session.flush()
+
+    response = await async_client.get(f"/api/v1/sellers/{seller.id}")
+    version = response.json()["version"]
+
+    response = await async_client.patch(
+        f"/api/v1/sellers/{seller.id}", json={"version": version, "last_name": "Zoteeva"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "id": seller.id, "first_name": "Olga", "last_name": "Zoteeva",
+        "email": "best_singer@mail.com", "version": version + 1,
+    }
+
+    response = await async_client.get(f"/api/v1/sellers/{seller.id}")
+    assert response.json()["last_name"] == "Zoteeva"
+
+    response = await async_client.patch(
+        f"/api/v1/sellers/{seller.id}", json={"version": version, "first_name": "Dasha"},
+    )
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+    response = await async_client.patch(
+        f"/api/v1/sellers/{seller.id}", json={"version": version + 1, "email": "no-at-sign"},
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    for changes in ({"version": 2 ** 40, "first_name": "Dasha"}, {"version": version + 1, "first_name": "x" * 60}):
+        response = await async_client.patch(f"/api/v1/sellers/{seller.id}", json=changes)
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio()
+async def test_delete_seller_is_single_statement(db_session, async_client, query_counter):
+    seller, seller2 = await create_sellers(db_session, 2)
+    books = await create_books(db_session, seller, 1)
+
+    response = await async_client.get(f"/api/v1/books/{books[0].id}")
+    assert response.status_code == status.HTTP_200_OK
+
+    query_counter.reset()
+    response = await async_client.delete(f"/api/v1/sellers/{seller.id}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert query_counter.count == 1
+
+    response = await async_client.get(f"/api/v1/books/{books[0].id}")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    count = await db_session.scalar(select(func.count()).select_from(Book))
+    assert count == 0
+
+    missing_id = seller2.id + 1
+    response = await async_client.request(
+        "DELETE", "/api/v1/sellers/bulk", json={"ids": [seller.id, seller2.id, missing_id]},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"deleted": [seller2.id], "not_found": [seller.id, missing_id]}
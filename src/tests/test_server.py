@@ -0,0 +1,85 @@
+import orjson
+import pytest
+
+from src.configurations.settings import Settings
+from src.configurations.settings import settings
+from src.server import per_process_overrides
+from src.server import plan_worker_pool
+from src.server import resolve_workers
+
+
+@pytest.fixture
+def connection_budget(monkeypatch):
+    monkeypatch.setattr(settings, "db_server_max_connections", 100)
+    monkeypatch.setattr(settings, "db_reserved_connections", 10)
+    monkeypatch.setattr(settings, "max_connection_count", 10)
+    monkeypatch.setattr(settings, "db_max_overflow", 5)
+
+
+def test_resolve_workers_defaults_to_cpu_count(monkeypatch):
+    monkeypatch.setattr("os.cpu_count", lambda: 6)
+
+    assert resolve_workers(0) == 6
+    assert resolve_workers(3) == 3
+
+
+@pytest.mark.parametrize("workers", [1, 4, 8, 16, 90])
+@pytest.mark.usefixtures("connection_budget")
+def test_worker_pools_fit_into_max_connections(workers):
+    pool_size, max_overflow = plan_worker_pool(workers)
+
+    assert pool_size >= 1
+    assert workers * (pool_size + max_overflow) <= 90
+
+
+@pytest.mark.usefixtures("connection_budget")
+def test_worker_pool_keeps_configured_size_when_budget_allows():
+    assert plan_worker_pool(4) == (10, 5)
+    assert plan_worker_pool(8) == (10, 1)
+    assert plan_worker_pool(16) == (5, 0)
+
+
+@pytest.mark.usefixtures("connection_budget")
+def test_too_many_workers_for_budget():
+    with pytest.raises(ValueError):
+        plan_worker_pool(91)
+
+
+def test_per_process_cache_is_turned_off_for_several_workers(monkeypatch):
+    monkeypatch.setattr(settings, "cache_backend", "memory")
+    monkeypatch.setattr(settings, "rate_limit_backend", "redis")
+
+    assert per_process_overrides(1) == {}
+    assert per_process_overrides(4) == {"CACHE_BACKEND": "none"}
+
+    monkeypatch.setattr(settings, "cache_backend", "redis")
+    assert per_process_overrides(4) == {}
+
+
+def test_per_process_rate_limit_is_split_between_workers(monkeypatch):
+    monkeypatch.setattr(settings, "cache_backend", "redis")
+    monkeypatch.setattr(settings, "rate_limit_backend", "memory")
+    monkeypatch.setattr(settings, "rate_limit_rate", 100.0)
+    monkeypatch.setattr(settings, "rate_limit_burst", 200)
+    monkeypatch.setattr(settings, "rate_limit_routes", {"GET /api/v1/sellers/": (5.0, 2)})
+
+    assert per_process_overrides(1) == {}
+
+    overrides = per_process_overrides(4)
+    assert float(overrides["RATE_LIMIT_RATE"]) == 25.0
+    assert int(overrides["RATE_LIMIT_BURST"]) == 50
+    assert orjson.loads(overrides["RATE_LIMIT_ROUTES"]) == {"GET /api/v1/sellers/": [1.25, 1]}
+
+    monkeypatch.setattr(settings, "rate_limit_backend", "none")
+    assert per_process_overrides(4) == {}
+
+
+def test_default_settings_start_one_worker_per_cpu(monkeypatch):
+    monkeypatch.setattr("os.cpu_count", lambda: 8)
+    # conftest switches rate limiting off for the app under test.
+    for name in ("cache_backend", "rate_limit_backend", "rate_limit_rate", "rate_limit_burst", "rate_limit_routes"):
+        monkeypatch.setattr(settings, name, Settings.model_fields[name].default)
+
+    overrides = per_process_overrides(resolve_workers(0))
+    assert overrides["CACHE_BACKEND"] == "none"
+    assert float(overrides["RATE_LIMIT_RATE"]) == settings.rate_limit_rate / 8
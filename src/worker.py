@@ -0,0 +1,42 @@
+import argparse
+import asyncio
+
+from src.configurations.database import global_init
+from src.configurations.logs import setup_logging
+from src.configurations.logs import shutdown_logging
+from src.configurations.settings import settings
+from src.services.cache import init_cache
+from src.services.jobs import get_job_queue
+from src.services.jobs import init_job_queue
+
+
+__all__ = ["main"]
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m src.worker")
+    parser.add_argument("--concurrency", type=int, default=settings.jobs_concurrency)
+    parser.add_argument("--drain", action="store_true", help="exit once no job is left to run")
+    return parser.parse_args(argv)
+
+
+async def _run(drain: bool) -> None:
+    global_init()
+    init_cache()
+    init_job_queue()
+    await get_job_queue().run(drain=drain)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = _parse_args(argv)
+    settings.jobs_concurrency = args.concurrency
+
+    setup_logging()
+    try:
+        asyncio.run(_run(args.drain))
+    finally:
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()